@@ -60,6 +60,7 @@ def pkginfo():
         "ogcfserver",
         "tmsclient",
         "file_upload",
+        "job",
         "audit",
         "tileset",
         "basemap",
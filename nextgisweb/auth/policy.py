@@ -1,6 +1,11 @@
+import hmac
 from base64 import b64decode
+from collections import OrderedDict
 from contextlib import contextmanager
 from datetime import datetime, timedelta
+from secrets import token_bytes
+from threading import Lock
+from time import monotonic
 from typing import TYPE_CHECKING, NewType, Protocol
 
 import sqlalchemy as sa
@@ -86,6 +91,52 @@ class AuthMethod(Protocol):
     def __call__(self, request: Request, *, now: int) -> AuthResult | None: ...
 
 
+class CredentialsCache:
+    """Bounded in-memory cache of verified local credentials
+
+    Entries are keyed by an HMAC digest of a username and a password with a
+    per-process secret, so passwords aren't kept in memory. Each entry holds
+    a user ID and a state of the user's credentials at the moment of
+    verification, which should be compared with the current state on use."""
+
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl.total_seconds()
+        self._secret = token_bytes(32)
+        self._data = OrderedDict()
+        self._lock = Lock()
+
+    def digest(self, username, password):
+        msg = username.lower().encode("utf-8") + b"\0" + password.encode("utf-8")
+        return hmac.digest(self._secret, msg, "sha256")
+
+    def get(self, digest):
+        with self._lock:
+            if (entry := self._data.get(digest)) is None:
+                return None
+            if entry[0] <= monotonic():
+                del self._data[digest]
+                return None
+            self._data.move_to_end(digest)
+            return entry[1:]
+
+    def put(self, digest, user_id, state):
+        with self._lock:
+            self._data[digest] = (monotonic() + self.ttl, user_id, state)
+            self._data.move_to_end(digest)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, digest):
+        with self._lock:
+            self._data.pop(digest, None)
+
+    @staticmethod
+    def state(user):
+        # Changing a password generates a new salt, so the hash always changes
+        return (user.keyname, user.password_hash, user.oauth_subject)
+
+
 @implementer(ISecurityPolicy)
 class SecurityPolicy:
     def __init__(self, comp, options):
@@ -95,6 +146,11 @@ class SecurityPolicy:
         self.acl_helper = ACLHelper()
         self.refresh_session = False
 
+        if (size := options["basic_cache.size"]) > 0:
+            self.credentials_cache = CredentialsCache(size, options["basic_cache.ttl"])
+        else:
+            self.credentials_cache = None
+
     @property
     def oauth(self):
         return self.comp.oauth
@@ -252,14 +308,6 @@ class SecurityPolicy:
                         else:
                             refresh_success = True
 
-                # FIXME: Prevent overwriting new session keys by ensuring they
-                # are not replaced in the session.
-                for k in ("auth.state", "auth.access_token", "auth.refresh_token"):
-                    try:
-                        session._updated.remove(k)
-                    except ValueError:
-                        pass
-
                 if not refresh_success:
                     self.forget(request)
                     return None
@@ -322,11 +370,25 @@ class SecurityPolicy:
         prv = None
         tpair = None
 
+        # Step 0: Local credentials verified recently, which avoids expensive
+        # password hash verification on each request with Basic authentication
+
+        load_user = load_only(User.keyname, User.password_hash, User.disabled, User.oauth_subject)
+
+        if (cache := self.credentials_cache) is not None:
+            digest = cache.digest(username, password)
+            if (entry := cache.get(digest)) is not None:
+                user_id, state = entry
+                test_user = DBSession.get(User, user_id, options=(load_user,))
+                if test_user is not None and cache.state(test_user) == state:
+                    if test_user.disabled:
+                        raise UserDisabledException()
+                    return (test_user, AP_LOCAL_PW, None)
+                cache.pop(digest)
+
         # Step 1: Authentication with local credentials
 
-        q = User.filter(sa.func.lower(User.keyname) == username.lower()).options(
-            load_only(User.password_hash, User.disabled)
-        )
+        q = User.filter(sa.func.lower(User.keyname) == username.lower()).options(load_user)
 
         if self.oauth and not self.oauth.local_auth:
             q = q.filter_by(oauth_subject=None)
@@ -341,6 +403,8 @@ class SecurityPolicy:
                     raise UserDisabledException()
                 user = test_user
                 prv = AP_LOCAL_PW
+                if cache is not None:
+                    cache.put(digest, user.id, cache.state(user))
 
         # Step 2: Authentication with OAuth password if enabled
 
@@ -389,5 +453,7 @@ class SecurityPolicy:
     option_annotations = OptionAnnotations((
         Option("local.lifetime", timedelta, default=timedelta(days=1), doc="Local authentication lifetime."),
         Option("local.refresh", timedelta, default=timedelta(hours=1), doc="Refresh local authentication lifetime interval."),
+        Option("basic_cache.size", int, default=1000, doc="Number of verified HTTP Basic credentials cached in memory, 0 to disable caching."),
+        Option("basic_cache.ttl", timedelta, default=timedelta(minutes=5), doc="Time to keep verified HTTP Basic credentials in memory."),
     ))
     # fmt: on
@@ -29,6 +29,23 @@ def test_http_basic(ngw_webtest_app: WebTestApp):
     ngw_webtest_app.get("/api/component/auth/current_user", status=401)
 
 
+def test_http_basic_cache(ngw_webtest_app: WebTestApp, user):
+    api = ngw_webtest_app.with_url("/api/component/auth/current_user")
+    ngw_webtest_app.authorization = ("Basic", (user.keyname, user.password_plaintext))
+    for _ in range(2):
+        assert api.get(status=200).json["keyname"] == user.keyname
+
+    with transaction.manager:
+        User.filter_by(id=user.id).one().disabled = True
+    api.get(status=401)
+
+    with transaction.manager:
+        obj = User.filter_by(id=user.id).one()
+        obj.disabled = False
+        obj.password = User.test_instance().password_plaintext
+    api.get(status=401)
+
+
 def test_api_login_logout(ngw_webtest_app: WebTestApp):
     resp = ngw_webtest_app.post(
         "/api/component/auth/login",
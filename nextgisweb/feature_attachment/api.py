@@ -1,16 +1,11 @@
 import re
-from io import BytesIO
 from itertools import count
 from mimetypes import guess_extension
-from tempfile import NamedTemporaryFile
 from typing import Annotated
 from urllib.parse import quote_plus
-from zipfile import ZIP_DEFLATED, ZipFile
 
 from msgspec import Meta, Struct
 from msgspec.json import encode as msgspec_dumpb
-from PIL import Image
-from PIL.Image import Resampling
 from pyramid.response import FileResponse, Response
 from sqlalchemy.sql import select
 
@@ -30,9 +25,9 @@ from .api_import import attachments_import
 from .api_util import AttachmentID, Metadata, MetadataItem
 from .component import FeatureAttachmentComponent
 from .exception import AttachmentNotFound
-from .exif import EXIF_ORIENTATION_TAG, ORIENTATIONS
+from .image_cache import resize_image
 from .model import FeatureAttachment
-from .util import crop_to_aspect_ratio
+from .util import is_compressed, zip_stream
 
 ResourceID = Annotated[int, Meta(ge=0, description="Resource ID")]
 
@@ -106,34 +101,25 @@ def image(
     if size == "":
         return FileResponse(fp, request=request, content_type=obj.mime_type)
 
+    # FileObj contents never change, so its UUID identifies the image
     width, height = map(int, size.split("x", maxsplit=1))
-    image = Image.open(fp)
-    if (width, height) == image.size:
-        return FileResponse(fp, request=request, content_type=obj.mime_type)
-
-    ext = image.format
-
-    try:
-        exif = image._getexif()
-    except Exception:
-        pass
+    uuid = obj.fileobj.uuid
+    etag = f"{uuid}-{width}x{height}" + ("-crop" if crop else "")
+    if etag in request.if_none_match:
+        return Response(status=304, etag=etag)
+
+    cache = FeatureAttachmentComponent.current().image_cache
+    if cache is not None and (cfn := cache.get(uuid, width, height, crop)) is not None:
+        response = FileResponse(cfn, request=request, content_type=obj.mime_type)
+    elif (data := resize_image(fp, width, height, crop=crop)) is None:
+        response = FileResponse(fp, request=request, content_type=obj.mime_type)
     else:
-        if exif is not None:
-            otag = exif.get(EXIF_ORIENTATION_TAG)
-            if otag in (3, 6, 8):
-                orientation = ORIENTATIONS[otag]
-                image = image.transpose(orientation.degrees)
-
-    if crop:
-        aspect_ratio = width / height
-        image = crop_to_aspect_ratio(image, aspect_ratio)
-    image.thumbnail((width, height), Resampling.LANCZOS)
+        if cache is not None:
+            cache.put(uuid, width, height, crop, data)
+        response = Response(data, content_type=obj.mime_type)
 
-    buf = BytesIO()
-    image.save(buf, ext)
-    buf.seek(0)
-
-    return Response(body_file=buf, content_type=obj.mime_type)
+    response.etag = etag
+    return response
 
 
 def iget(resource, request: Request, fid: FeatureID, aid: AttachmentID) -> JSONType:
@@ -207,61 +193,62 @@ def export(resource, request: Request):
     )
 
     metadata_items = dict[str, MetadataItem]()
+    items = list()
+
+    current_feature_id = None
+    feature_anames = set()
+    att_idx = 1
 
-    with NamedTemporaryFile(suffix=".zip") as tmp_file:
-        with ZipFile(tmp_file, "w", ZIP_DEFLATED, allowZip64=True) as zipf:
-            current_feature_id = None
-            feature_anames = set()
+    for obj in query:
+        if obj.feature_id != current_feature_id:
+            feature_anames.clear()
             att_idx = 1
+            current_feature_id = obj.feature_id
+        else:
+            att_idx += 1
+
+        name = obj.name
+        if name is None or name.strip() == "":
+            extension = guess_extension(obj.mime_type) or ".bin"
+            name = f"{att_idx:010d}{extension}"
+
+        if name in feature_anames:
+            # Make attachment's name unique by adding a numeric suffix before the extension
+            if m := re.match(r"(.*?)((?:\.[a-z0-9_]+)+)?$", name, re.IGNORECASE):
+                base, suffix = m.groups()
+            else:
+                base, suffix = name, ""
+
+            for idx in count(1):
+                candidate = f"{base}.{idx}{suffix}"
+                if candidate not in feature_anames:
+                    name = candidate
+                    break
+
+        feature_anames.add(name)
+        arcname = f"{obj.feature_id:010d}/{name}"
+
+        metadata_item = metadata_items[arcname] = MetadataItem(
+            id=obj.extension_id,
+            feature_id=obj.feature_id,
+            name=obj.name,
+            mime_type=obj.mime_type,
+        )
+        if obj.keyname is not None:
+            metadata_item.keyname = obj.keyname
+        if obj.description is not None:
+            metadata_item.description = obj.description
 
-            for obj in query:
-                if obj.feature_id != current_feature_id:
-                    feature_anames.clear()
-                    att_idx = 1
-                    current_feature_id = obj.feature_id
-                else:
-                    att_idx += 1
-
-                name = obj.name
-                if name is None or name.strip() == "":
-                    extension = guess_extension(obj.mime_type) or ".bin"
-                    name = f"{att_idx:010d}{extension}"
-
-                if name in feature_anames:
-                    # Make attachment's name unique by adding a numeric suffix before the extension
-                    if m := re.match(r"(.*?)((?:\.[a-z0-9_]+)+)?$", name, re.IGNORECASE):
-                        base, suffix = m.groups()
-                    else:
-                        base, suffix = name, ""
-
-                    for idx in count(1):
-                        candidate = f"{base}.{idx}{suffix}"
-                        if candidate not in feature_anames:
-                            name = candidate
-                            break
-
-                feature_anames.add(name)
-                arcname = f"{obj.feature_id:010d}/{name}"
-
-                metadata_item = metadata_items[arcname] = MetadataItem(
-                    id=obj.extension_id,
-                    feature_id=obj.feature_id,
-                    name=obj.name,
-                    mime_type=obj.mime_type,
-                )
-                if obj.keyname is not None:
-                    metadata_item.keyname = obj.keyname
-                if obj.description is not None:
-                    metadata_item.description = obj.description
-
-                zipf.write(obj.fileobj.filename(), arcname=arcname)
-
-            metadata = Metadata(items=metadata_items)
-            zipf.writestr("metadata.json", msgspec_dumpb(metadata))
-
-        response = FileResponse(tmp_file.name, content_type="application/zip")
-        response.content_disposition = 'attachment; filename="%d.attachments.zip"' % resource.id
-        return response
+        items.append((arcname, obj.fileobj.filename(), not is_compressed(obj.mime_type)))
+
+    metadata = Metadata(items=metadata_items)
+    items.append(("metadata.json", msgspec_dumpb(metadata), True))
+
+    # Archive is generated while sending, only files are read there, so
+    # the request transaction isn't needed.
+    response = Response(app_iter=zip_stream(items), content_type="application/zip")
+    response.content_disposition = 'attachment; filename="%d.attachments.zip"' % resource.id
+    return response
 
 
 def import_attachment(resource, request: Request) -> JSONType:
@@ -322,16 +309,11 @@ def bundle(
                 break
 
         assert arc_name is not None
-        afiles.append((fa.fileobj.filename(), arc_name))
-
-    with NamedTemporaryFile(suffix=".zip") as tmp_file:
-        with ZipFile(tmp_file, "w", ZIP_DEFLATED, allowZip64=True) as zipf:
-            for afile in afiles:
-                zipf.write(*afile)
+        afiles.append((arc_name, fa.fileobj.filename(), not is_compressed(fa.mime_type)))
 
-        response = FileResponse(tmp_file.name, content_type="application/zip")
-        response.content_disposition = 'attachment; filename="bundle.zip"'
-        return response
+    response = Response(app_iter=zip_stream(afiles), content_type="application/zip")
+    response.content_disposition = 'attachment; filename="bundle.zip"'
+    return response
 
 
 def setup_pyramid(comp: FeatureAttachmentComponent, config):
@@ -1,11 +1,15 @@
+import os.path
+
 import transaction
 
 from nextgisweb.env import Component, gettext, require
-from nextgisweb.lib.config import Option
+from nextgisweb.lib.config import Option, SizeInBytes
+from nextgisweb.lib.logging import logger
 from nextgisweb.lib.pilhelper import heif_init
 
-from nextgisweb.core import KindOfData
+from nextgisweb.core import CoreComponent, KindOfData
 
+from .image_cache import ImageCache, parse_image_size
 from .model import FeatureAttachment
 
 
@@ -20,6 +24,19 @@ class FeatureAttachmentComponent(Component):
         heif_init()
         from . import extension  # noqa: F401
 
+        core = self.env.component(CoreComponent)
+        self.image_cache = (
+            ImageCache(
+                os.path.join(core.gtsdir(self), "image_cache"),
+                self.options["image_cache.max_size"],
+            )
+            if self.options["image_cache.enabled"]
+            else None
+        )
+        self.image_pregenerate = [
+            parse_image_size(v) for v in self.options["image_cache.pregenerate"]
+        ]
+
     def setup_pyramid(self, config):
         from . import api, view  # noqa: F401
 
@@ -31,6 +48,11 @@ class FeatureAttachmentComponent(Component):
             for obj in FeatureAttachment.filter_by(file_meta=None):
                 obj.extract_meta()
 
+        if self.image_cache is not None:
+            logger.info("Evicting image cache entries...")
+            deleted = self.image_cache.evict()
+            logger.info("Deleted: %d image cache entries.", deleted)
+
     def estimate_storage(self):
         for obj in FeatureAttachment.query():
             yield FeatureAttachmentData, obj.resource_id, obj.fileobj.size
@@ -38,5 +60,10 @@ class FeatureAttachmentComponent(Component):
     # fmt: off
     option_annotations = (
         Option("webmap.bundle", bool, default=False),
+        Option("image_cache.enabled", bool, default=True, doc="Enable resized image cache."),
+        Option("image_cache.max_size", SizeInBytes, default=2**30, doc="Resized image cache size limit."),
+        Option("image_cache.pregenerate", list, default=[], doc=(
+            "Image sizes generated upon upload in WIDTHxHEIGHT[:crop] "
+            "format, for example, 64x64:crop.")),
     )
     # fmt: on
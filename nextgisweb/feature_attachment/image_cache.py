@@ -0,0 +1,140 @@
+import os
+import os.path
+import re
+from io import BytesIO
+from pathlib import Path
+from threading import Lock
+from uuid import uuid4
+
+from PIL import Image
+from PIL.Image import Resampling
+
+from .exif import EXIF_ORIENTATION_TAG, ORIENTATIONS
+from .util import crop_to_aspect_ratio
+
+IMAGE_SIZE_RE = re.compile(r"^(\d+)x(\d+)(:crop)?$")
+
+# Eviction frees up space to this fraction of the size limit, so it doesn't
+# run on every write to a full cache
+EVICT_RATIO = 0.9
+
+
+def parse_image_size(value):
+    """Parse image size in WIDTHxHEIGHT[:crop] format"""
+
+    if (m := IMAGE_SIZE_RE.match(value)) is None:
+        raise ValueError(f"Invalid image size: {value}")
+    return int(m[1]), int(m[2]), m[3] is not None
+
+
+def resize_image(fn, width, height, *, crop):
+    """Resize image file taking EXIF orientation into account
+
+    Returns encoded image data in the original format or None if the image
+    already has the requested size."""
+
+    image = Image.open(fn)
+    if (width, height) == image.size:
+        return None
+
+    ext = image.format
+
+    try:
+        exif = image._getexif()
+    except Exception:
+        pass
+    else:
+        if exif is not None:
+            otag = exif.get(EXIF_ORIENTATION_TAG)
+            if otag in (3, 6, 8):
+                orientation = ORIENTATIONS[otag]
+                image = image.transpose(orientation.degrees)
+
+    if crop:
+        aspect_ratio = width / height
+        image = crop_to_aspect_ratio(image, aspect_ratio)
+    image.thumbnail((width, height), Resampling.LANCZOS)
+
+    buf = BytesIO()
+    image.save(buf, ext)
+    return buf.getvalue()
+
+
+class ImageCache:
+    """Disk cache of resized attachment images
+
+    Entries are keyed by FileObj UUID, size and crop flag, and FileObj
+    contents never change, so entries never become stale. Reading an entry
+    updates its modification time, and least recently used entries are
+    evicted when the total size exceeds the limit."""
+
+    def __init__(self, path, max_size):
+        self.path = Path(path)
+        self.max_size = max_size
+        self._written = 0
+        self._lock = Lock()
+
+    def filename(self, uuid, width, height, crop):
+        suffix = "c" if crop else ""
+        return self.path / uuid[0:2] / uuid[2:4] / f"{uuid}-{width}x{height}{suffix}"
+
+    def get(self, uuid, width, height, crop):
+        fn = self.filename(uuid, width, height, crop)
+        try:
+            os.utime(fn)
+        except FileNotFoundError:
+            return None
+        return fn
+
+    def put(self, uuid, width, height, crop, data):
+        fn = self.filename(uuid, width, height, crop)
+        fn.parent.mkdir(parents=True, exist_ok=True)
+
+        tmp = fn.with_name(f"{fn.name}.{uuid4().hex}.tmp")
+        tmp.write_bytes(data)
+        os.replace(tmp, fn)
+
+        # Other processes write to the cache too, so the total size is only
+        # checked after writing a fraction of the limit.
+        with self._lock:
+            self._written += len(data)
+            if evict := self._written > self.max_size * (1 - EVICT_RATIO):
+                self._written = 0
+        if evict:
+            self.evict()
+
+        return fn
+
+    def evict(self):
+        """Remove least recently used entries if the size limit is exceeded
+
+        :returns: Number of deleted entries"""
+
+        entries, total = [], 0
+        for dirpath, dirnames, filenames in os.walk(self.path):
+            for name in filenames:
+                fn = os.path.join(dirpath, name)
+                try:
+                    stat = os.stat(fn)
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, fn))
+                total += stat.st_size
+
+        if total <= self.max_size:
+            return 0
+
+        entries.sort()
+        deleted = 0
+        for _, size, fn in entries:
+            if total <= self.max_size * EVICT_RATIO:
+                break
+            try:
+                os.remove(fn)
+            except FileNotFoundError:
+                pass
+            else:
+                deleted += 1
+            total -= size
+
+        return deleted
@@ -25,6 +25,7 @@ from nextgisweb.file_storage import FileObj
 from nextgisweb.file_upload import FileUpload
 from nextgisweb.resource import Resource
 
+from .image_cache import resize_image
 from .util import change_suffix
 
 Base.depends_on("resource", "feature_layer")
@@ -151,6 +152,22 @@ class FeatureAttachment(Base, FVersioningExtensionMixin):
                         )
         self.file_meta = _file_meta
 
+    def pregenerate_images(self):
+        from .component import FeatureAttachmentComponent
+
+        comp = FeatureAttachmentComponent.current()
+        if (cache := comp.image_cache) is None or not self.is_image:
+            return
+
+        fn, uuid = self.fileobj.filename(), self.fileobj.uuid
+        for width, height, crop in comp.image_pregenerate:
+            try:
+                data = resize_image(fn, width, height, crop=crop)
+            except (UnidentifiedImageError, DecompressionBombError):
+                return
+            if data is not None:
+                cache.put(uuid, width, height, crop, data)
+
     @property
     def is_image(self):
         return self.mime_type in ("image/jpeg", "image/png")
@@ -185,6 +202,7 @@ class FeatureAttachment(Base, FVersioningExtensionMixin):
             self.fileobj = source.to_fileobj()
 
         self.extract_meta()
+        self.pregenerate_images()
         return self
 
     def deserialize(self, data):
@@ -453,6 +453,34 @@ def test_heic(layer_id, clear, ngw_file_upload, ngw_webtest_app: WebTestApp, ngw
     assert resp.json["name"] == "sample.jpg"
 
 
+def test_image(layer_id, clear, ngw_file_upload, ngw_webtest_app: WebTestApp, tmp_path):
+    img_path = tmp_path / "image.png"
+    Image.new("RGB", (400, 300), "red").save(img_path)
+
+    url = f"/api/resource/{layer_id}/feature/1/attachment/"
+    resp = ngw_webtest_app.post(url, json={"file_upload": ngw_file_upload(img_path)})
+    image_url = url + str(resp.json["id"]) + "/image"
+
+    resp = ngw_webtest_app.get(image_url, query=dict(size="64x64", crop="true"), status=200)
+    assert Image.open(BytesIO(resp.body)).size == (64, 64)
+    etag = resp.headers["ETag"]
+
+    cached = ngw_webtest_app.get(image_url, query=dict(size="64x64", crop="true"), status=200)
+    assert cached.body == resp.body
+    assert cached.headers["ETag"] == etag
+
+    ngw_webtest_app.get(
+        image_url,
+        query=dict(size="64x64", crop="true"),
+        headers={"If-None-Match": etag},
+        status=304,
+    )
+
+    resp = ngw_webtest_app.get(image_url, query=dict(size="64x64"), status=200)
+    assert Image.open(BytesIO(resp.body)).size == (64, 48)
+    assert resp.headers["ETag"] != etag
+
+
 @pytest.fixture(scope="module")
 def panorama_jpg(ngw_file_upload, ngw_data_path):
     yield dict(ngw_file_upload(ngw_data_path / "panorama.jpg"))
@@ -0,0 +1,26 @@
+from io import BytesIO
+from zipfile import ZIP_DEFLATED, ZIP_STORED, ZipFile
+
+from ..util import zip_stream
+
+
+def test_zip_stream(tmp_path):
+    fn = tmp_path / "data.bin"
+    fn.write_bytes(b"0" * 2**21)
+
+    items = [
+        ("00001/data.bin", fn, True),
+        ("00001/image.jpg", fn, False),
+        ("metadata.json", b"{}", True),
+    ]
+    chunks = list(zip_stream(items))
+    assert len(chunks) > 2
+
+    with ZipFile(BytesIO(b"".join(chunks))) as zipf:
+        assert zipf.testzip() is None
+        assert [(i.filename, i.compress_type, i.file_size) for i in zipf.infolist()] == [
+            ("00001/data.bin", ZIP_DEFLATED, 2**21),
+            ("00001/image.jpg", ZIP_STORED, 2**21),
+            ("metadata.json", ZIP_DEFLATED, 2),
+        ]
+        assert zipf.read("metadata.json") == b"{}"
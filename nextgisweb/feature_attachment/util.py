@@ -1,7 +1,26 @@
+import os
 from pathlib import Path
+from time import localtime
+from zipfile import ZIP_DEFLATED, ZIP_STORED, ZipFile, ZipInfo
 
 from PIL.Image import Image
 
+BUF_SIZE = 1024 * 1024
+
+# Data of these types is already compressed, so deflating it is pointless
+COMPRESSED_MIME_TYPES = (
+    "image/jpeg",
+    "image/png",
+    "image/gif",
+    "image/webp",
+    "image/heic",
+    "application/zip",
+    "application/gzip",
+    "application/x-7z-compressed",
+    "application/x-rar-compressed",
+)
+COMPRESSED_MIME_PREFIXES = ("video/", "audio/")
+
 
 def change_suffix(name: str, suffix: str) -> str:
     p = Path(name)
@@ -20,3 +39,67 @@ def crop_to_aspect_ratio(image: Image, k: float) -> Image:
     else:
         dh = (h - w / k) // 2
     return image.crop((0 + dw, 0 + dh, w - dw, h - dh))
+
+
+def is_compressed(mime_type: str | None) -> bool:
+    return mime_type is not None and (
+        mime_type in COMPRESSED_MIME_TYPES or mime_type.startswith(COMPRESSED_MIME_PREFIXES)
+    )
+
+
+class _ZipBuffer:
+    # Unseekable file object, so ZipFile writes data descriptors after file
+    # data instead of seeking back to local headers.
+
+    def __init__(self):
+        self.chunks = []
+        self.offset = 0
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.offset += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.offset
+
+    def flush(self):
+        pass
+
+    def take(self):
+        data = b"".join(self.chunks)
+        self.chunks.clear()
+        return data
+
+
+def zip_stream(items):
+    """Generate ZIP archive data chunk by chunk
+
+    :param items: Iterable of (arcname, source, compress) tuples, where source
+        is a file path or bytes, and compress enables deflate compression"""
+
+    buf = _ZipBuffer()
+    with ZipFile(buf, "w", allowZip64=True) as zipf:
+        for arcname, source, compress in items:
+            zinfo = ZipInfo(arcname, date_time=localtime()[:6])
+            zinfo.compress_type = ZIP_DEFLATED if compress else ZIP_STORED
+            zinfo.external_attr = 0o644 << 16
+
+            # With the known file size, ZIP64 extensions are used if needed
+            if isinstance(source, bytes):
+                zinfo.file_size = len(source)
+                with zipf.open(zinfo, "w") as dst:
+                    dst.write(source)
+            else:
+                zinfo.file_size = os.path.getsize(source)
+                with open(source, "rb") as src, zipf.open(zinfo, "w") as dst:
+                    while data := src.read(BUF_SIZE):
+                        dst.write(data)
+                        if chunk := buf.take():
+                            yield chunk
+
+            if chunk := buf.take():
+                yield chunk
+
+    if chunk := buf.take():
+        yield chunk
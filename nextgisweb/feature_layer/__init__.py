@@ -16,10 +16,13 @@ from .interface import (
     IFeatureQueryClipByBox,
     IFeatureQueryFilter,
     IFeatureQueryFilterBy,
+    IFeatureQueryGML,
     IFeatureQueryIlike,
     IFeatureQueryIntersects,
     IFeatureQueryLike,
+    IFeatureQueryMVT,
     IFeatureQueryOrderBy,
+    IFeatureQuerySeek,
     IFeatureQuerySimplify,
     IFieldEditableFeatureLayer,
     IFilterableFeatureLayer,
@@ -30,8 +33,11 @@ from .interface import (
 from .model import (
     FeatureLayerMixin,
     FeatureLayerTransactionContext,
+    FeatureQueryGMLMixin,
     FeatureQueryIntersectsMixin,
+    FeatureQuerySeekMixin,
     LayerField,
 )
+from .mvt_cache import FeatureLayerMVTCache, mvt_cache_invalidate, mvt_cache_invalidate_all
 from .transaction import FeatureLayerTransaction
 from .versioning import FVersioningMeta, FVersioningObj
@@ -1,15 +1,21 @@
 import re
+from base64 import urlsafe_b64decode, urlsafe_b64encode
 from dataclasses import dataclass
 from functools import cached_property, partial
+from itertools import batched
 from typing import Annotated, Any, Literal
 
+import msgspec.json
 import msgspec.structs
+import transaction
 from msgspec import UNSET, Meta, Struct, UnsetType
+from pyramid.response import Response
 from sqlalchemy.exc import NoResultFound
 
-from nextgisweb.env import gettext, gettextf
+from nextgisweb.env import DBSession, gettext, gettextf
 from nextgisweb.lib.apitype import AsJSON, Query
 from nextgisweb.lib.geometry import Geometry, GeometryNotValid, Transformer, geom_area, geom_length
+from nextgisweb.lib.json import dumpb as json_dumpb
 from nextgisweb.lib.json import loads as json_loads
 
 from nextgisweb.core.exception import ValidationError
@@ -33,6 +39,7 @@ from .interface import (
     IFeatureLayer,
     IFeatureQueryIlike,
     IFeatureQueryLike,
+    IFeatureQuerySeek,
     IFilterableFeatureLayer,
     IWritableFeatureLayer,
 )
@@ -59,6 +66,8 @@ ParamBigIntFormat = Annotated[
 ]
 ParamSrs = Annotated[int, Meta(gt=0)] | None
 
+STREAM_BATCH_SIZE = 100
+
 csetting("versioning_default", bool | None, default=None)
 
 
@@ -275,6 +284,61 @@ def query_feature_or_not_found(query, resource_id, feature_id):
     raise FeatureNotFound(resource_id, feature_id)
 
 
+def stream_json_array(items, *, head=b"", tail=b""):
+    """Encode items as a JSON array by batches
+
+    :param head: Bytes preceding the array
+    :param tail: Bytes following the array or a callable returning them,
+        which is called after all items have been consumed"""
+
+    yield head + b"["
+    sep = b""
+    for batch in batched(items, STREAM_BATCH_SIZE):
+        yield sep + json_dumpb(batch)[1:-1]
+        sep = b","
+    yield b"]" + (tail() if callable(tail) else tail)
+
+
+def stream_response(app_iter, *, content_type="application/json"):
+    """Make a response iterating over app_iter in a separate transaction
+
+    The request transaction is completed before the response body is sent, so
+    app_iter must not use objects loaded within the request transaction."""
+
+    def wrapped():
+        try:
+            with transaction.manager:
+                yield from app_iter
+        finally:
+            DBSession.remove()
+
+    return Response(app_iter=wrapped(), content_type=content_type)
+
+
+def seek_cursor_dump(feature, order_by):
+    """Make an opaque keyset pagination cursor pointing after the feature"""
+
+    key = [feature.fields[k] for _, k in order_by] + [feature.id]
+    return urlsafe_b64encode(msgspec.json.encode(key)).decode("ascii")
+
+
+def seek_cursor_load(query, cursor, order_by):
+    """Apply keyset pagination cursor to a feature query"""
+
+    if not IFeatureQuerySeek.providedBy(query):
+        raise ValidationError(message=gettext("Cursor pagination is not supported."))
+
+    try:
+        key = msgspec.json.decode(urlsafe_b64decode(cursor))
+    except (ValueError, msgspec.DecodeError):
+        key = None
+
+    if not isinstance(key, list) or len(key) != len(order_by) + 1 or type(key[-1]) is not int:
+        raise ValidationError(message=gettext("Invalid cursor."))
+
+    query.seek(key)
+
+
 def feature_query_pit(resource, feature_query, version, epoch):
     if version is None:
         return
@@ -477,23 +541,20 @@ def cget(
     limit: Annotated[int, Meta(ge=0)] | None = None,
     offset: Annotated[int, Meta(ge=0)] = 0,
     filter: Annotated[str | None, Meta(description="Filter expression (JSON string)")] = None,
+    cursor: Annotated[
+        str | None,
+        Meta(description="Keyset pagination cursor from the next link of the previous page"),
+    ] = None,
 ) -> JSONType:
     """Read features
 
+    If a page is full, a link to the next page is returned in the Link
+    header. It uses keyset pagination which doesn't depend on the page
+    position, unlike offset.
+
     :returns: List of features"""
     request.resource_permission(DataScope.read)
 
-    dumper = Dumper(resource, dumper_params)
-    query = dumper.feature_query()
-
-    # Paging
-    if limit is not None:
-        query.limit(limit, offset)
-
-    apply_fields_filter(query, request)
-    apply_intersect_filter(query, request, resource)
-    apply_filter_expression(query, resource, filter)
-
     # Ordering
     order_by_ = []
     if order_by is not None:
@@ -503,10 +564,54 @@ def cget(
                 order = ["asc", "desc"][order == "-"]
                 order_by_.append([order, colname])
 
-    if order_by_:
-        query.order_by(*order_by_)
+    if cursor is not None and offset > 0:
+        raise ValidationError(message=gettext("Offset can't be used with cursor."))
+
+    def feature_query(resource):
+        dumper = Dumper(resource, dumper_params)
+        query = dumper.feature_query()
+
+        # Paging
+        if limit is not None:
+            query.limit(limit, offset)
+
+        apply_fields_filter(query, request)
+        apply_intersect_filter(query, request, resource)
+        apply_filter_expression(query, resource, filter)
 
-    return [dumper(feature) for feature in query()]
+        if order_by_:
+            query.order_by(*order_by_)
+
+        if cursor is not None:
+            seek_cursor_load(query, cursor, order_by_)
+
+        return dumper, query
+
+    # Validate parameters before the response is started
+    dumper, query = feature_query(resource)
+
+    if limit is None:
+        resource_id = resource.id
+
+        def features():
+            dumper, query = feature_query(Resource.filter_by(id=resource_id).one())
+            for feature in query():
+                yield dumper(feature)
+
+        # Unpaged results can be huge, so they are encoded by batches
+        return stream_response(stream_json_array(features()))
+
+    result = []
+    for feature in query():
+        result.append(dumper(feature))
+
+    if limit and len(result) == limit and IFeatureQuerySeek.providedBy(query):
+        params = [(k, v) for k, v in request.GET.items() if k not in ("offset", "cursor")]
+        params.append(("cursor", seek_cursor_dump(feature, order_by_)))
+        next_url = request.current_route_url(_query=params)
+        request.response.headers["Link"] = f'<{next_url}>; rel="next"'
+
+    return result
 
 
 def cpost(
@@ -1,9 +1,8 @@
+from time import time
 from typing import Annotated
-from uuid import uuid4
 
 from msgspec import UNSET, Meta, UnsetType
-from osgeo import gdal, ogr
-from pyramid.httpexceptions import HTTPNoContent, HTTPNotFound
+from pyramid.httpexceptions import HTTPNoContent
 from pyramid.response import Response
 from shapely.geometry import box
 from sqlalchemy.exc import NoResultFound
@@ -19,17 +18,9 @@ from nextgisweb.resource import DataScope, Resource
 from nextgisweb.resource.exception import ResourceNotFound
 from nextgisweb.spatial_ref_sys import SRS
 
-from .api_export import _ogr_layer_from_features
 from .component import FeatureLayerComponent
-from .interface import GEOM_TYPE, IFeatureLayer, IFeatureQueryClipByBox, IFeatureQuerySimplify
-from .ogrdriver import MVT_DRIVER_EXIST
-
-
-def _ogr_ds(driver, options):
-    return ogr.GetDriverByName(driver).CreateDataSource(
-        "/vsimem/%s" % uuid4(),
-        options=options,
-    )
+from .interface import GEOM_TYPE, IFeatureLayer, IFeatureQueryMVT
+from .mvt import encode_layer
 
 
 def mvt(
@@ -49,15 +40,21 @@ def mvt(
     """Get MVT tile for one or more resources
 
     :returns: Mapbox Vector Tile binary data"""
-    if not MVT_DRIVER_EXIST:
-        raise HTTPNotFound(explanation="MVT GDAL driver not found")
+    # Only tiles with default parameters are cached
+    cacheable = (
+        FeatureLayerComponent.current().mvt_cache_enabled
+        and extent == 4096
+        and simplification is UNSET
+        and padding == 0.05
+    )
 
     if simplification is UNSET:
         simplification = extent / 512
 
     # web mercator
     merc = SRS.filter_by(id=3857).one()
-    minx, miny, maxx, maxy = merc.tile_extent((z, x, y))
+    bounds = merc.tile_extent((z, x, y))
+    minx, miny, maxx, maxy = bounds
 
     bbox = (
         minx - (maxx - minx) * padding,
@@ -67,19 +64,14 @@ def mvt(
     )
     bbox = Geometry.from_shape(box(*bbox), srid=merc.id)
 
-    options = [
-        "FORMAT=DIRECTORY",
-        "TILE_EXTENSION=pbf",
-        "MINZOOM=%d" % z,
-        "MAXZOOM=%d" % z,
-        "EXTENT=%d" % extent,
-        "COMPRESS=NO",
-    ]
-
-    ds = _ogr_ds("MVT", options)
-
-    vsibuf = ds.GetName()
+    buffer = round(extent * padding)
+    tolerance = ((merc.maxx - merc.minx) / (1 << z)) / extent * simplification
+    if tolerance <= 0:
+        tolerance = None
 
+    # Each layer is encoded as a separate Tile message with a single layer,
+    # and concatenation of such messages is a valid tile.
+    content = []
     for resid in resource:
         try:
             obj = Resource.filter_by(id=resid).one()
@@ -96,43 +88,49 @@ def mvt(
                 gettextf("Resource (ID={}) has no geometry, MVT tiles are not available.")(resid)
             )
 
+        cache = obj.mvt_cache if cacheable else None
+        if cache is not None and cache.cacheable(z):
+            if (data := cache.get_tile((z, x, y))) is not None:
+                content.append(data)
+                continue
+            started = time()
+        else:
+            cache = None
+
+        name = f"ngw:{obj.id}"
         query = obj.feature_query()
         query.intersects(bbox)
-        query.geom()
 
-        if IFeatureQueryClipByBox.providedBy(query):
-            query.clip_by_box(bbox)
-
-        if IFeatureQuerySimplify.providedBy(query):
-            tolerance = ((obj.srs.maxx - obj.srs.minx) / (1 << z)) / extent
-            query.simplify(tolerance * simplification)
-
-        _ogr_layer_from_features(obj, query(), name=f"ngw:{obj.id}", ds=ds)
-
-    # Flush changes
-    ds = None
+        if IFeatureQueryMVT.providedBy(query):
+            data = query.mvt(
+                bounds,
+                name=name,
+                extent=extent,
+                buffer=buffer,
+                simplify=tolerance,
+            )
+        else:
+            query.srs(merc)
+            query.geom()
+            data = encode_layer(
+                query(),
+                name=name,
+                bounds=bounds,
+                extent=extent,
+                buffer=buffer,
+                simplify=tolerance,
+            )
 
-    try:
-        f = gdal.VSIFOpenL(f"{vsibuf}/{z}/{x}/{y}.pbf", "rb")
-        if f is not None:
-            # SEEK_END = 2
-            gdal.VSIFSeekL(f, 0, 2)
-            size = gdal.VSIFTellL(f)
+        if cache is not None:
+            cache.put_tile((z, x, y), data, started)
 
-            # SEEK_SET = 0
-            gdal.VSIFSeekL(f, 0, 0)
-            content = bytes(gdal.VSIFReadL(1, size, f))
-            gdal.VSIFCloseL(f)
+        content.append(data)
 
-            return Response(
-                content,
-                content_type="application/vnd.mapbox-vector-tile",
-            )
-        else:
-            raise HTTPNoContent()
+    content = b"".join(content)
+    if len(content) == 0:
+        raise HTTPNoContent()
 
-    finally:
-        gdal.Unlink(vsibuf)
+    return Response(content, content_type="application/vnd.mapbox-vector-tile")
 
 
 def setup_pyramid(comp: FeatureLayerComponent, config):
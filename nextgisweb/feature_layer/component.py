@@ -1,5 +1,12 @@
-from nextgisweb.env import Component, require
+import os
+import os.path
+from uuid import UUID
+
+import transaction
+
+from nextgisweb.env import Component, DBSession, require
 from nextgisweb.lib.config import Option
+from nextgisweb.lib.logging import logger
 
 from nextgisweb.core.component import CoreComponent
 
@@ -15,6 +22,22 @@ class FeatureLayerComponent(Component):
     def initialize(self):
         self.FeatureExtension = FeatureExtension
         self.export_limit = self.options["export.limit"]
+        self.query_fetch_size = self.options["query.fetch_size"]
+
+        core = self.env.component(CoreComponent)
+        self.mvt_cache_enabled = self.options["mvt_cache.enabled"]
+        self.mvt_cache_path = os.path.join(core.gtsdir(self), "mvt_cache")
+
+    def query_execution_options(self, limit):
+        """Execution options of a feature query with the limit
+
+        Rows are fetched through a server-side cursor only if their number can
+        exceed the fetch size, as the cursor costs extra round-trips."""
+
+        fetch_size = self.query_fetch_size
+        if fetch_size > 0 and (limit is None or limit > fetch_size):
+            return dict(yield_per=fetch_size)
+        return dict()
 
     @require("resource")
     def setup_pyramid(self, config):
@@ -23,6 +46,38 @@ class FeatureLayerComponent(Component):
         view.setup_pyramid(self, config)
         api.setup_pyramid(self, config)
 
+    def maintenance(self):
+        self.cleanup_mvt_cache()
+
+    def cleanup_mvt_cache(self):
+        from .mvt_cache import FeatureLayerMVTCache
+
+        logger.info("Cleaning up MVT cache files...")
+
+        with transaction.manager:
+            uuid_keep = {
+                row.uuid.hex
+                for row in DBSession.query(FeatureLayerMVTCache.uuid).filter_by(enabled=True)
+            }
+
+        deleted_files = 0
+        for dirpath, dirnames, filenames in os.walk(self.mvt_cache_path, topdown=False):
+            for fn in filenames:
+                uuid = fn[:-4] if fn.endswith(("-shm", "-wal")) else fn
+                try:
+                    UUID(hex=uuid, version=4)
+                except ValueError:
+                    logger.warning("File %s unrecognized, skipping...", os.path.join(dirpath, fn))
+                    continue
+                if uuid not in uuid_keep:
+                    os.remove(os.path.join(dirpath, fn))
+                    deleted_files += 1
+
+            if dirpath != self.mvt_cache_path and len(os.listdir(dirpath)) == 0:
+                os.rmdir(dirpath)
+
+        logger.info("Deleted: %d MVT cache files.", deleted_files)
+
     @property
     def versioning_default(self):
         return self.env.component(CoreComponent).settings_get(
@@ -34,6 +89,10 @@ class FeatureLayerComponent(Component):
     # fmt: off
     option_annotations = (
         Option("export.limit", int, default=None, doc="The export limit"),
+        Option("query.fetch_size", int, default=1000, doc=(
+            "Number of rows fetched at once by feature queries using "
+            "server-side cursors, 0 to fetch all rows at once.")),
         Option("versioning.default", bool, default=True),
+        Option("mvt_cache.enabled", bool, default=True, doc="Enable MVT tile cache"),
     )
     # fmt: on
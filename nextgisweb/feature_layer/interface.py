@@ -243,6 +243,12 @@ class IFeatureQueryIntersects(IFeatureQuery):
         """Set query by spatial intersection"""
 
 
+class IFeatureQuerySeek(IFeatureQuery):
+    def seek(self, after):
+        """Set keyset pagination key: a sequence of order_by fields values
+        of the last feature followed by its ID"""
+
+
 class IFeatureQueryClipByBox(IFeatureQuery):
     def clip_by_box(self, box):
         """Clip geometry by bbox"""
@@ -253,6 +259,19 @@ class IFeatureQuerySimplify(IFeatureQuery):
         """Simplify geometry by the given tolerance"""
 
 
+class IFeatureQueryMVT(IFeatureQuery):
+    def mvt(self, bounds, *, name, extent, buffer, simplify):
+        """Encode features as a MVT layer within tile bounds in EPSG:3857
+        and return protobuf encoded tile or empty bytes"""
+
+
+class IFeatureQueryGML(IFeatureQuery):
+    def gml(self, version, *, id_prefix):
+        """Load geometries encoded as GML strings of the given version (2 or 3)
+        instead of Geometry objects, GML IDs are made of the prefix and the
+        feature ID"""
+
+
 class IAggregatableFeatureQuery(IFeatureQuery):
     supported_aggregations = Attribute("Supported aggregation identities")
 
@@ -0,0 +1,17 @@
+/*** {
+    "revision": "5e1a7c93", "parents": ["76a5b417"],
+    "date": "2026-10-18T00:00:00",
+    "message": "MVT cache"
+} ***/
+
+CREATE TABLE feature_layer_mvt_cache (
+    resource_id integer NOT NULL,
+    uuid uuid NOT NULL,
+    enabled boolean NOT NULL,
+    max_z smallint,
+    ttl integer,
+    PRIMARY KEY (resource_id),
+    CONSTRAINT feature_layer_mvt_cache_resource_id_fkey FOREIGN KEY (resource_id) REFERENCES resource(id)
+);
+
+COMMENT ON TABLE feature_layer_mvt_cache IS 'feature_layer';
@@ -0,0 +1,3 @@
+/*** { "revision": "5e1a7c93" } ***/
+
+DROP TABLE feature_layer_mvt_cache;
@@ -29,6 +29,7 @@ from .interface import (
     IAggregatableFeatureQuery,
     IVersionableFeatureLayer,
 )
+from .mvt_cache import mvt_cache_invalidate_all
 
 Base.depends_on("resource", "lookup_table")
 
@@ -342,6 +343,7 @@ class FieldsAttr(SAttribute):
 
         obj.fields = new_fields
         obj.fields.reorder()
+        mvt_cache_invalidate_all(obj)
 
 
 class FVersioningRead(Struct, kw_only=True):
@@ -419,3 +421,66 @@ class FeatureQueryIntersectsMixin:
             geom = transformer.transform(geom)
 
         self._intersects = geom
+
+
+class FeatureQueryGMLMixin:
+    _gml = None
+
+    def gml(self, version, *, id_prefix):
+        assert version in (2, 3)
+        self._gml = (version, id_prefix)
+
+    def gml_expr(self, geomexpr, idcol):
+        """Encode a geometry expression as GML with PostGIS ST_AsGML"""
+
+        version, id_prefix = self._gml
+        digits = sa.literal_column("15")
+        if version == 2:
+            return sa.func.st_asgml(sa.literal_column("2"), geomexpr, digits)
+
+        # Option 4 encodes lines as LineString instead of Curve, and IDs of
+        # sub-geometries are suffixed with their indexes by PostGIS.
+        gml_id = sa.literal(id_prefix, sa.Unicode) + sa.cast(idcol, sa.Unicode)
+        return sa.func.st_asgml(
+            sa.literal_column("3"),
+            geomexpr,
+            digits,
+            sa.literal_column("4"),
+            sa.literal("gml", sa.Unicode),
+            gml_id,
+        )
+
+
+class FeatureQuerySeekMixin:
+    _seek = None
+
+    def seek(self, after):
+        self._seek = tuple(after)
+
+    def seek_clause(self, keys):
+        """Build a WHERE clause selecting rows after the seek key
+
+        :param keys: Sequence of (column, order) pairs in the query order
+            ending with the feature ID column. PostgreSQL puts NULLs last in
+            ascending order and first in descending order, so it's taken
+            into account for nullable columns."""
+
+        assert len(keys) == len(self._seek)
+
+        clause, equal = [], []
+        for (column, order), value in zip(keys, self._seek):
+            if value is not None:
+                value = sa.cast(sa.literal(value), column.type)
+
+            if order == "asc":
+                after = None if value is None else sa.or_(column > value, column.is_(None))
+            elif value is None:
+                after = column.isnot(None)
+            else:
+                after = column < value
+
+            if after is not None:
+                clause.append(sa.and_(*equal, after))
+            equal.append(column.is_(None) if value is None else column == value)
+
+        return sa.or_(*clause) if clause else sa.false()
@@ -0,0 +1,268 @@
+import json
+import struct
+from datetime import date, datetime, time
+
+import numpy as np
+import shapely
+import sqlalchemy as sa
+from sqlalchemy import func
+
+from .interface import FIELD_TYPE
+
+MVT_SRID = 3857
+
+# Geometry types and commands from the Mapbox Vector Tile specification 2.1
+POINT, LINESTRING, POLYGON = 1, 2, 3
+MOVE_TO, LINE_TO, CLOSE_PATH = 1, 2, 7
+
+# Field types which ST_AsMVT can't encode as is: JSON values are expanded into
+# separate properties and temporal values are not supported at all.
+_TEXT_FIELD_TYPES = (FIELD_TYPE.DATE, FIELD_TYPE.TIME, FIELD_TYPE.DATETIME, FIELD_TYPE.JSON)
+
+
+def mvt_query(idcol, geomcol, srid, fields, where, *, bounds, name, extent, buffer, simplify):
+    """Build a query which encodes a MVT layer with PostGIS ST_AsMVT
+
+    :param idcol: Feature ID column
+    :param geomcol: Geometry column in the SRS given by srid
+    :param fields: Sequence of (keyname, column, datatype) for properties
+    :param where: Sequence of WHERE clauses from a feature query context
+    :param bounds: Tile bounds in EPSG:3857
+    :param buffer: Clipping buffer size in tile coordinate units
+    :param simplify: Simplification tolerance in EPSG:3857 units or None"""
+
+    minx, miny, maxx, maxy = bounds
+    pad = (maxx - minx) * buffer / extent
+    clip = func.st_makeenvelope(minx - pad, miny - pad, maxx + pad, maxy + pad, MVT_SRID)
+
+    # Clip geometries before reprojection to avoid transforming its parts far
+    # away from the tile, which can even fail near poles.
+    geom = func.st_force2d(geomcol)
+    if srid != MVT_SRID:
+        geom = func.st_transform(
+            func.st_clipbybox2d(geom, func.st_transform(clip, srid)), MVT_SRID
+        )
+    else:
+        geom = func.st_clipbybox2d(geom, clip)
+
+    if simplify is not None:
+        geom = func.st_simplifypreservetopology(geom, simplify)
+
+    geom = func.st_asmvtgeom(
+        geom,
+        func.st_makeenvelope(*bounds, MVT_SRID),
+        sa.literal_column(str(int(extent))),
+        sa.literal_column(str(int(buffer))),
+        sa.true(),
+    )
+
+    columns = [idcol.label("_mvt_fid"), geom.label("_mvt_geom")]
+    for keyname, column, datatype in fields:
+        if datatype in _TEXT_FIELD_TYPES:
+            column = sa.cast(column, sa.Unicode)
+        columns.append(column.label(keyname))
+
+    subquery = sa.select(*columns).where(*where).order_by(idcol).subquery("q")
+    return (
+        sa.select(
+            func.st_asmvt(
+                sa.literal_column(subquery.name),
+                sa.literal(name, sa.Unicode),
+                sa.literal_column(str(int(extent))),
+                sa.literal("_mvt_geom", sa.Unicode),
+                sa.literal("_mvt_fid", sa.Unicode),
+            )
+        )
+        .select_from(subquery)
+        .where(subquery.c._mvt_geom.isnot(None))
+    )
+
+
+def encode_layer(features, *, name, bounds, extent=4096, buffer=256, simplify=None):
+    """Encode features as a MVT layer without GDAL
+
+    Features geometries are expected in EPSG:3857. Returns protobuf encoded
+    Tile message with a single layer or empty bytes if there is nothing to
+    encode, so results for multiple layers can be concatenated."""
+
+    minx, miny, maxx, maxy = bounds
+    pad = (maxx - minx) * buffer / extent
+    scale = (extent / (maxx - minx), extent / (maxy - miny))
+
+    keys, values = {}, {}
+    encoded = []
+
+    for feature in features:
+        if feature.geom is None:
+            continue
+
+        shape = shapely.clip_by_rect(
+            feature.geom.shape,
+            minx - pad,
+            miny - pad,
+            maxx + pad,
+            maxy + pad,
+        )
+        if simplify is not None:
+            shape = shapely.simplify(shape, simplify, preserve_topology=True)
+
+        gtype, geometry = _encode_geometry(shape, (minx, maxy), scale)
+        if gtype is None:
+            continue
+
+        tags = []
+        for k, v in feature.fields.items():
+            if (value := _encode_value(v)) is None:
+                continue
+            tags.append(keys.setdefault(k, len(keys)))
+            tags.append(values.setdefault(value, len(values)))
+
+        message = b""
+        if feature.id is not None and feature.id >= 0:
+            message += _tag(1, 0) + _varint(feature.id)
+        message += _packed(2, tags) + _tag(3, 0) + _varint(gtype) + _packed(4, geometry)
+        encoded.append(message)
+
+    if len(encoded) == 0:
+        return b""
+
+    layer = _tag(15, 0) + _varint(2) + _bytes(1, name.encode("utf-8"))
+    layer += b"".join(_bytes(2, f) for f in encoded)
+    layer += b"".join(_bytes(3, k.encode("utf-8")) for k in keys)
+    layer += b"".join(_bytes(4, v) for v in values)
+    layer += _tag(5, 0) + _varint(extent)
+    return _bytes(3, layer)
+
+
+def _encode_geometry(shape, origin, scale):
+    points, lines, polygons = [], [], []
+    for part in shapely.get_parts(shape):
+        if isinstance(part, shapely.GeometryCollection):
+            parts = shapely.get_parts(part)
+        else:
+            parts = (part,)
+        for p in parts:
+            if p.is_empty:
+                continue
+            if isinstance(p, (shapely.Point, shapely.MultiPoint)):
+                points.extend(shapely.get_parts(p))
+            elif isinstance(p, (shapely.LineString, shapely.MultiLineString)):
+                lines.extend(shapely.get_parts(p))
+            elif isinstance(p, (shapely.Polygon, shapely.MultiPolygon)):
+                polygons.extend(shapely.get_parts(p))
+
+    def to_tile(geom):
+        coords = shapely.get_coordinates(geom)
+        coords[:, 0] = (coords[:, 0] - origin[0]) * scale[0]
+        coords[:, 1] = (origin[1] - coords[:, 1]) * scale[1]
+        return np.rint(coords).astype(np.int64)
+
+    cursor = np.zeros(2, dtype=np.int64)
+    result = []
+
+    if polygons:
+        for polygon in polygons:
+            exterior = _ring(to_tile(polygon.exterior), True)
+            if exterior is None:
+                continue
+            for ring in (exterior, *(_ring(to_tile(r), False) for r in polygon.interiors)):
+                if ring is not None:
+                    cursor = _line_commands(ring, cursor, result)
+                    result.append(_command(CLOSE_PATH, 1))
+        return (POLYGON, result) if result else (None, None)
+
+    if lines:
+        for line in lines:
+            coords = _dedup(to_tile(line))
+            if len(coords) >= 2:
+                cursor = _line_commands(coords, cursor, result)
+        return (LINESTRING, result) if result else (None, None)
+
+    if points:
+        coords = to_tile(shapely.multipoints(points))
+        deltas = np.diff(coords, axis=0, prepend=cursor[np.newaxis])
+        result.append(_command(MOVE_TO, len(coords)))
+        result.extend(_zigzag(deltas).ravel().tolist())
+        return POINT, result
+
+    return None, None
+
+
+def _dedup(coords):
+    keep = np.any(np.diff(coords, axis=0) != 0, axis=1)
+    return coords[np.concatenate(([True], keep))]
+
+
+def _ring(coords, exterior):
+    # Drop the closing point as it's encoded with the ClosePath command
+    coords = _dedup(coords)
+    if len(coords) > 1 and (coords[0] == coords[-1]).all():
+        coords = coords[:-1]
+    if len(coords) < 3:
+        return None
+
+    # In tile coordinates Y axis goes down, so exterior rings must have
+    # positive area and interior rings negative one.
+    x, y = coords[:, 0], coords[:, 1]
+    area = np.sum(x * np.roll(y, -1) - np.roll(x, -1) * y)
+    if area == 0:
+        return None
+    if (area > 0) != exterior:
+        coords = coords[::-1]
+    return coords
+
+
+def _line_commands(coords, cursor, result):
+    deltas = _zigzag(np.diff(coords, axis=0, prepend=cursor[np.newaxis]))
+    result.append(_command(MOVE_TO, 1))
+    result.extend(deltas[0].tolist())
+    result.append(_command(LINE_TO, len(coords) - 1))
+    result.extend(deltas[1:].ravel().tolist())
+    return coords[-1]
+
+
+def _encode_value(value):
+    if value is None:
+        return None
+    if isinstance(value, bool):
+        return _tag(7, 0) + _varint(int(value))
+    if isinstance(value, int):
+        if value >= 0:
+            return _tag(5, 0) + _varint(value)
+        return _tag(6, 0) + _varint((-value << 1) - 1)
+    if isinstance(value, float):
+        return _tag(3, 1) + struct.pack("<d", value)
+    if isinstance(value, (date, time, datetime)):
+        value = str(value)
+    elif not isinstance(value, str):
+        value = json.dumps(value, ensure_ascii=False)
+    return _bytes(1, value.encode("utf-8"))
+
+
+def _command(cmd, count):
+    return (count << 3) | cmd
+
+
+def _zigzag(values):
+    return (values << 1) ^ (values >> 63)
+
+
+def _varint(value):
+    buf = bytearray()
+    while value > 0x7F:
+        buf.append((value & 0x7F) | 0x80)
+        value >>= 7
+    buf.append(value)
+    return bytes(buf)
+
+
+def _tag(field, wire_type):
+    return _varint((field << 3) | wire_type)
+
+
+def _bytes(field, data):
+    return _tag(field, 2) + _varint(len(data)) + data
+
+
+def _packed(field, values):
+    return _bytes(field, b"".join(_varint(v) for v in values))
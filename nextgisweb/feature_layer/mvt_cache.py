@@ -0,0 +1,365 @@
+import os.path
+import sqlite3
+from functools import lru_cache, wraps
+from pathlib import Path
+from threading import Lock
+from time import time
+from typing import Any
+from uuid import UUID, uuid4
+
+import sqlalchemy as sa
+import sqlalchemy.orm as orm
+import transaction
+from sqlalchemy.orm import Mapped, mapped_column
+
+from nextgisweb.env import Base
+from nextgisweb.lib import saext
+from nextgisweb.lib.logging import logger
+
+from nextgisweb.resource import CRUTypes, Resource, ResourceScope, SAttribute, Serializer
+from nextgisweb.spatial_ref_sys import SRS
+
+from .interface import GEOM_TYPE, IFeatureLayer
+
+SQLITE_CON_CACHE = 32
+SQLITE_TIMEOUT = 10
+
+# Metadata key of the last invalidation time, tiles rendered before it are
+# not written to the cache as they may contain stale data.
+INVALIDATED_KEY = "ngw_invalidated"
+
+
+@lru_cache(SQLITE_CON_CACHE)
+def get_mvt_db(db_path):
+    p = Path(db_path)
+    if not p.parent.exists():
+        p.parent.mkdir(parents=True, exist_ok=True)
+    connection = sqlite3.connect(
+        db_path, isolation_level="DEFERRED", timeout=SQLITE_TIMEOUT, check_same_thread=False
+    )
+
+    cur = connection.cursor()
+    cur.execute("PRAGMA journal_mode = WAL")
+
+    # Tables follow MBTiles 1.3 specification (tile_row is in TMS order), so
+    # the cache can be opened with any MBTiles tool. The tstamp column is an
+    # extension for TTL checks.
+    table_exists = (
+        cur.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name='tiles'").fetchone()
+        is not None
+    )
+
+    if not table_exists:
+        # fmt: off
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS metadata (
+                name TEXT NOT NULL PRIMARY KEY,
+                value TEXT
+            )
+        """)
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS tiles (
+                zoom_level INTEGER NOT NULL,
+                tile_column INTEGER NOT NULL,
+                tile_row INTEGER NOT NULL,
+                tile_data BLOB NOT NULL,
+                tstamp INTEGER NOT NULL,
+                PRIMARY KEY (zoom_level, tile_column, tile_row)
+            )
+        """)
+        # fmt: on
+        cur.executemany(
+            "INSERT OR IGNORE INTO metadata (name, value) VALUES (?, ?)",
+            (("name", p.name), ("format", "pbf")),
+        )
+        connection.commit()
+
+    return connection, Lock()
+
+
+class FeatureLayerMVTCache(Base):
+    __tablename__ = "feature_layer_mvt_cache"
+
+    resource_id: Mapped[int] = mapped_column(sa.ForeignKey(Resource.id), primary_key=True)
+    uuid: Mapped[UUID] = mapped_column(saext.UUID)
+    enabled: Mapped[bool] = mapped_column(sa.Boolean, default=False)
+    max_z: Mapped[int | None] = mapped_column(sa.SmallInteger)
+    ttl: Mapped[int | None] = mapped_column(sa.Integer)
+
+    resource: Mapped[Resource] = orm.relationship(
+        backref=orm.backref(
+            "mvt_cache",
+            uselist=False,
+            cascade="all,delete-orphan",
+        ),
+    )
+
+    def __init__(self, *args, **kwagrs):
+        if "uuid" not in kwagrs:
+            kwagrs["uuid"] = uuid4()
+        self.reconstructor()
+        super().__init__(*args, **kwagrs)
+
+    @orm.reconstructor
+    def reconstructor(self):
+        self._pending = None
+
+    @property
+    def path(self):
+        from .component import FeatureLayerComponent
+
+        cpath = FeatureLayerComponent.current().mvt_cache_path
+        suuid = self.uuid.hex
+
+        return os.path.join(cpath, suuid[0:2], suuid[2:4], suuid)
+
+    def cacheable(self, z):
+        return self.enabled and (self.max_z is None or z <= self.max_z)
+
+    def get_tile(self, tile):
+        """Get MVT tile data from the cache or None if it's missing or expired"""
+
+        z, x, y = tile
+        conn, lock = get_mvt_db(self.path)
+        with lock:
+            row = conn.execute(
+                "SELECT tile_data, tstamp FROM tiles "
+                "WHERE zoom_level = ? AND tile_column = ? AND tile_row = ?",
+                (z, x, (1 << z) - 1 - y),
+            ).fetchone()
+
+        if row is None:
+            return None
+
+        data, tstamp = row
+        if self.ttl is not None and tstamp + self.ttl <= time():
+            return None
+
+        return data
+
+    def put_tile(self, tile, data, started):
+        """Put MVT tile data to the cache
+
+        :param started: Time when the tile rendering started, the tile is
+            skipped if the cache was invalidated after that"""
+
+        z, x, y = tile
+        conn, lock = get_mvt_db(self.path)
+        with lock:
+            try:
+                conn.execute(
+                    "INSERT OR REPLACE INTO tiles "
+                    "(zoom_level, tile_column, tile_row, tile_data, tstamp) "
+                    "SELECT ?, ?, ?, ?, ? WHERE NOT EXISTS ("
+                    "   SELECT 1 FROM metadata WHERE name = ? AND CAST(value AS REAL) > ?"
+                    ")",
+                    (z, x, (1 << z) - 1 - y, data, int(time()), INVALIDATED_KEY, started),
+                )
+                conn.commit()
+            except sqlite3.Error:
+                conn.rollback()
+                logger.exception(
+                    "Failed to put MVT tile to cache for resource %d", self.resource_id
+                )
+
+    def invalidate(self, bounds=None):
+        """Invalidate tiles after the current transaction commit
+
+        :param bounds: Extent in EPSG:3857 or None to invalidate all tiles"""
+
+        txn = transaction.get()
+        if self._pending is None or self._pending[0] is not txn:
+            self._pending = (txn, [])
+            txn.addAfterCommitHook(_invalidate_hook, args=(self.path, self._pending[1]))
+        self._pending[1].append(bounds)
+
+    def invalidated_all(self):
+        """Check if all tiles are going to be invalidated after commit"""
+        return (
+            self._pending is not None
+            and self._pending[0] is transaction.get()
+            and None in self._pending[1]
+        )
+
+    def clear(self):
+        """Clear MVT cache and remove all tiles"""
+        self.uuid = uuid4()
+
+
+def invalidate_tiles(path, bounds):
+    """Delete cached tiles intersecting bounds (in EPSG:3857)
+
+    Tiles are also affected by features within padding of neighbouring tiles,
+    so a margin of a tile fraction is added to the bounds on each zoom."""
+
+    conn, lock = get_mvt_db(path)
+    with lock:
+        try:
+            conn.execute(
+                "INSERT OR REPLACE INTO metadata (name, value) VALUES (?, ?)",
+                (INVALIDATED_KEY, str(time())),
+            )
+
+            if bounds is None:
+                result = conn.execute("DELETE FROM tiles")
+                deleted = result.rowcount
+            else:
+                deleted = 0
+                zmax = conn.execute("SELECT max(zoom_level) FROM tiles").fetchone()[0] or 0
+                for z in range(zmax + 1):
+                    xmin, ymin, xmax, ymax = _tile_range(bounds, z)
+                    result = conn.execute(
+                        "DELETE FROM tiles WHERE zoom_level = ? "
+                        "AND tile_column BETWEEN ? AND ? AND tile_row BETWEEN ? AND ?",
+                        (z, xmin, xmax, (1 << z) - 1 - ymax, (1 << z) - 1 - ymin),
+                    )
+                    deleted += result.rowcount
+
+            conn.commit()
+        except sqlite3.Error:
+            conn.rollback()
+            raise
+
+    return deleted
+
+
+def _tile_range(bounds, z, margin=0.1):
+    # Extent of EPSG:3857 is a square, so tiles are squares too
+    half = 20037508.342789244
+    size = 2 * half / (1 << z)
+    minx, miny, maxx, maxy = bounds
+    last = (1 << z) - 1
+
+    def clamp(v):
+        return max(min(int(v), last), 0)
+
+    return (
+        clamp((minx + half) / size - margin),
+        clamp((half - maxy) / size - margin),
+        clamp((maxx + half) / size + margin),
+        clamp((half - miny) / size + margin),
+    )
+
+
+def _invalidate_hook(status, path, bounds_list):
+    if not status:
+        return
+
+    try:
+        if None in bounds_list:
+            invalidate_tiles(path, None)
+        else:
+            for bounds in bounds_list:
+                invalidate_tiles(path, bounds)
+    except Exception:
+        logger.exception("Failed to invalidate MVT cache %s", path)
+
+
+def mvt_cache_invalidate(func):
+    """Invalidate MVT cache tiles touched by a feature editing method
+
+    Supported methods are feature_create, feature_put, feature_restore,
+    feature_delete and feature_delete_all."""
+
+    name = func.__name__
+
+    @wraps(func)
+    def wrapped(layer, *args, **kwargs):
+        cache = layer.mvt_cache
+        if cache is None or not cache.enabled or cache.invalidated_all():
+            return func(layer, *args, **kwargs)
+
+        if name == "feature_delete_all":
+            result = func(layer, *args, **kwargs)
+            cache.invalidate()
+            return result
+
+        feature = args[0] if len(args) > 0 else next(iter(kwargs.values()))
+
+        if name in ("feature_put", "feature_delete"):
+            fid = feature.id if name == "feature_put" else feature
+            if (bounds := _feature_bounds(layer, fid)) is not None:
+                cache.invalidate(bounds)
+
+        result = func(layer, *args, **kwargs)
+
+        if name in ("feature_create", "feature_put", "feature_restore"):
+            fid = result if name == "feature_create" else feature.id
+            if (bounds := _feature_bounds(layer, fid)) is not None:
+                cache.invalidate(bounds)
+
+        return result
+
+    return wrapped
+
+
+def mvt_cache_invalidate_all(layer):
+    """Invalidate all MVT cache tiles of a layer after the current transaction
+    commit, for example, when its data is reloaded or fields are changed"""
+
+    cache = layer.mvt_cache
+    if cache is not None and cache.enabled:
+        cache.invalidate()
+
+
+def _feature_bounds(layer, fid):
+    query = layer.feature_query()
+    query.srs(SRS.filter_by(id=3857).one())
+    query.box()
+    query.filter_by(id=fid)
+    query.limit(1)
+
+    for feature in query():
+        return feature.box.bounds if feature.box is not None else None
+
+
+class MVTCacheFlushAttr(SAttribute):
+    def set(self, srlzr: Serializer, value: bool | None, *, create: bool):
+        if value and srlzr.obj.mvt_cache is not None:
+            srlzr.obj.mvt_cache.clear()
+
+
+class MVTCacheAttr(SAttribute):
+    def bind(self, srlzrcls, attrname):
+        assert not self.required
+        self.column = column = getattr(FeatureLayerMVTCache, attrname)
+        self.default = column.default.arg if column.default is not None else None
+        super().bind(srlzrcls, attrname)
+
+    def setup_types(self):
+        type = self.column.type.python_type
+        assert type in (int, bool)
+        if self.column.nullable:
+            type = type | None
+        self.types = CRUTypes(type, type, type)
+
+    def get(self, srlzr: Serializer) -> Any:
+        from .component import FeatureLayerComponent
+
+        if not FeatureLayerComponent.current().mvt_cache_enabled or srlzr.obj.mvt_cache is None:
+            return self.default
+        return getattr(srlzr.obj.mvt_cache, self.model_attr)
+
+    def set(self, srlzr: Serializer, value: Any, *, create: bool):
+        if value != self.default or srlzr.obj.mvt_cache is not None:
+            if (cache := srlzr.obj.mvt_cache) is None:
+                cache = srlzr.obj.mvt_cache = FeatureLayerMVTCache()
+            elif self.model_attr == "enabled" and value and not cache.enabled:
+                # Edits aren't tracked while the cache is disabled
+                cache.clear()
+            setattr(cache, self.model_attr, value)
+
+
+class MVTCacheSerializer(Serializer, resource=Resource):
+    identity = "mvt_cache"
+
+    # NOTE: Flush property should be deserialized at first!
+    flush = MVTCacheFlushAttr(read=None, write=ResourceScope.update)
+
+    enabled = MVTCacheAttr(read=ResourceScope.read, write=ResourceScope.update)
+    max_z = MVTCacheAttr(read=ResourceScope.read, write=ResourceScope.update)
+    ttl = MVTCacheAttr(read=ResourceScope.read, write=ResourceScope.update)
+
+    @classmethod
+    def is_applicable(cls, obj):
+        return IFeatureLayer.providedBy(obj) and obj.geometry_type != GEOM_TYPE.NONE
@@ -8,6 +8,8 @@ from nextgisweb.env import DBSession
 from nextgisweb.pyramid.test import WebTestApp
 from nextgisweb.vector_layer import VectorLayer
 
+from .. import api as feature_layer_api
+
 pytestmark = pytest.mark.usefixtures("ngw_resource_defaults", "ngw_auth_administrator")
 
 check_list = [
@@ -42,6 +44,36 @@ def test_cget_order(ngw_webtest_app: WebTestApp, vector_layer_id, order_by, chec
     assert ids == check, "order_by=%s" % order_by
 
 
+@pytest.mark.parametrize("order_by, check", [[None, [1, 2, 3, 4, 5]], *check_list])
+def test_cget_cursor(ngw_webtest_app: WebTestApp, vector_layer_id, order_by, check):
+    url = f"/api/resource/{vector_layer_id}/feature/?limit=2&fields=int"
+    if order_by is not None:
+        url += f"&order_by={order_by}"
+
+    ids = []
+    while url is not None:
+        resp = ngw_webtest_app.get(url)
+        ids.extend(f["id"] for f in resp.json)
+        assert all(list(f["fields"]) == ["int"] for f in resp.json)
+        link = resp.headers.get("Link")
+        url = link[1 : link.index(">")] if link is not None else None
+
+    assert ids == check, "order_by=%s" % order_by
+
+
+def test_cget_cursor_invalid(ngw_webtest_app: WebTestApp, vector_layer_id):
+    url = f"/api/resource/{vector_layer_id}/feature/"
+    ngw_webtest_app.get(url, query=dict(cursor="invalid"), status=422)
+    ngw_webtest_app.get(url, query=dict(cursor="WzFd", offset=1), status=422)
+
+
+@pytest.mark.parametrize("batch_size", [1, 2, 5, 100])
+def test_cget_stream(ngw_webtest_app: WebTestApp, vector_layer_id, batch_size, monkeypatch):
+    monkeypatch.setattr(feature_layer_api, "STREAM_BATCH_SIZE", batch_size)
+    resp = ngw_webtest_app.get(f"/api/resource/{vector_layer_id}/feature/?order_by=-int")
+    assert [f["id"] for f in resp.json] == [3, 1, 2, 4, 5]
+
+
 def get_features_for_orderby_test():
     params = [
         [1, ""],
@@ -1,3 +1,17 @@
+/*** Table: feature_layer_mvt_cache ***/
+
+CREATE TABLE feature_layer_mvt_cache (
+    resource_id integer NOT NULL,
+    uuid uuid NOT NULL,
+    enabled boolean NOT NULL,
+    max_z smallint,
+    ttl integer,
+    PRIMARY KEY (resource_id),
+    FOREIGN KEY (resource_id) REFERENCES resource (id)
+);
+
+COMMENT ON TABLE feature_layer_mvt_cache IS 'feature_layer';
+
 /*** Table: feature_layer_transaction ***/
 
 CREATE TABLE feature_layer_transaction (
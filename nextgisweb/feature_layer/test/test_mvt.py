@@ -0,0 +1,50 @@
+from mapbox_vector_tile import decode as mvt_decode
+
+from nextgisweb.lib.geometry import Geometry
+
+from ..feature import Feature
+from ..mvt import encode_layer
+
+BOUNDS = (0, 0, 1000, 1000)
+
+
+def _feature(id, wkt, **fields):
+    return Feature(id=id, fields=fields, geom=Geometry.from_wkt(wkt, srid=3857))
+
+
+def test_encode_layer():
+    features = [
+        _feature(1, "POINT (500 500)", name="point", price=-1, rate=1.5, flag=True),
+        _feature(
+            2,
+            "POLYGON ((100 100, 900 100, 900 900, 100 900, 100 100), "
+            "(300 300, 600 300, 600 600, 300 600, 300 300))",
+            name="polygon",
+            price=None,
+        ),
+        _feature(3, "LINESTRING (-500 500, 1500 500)", name="line"),
+        _feature(4, "POINT (5000 5000)", name="outside"),
+    ]
+
+    data = encode_layer(features, name="layer", bounds=BOUNDS, extent=4096, buffer=64)
+    ldata = mvt_decode(data, default_options=dict(y_coord_down=True))["layer"]
+    assert ldata["version"] == 2
+    assert ldata["extent"] == 4096
+
+    point, polygon, line = ldata["features"]
+
+    assert point["id"] == 1
+    assert point["geometry"] == dict(type="Point", coordinates=[2048, 2048])
+    assert point["properties"] == dict(name="point", price=-1, rate=1.5, flag=True)
+
+    assert polygon["geometry"]["type"] == "Polygon"
+    assert len(polygon["geometry"]["coordinates"]) == 2
+    assert polygon["properties"] == dict(name="polygon")
+
+    # Clipped by the buffer
+    assert line["geometry"] == dict(type="LineString", coordinates=[[-64, 2048], [4160, 2048]])
+
+
+def test_encode_empty():
+    features = [_feature(1, "POINT (5000 5000)")]
+    assert encode_layer(features, name="layer", bounds=BOUNDS) == b""
@@ -0,0 +1,112 @@
+import json
+
+import pytest
+import transaction
+
+from nextgisweb.env import DBSession
+
+from nextgisweb.pyramid.test import WebTestApp
+from nextgisweb.vector_layer import VectorLayer
+
+from ..mvt_cache import FeatureLayerMVTCache, _tile_range
+
+pytestmark = pytest.mark.usefixtures("ngw_resource_defaults", "ngw_auth_administrator")
+
+TILE = (4, 8, 7)
+
+
+def geojson(name):
+    return json.dumps(
+        {
+            "type": "FeatureCollection",
+            "crs": {"type": "name", "properties": {"name": "urn:ogc:def:crs:EPSG::3857"}},
+            "features": [
+                {
+                    "type": "Feature",
+                    "properties": {"name": name},
+                    "geometry": {"type": "Point", "coordinates": [1e6, 1e6]},
+                },
+            ],
+        }
+    )
+
+
+@pytest.fixture()
+def layer_id():
+    with transaction.manager:
+        obj = VectorLayer().persist().from_ogr(geojson("feature1"))
+        obj.mvt_cache = FeatureLayerMVTCache(enabled=True)
+        DBSession.flush()
+
+    yield obj.id
+
+
+def cached_tile(layer_id, tile):
+    with transaction.manager:
+        return FeatureLayerMVTCache.filter_by(resource_id=layer_id).one().get_tile(tile)
+
+
+def test_invalidate(layer_id, ngw_webtest_app: WebTestApp):
+    z, x, y = TILE
+    mvt_url = "/api/component/feature_layer/mvt"
+    mvt_query = dict(resource=layer_id, z=z, x=x, y=y)
+
+    resp = ngw_webtest_app.get(mvt_url, query=mvt_query, status=200)
+    assert cached_tile(layer_id, TILE) == resp.body
+
+    # Another tile isn't affected by the change
+    ngw_webtest_app.get(mvt_url, query=dict(mvt_query, x=0, y=0), status=204)
+    assert cached_tile(layer_id, (4, 0, 0)) == b""
+
+    feature_url = f"/api/resource/{layer_id}/feature/1"
+    ngw_webtest_app.put_json(feature_url, dict(fields=dict(name="changed")), status=200)
+    assert cached_tile(layer_id, TILE) is None
+    assert cached_tile(layer_id, (4, 0, 0)) == b""
+
+    resp = ngw_webtest_app.get(mvt_url, query=mvt_query, status=200)
+    assert cached_tile(layer_id, TILE) == resp.body
+
+    ngw_webtest_app.delete(feature_url, status=200)
+    assert cached_tile(layer_id, TILE) is None
+
+
+def test_invalidate_schema(layer_id, ngw_file_upload, tmp_path, ngw_webtest_app: WebTestApp):
+    z, x, y = TILE
+    mvt_url = "/api/component/feature_layer/mvt"
+    mvt_query = dict(resource=layer_id, z=z, x=x, y=y)
+    res_url = f"/api/resource/{layer_id}"
+
+    # Reloading data from a source
+    resp = ngw_webtest_app.get(mvt_url, query=mvt_query, status=200)
+    assert cached_tile(layer_id, TILE) == resp.body
+
+    source = tmp_path / "layer.geojson"
+    source.write_text(geojson("reloaded"))
+    source = ngw_file_upload(source)
+    ngw_webtest_app.put_json(res_url, dict(vector_layer=dict(source=source)), status=200)
+    assert cached_tile(layer_id, TILE) is None
+
+    reloaded = ngw_webtest_app.get(mvt_url, query=mvt_query, status=200)
+    assert reloaded.body != resp.body
+    assert cached_tile(layer_id, TILE) == reloaded.body
+
+    # Changing fields
+    fields = ngw_webtest_app.get(res_url).json["feature_layer"]["fields"]
+    fields = [dict(id=fields[0]["id"], keyname="renamed")]
+    ngw_webtest_app.put_json(res_url, dict(feature_layer=dict(fields=fields)), status=200)
+    assert cached_tile(layer_id, TILE) is None
+
+    renamed = ngw_webtest_app.get(mvt_url, query=mvt_query, status=200)
+    assert renamed.body != reloaded.body
+
+
+@pytest.mark.parametrize(
+    "bounds, z, expected",
+    (
+        ((1e6, 1e6, 1e6, 1e6), 0, (0, 0, 0, 0)),
+        ((1e6, 1e6, 1e6, 1e6), 1, (0, 0, 1, 1)),
+        ((1e6, 1e6, 1e6, 1e6), 4, (8, 7, 8, 7)),
+    ),
+)
+def test_tile_range(bounds, z, expected):
+    assert _tile_range(bounds, z) == expected
@@ -1,18 +1,21 @@
 import os
 import os.path
 import re
-from datetime import datetime as dt
-from datetime import timedelta, timezone
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from itertools import batched
 from operator import itemgetter
 from pathlib import Path
 from shutil import copyfileobj
+from time import time
 
 import sqlalchemy as sa
 import transaction
+from sqlalchemy.dialects.postgresql import ARRAY
 
 from nextgisweb.env import Component, DBSession
 from nextgisweb.lib.config import Option
-from nextgisweb.lib.datetime import utcnow_naive
 from nextgisweb.lib.logging import logger
 from nextgisweb.lib.saext import query_unreferenced
 
@@ -22,6 +25,10 @@ from .model import FileObj
 
 BUF_SIZE = 1024 * 1024
 
+FILENAME_RE = re.compile(r"[0-9a-f]{32}")
+CLEANUP_PROGRESS = "cleanup.progress"
+CLEANUP_BATCH_SIZE = 10000
+
 
 class FileObjBackup(BackupBase):
     identity = "fileobj"
@@ -48,6 +55,7 @@ class FileObjBackup(BackupBase):
 class FileStorageComponent(Component):
     def initialize(self):
         self.path = self.options["path"] or self.env.component(CoreComponent).gtsdir(self)
+        self.dedup = self.options["dedup"]
 
     def initialize_db(self):
         if "path" not in self.options:
@@ -123,51 +131,111 @@ class FileStorageComponent(Component):
         logger.info("%d unreferenced file records found", records)
 
     def cleanup_orphaned(self, *, dry_run):
-        deleted_files = deleted_bytes = 0
-        kept_files = kept_bytes = 0
+        keep_after = time() - self.options["cleanup_keep_interval"].total_seconds()
+        workers = self.options["cleanup_workers"]
+
+        # Directories are processed in the sorted order, and the last processed
+        # one is recorded, so an interrupted cleanup can be resumed.
+        progress = Path(self.path) / CLEANUP_PROGRESS
+        resume = None
+        if not dry_run and progress.is_file():
+            resume = tuple(progress.read_text().split("/"))
+            logger.info("Resuming cleanup after %s", "/".join(resume))
+
+        units = [u for u in self._cleanup_units() if resume is None or u > resume]
+
+        # Deleted files, deleted bytes, kept files and kept bytes by components
+        stat = defaultdict(lambda: [0, 0, 0, 0])
+
+        with ThreadPoolExecutor(workers) as executor:
+            for chunk in batched(units, workers * 4):
+                scanned = list(executor.map(self._cleanup_scan, chunk))
+
+                uuids = [fn for _, files, _ in scanned for _, fn, _, _ in files]
+                existing = set()
+                for batch in batched(uuids, CLEANUP_BATCH_SIZE):
+                    existing.update(
+                        DBSession.scalars(
+                            sa.select(FileObj.uuid).where(
+                                FileObj.uuid == sa.any_(sa.literal(list(batch), ARRAY(sa.String)))
+                            )
+                        )
+                    )
+
+                for (component, _), (dirs, files, unexpected) in zip(chunk, scanned):
+                    for fullfn in unexpected:
+                        relfn = Path(fullfn).relative_to(self.path)
+                        logger.error("Unexpected file in storage: %s", str(relfn))
+
+                    cstat = stat[component]
+                    for fullfn, fn, size, ctime in files:
+                        if fn not in existing and ctime < keep_after:
+                            if not dry_run:
+                                os.remove(fullfn)
+                            cstat[0] += 1
+                            cstat[1] += size
+                        else:
+                            cstat[2] += 1
+                            cstat[3] += size
+
+                    if not dry_run:
+                        for dirpath in dirs:
+                            if len(os.listdir(dirpath)) == 0:
+                                os.rmdir(dirpath)
+
+                if not dry_run:
+                    progress.write_text("/".join(chunk[-1]))
+
+        if not dry_run:
+            for component in {c for c, _ in units}:
+                cpath = os.path.join(self.path, component)
+                if os.path.isdir(cpath) and len(os.listdir(cpath)) == 0:
+                    os.rmdir(cpath)
+            progress.unlink(missing_ok=True)
+
+        for component, (dfiles, dbytes, kfiles, kbytes) in sorted(stat.items()):
+            logger.info(
+                "Component %s: %d orphaned files found (%d bytes), %d files remain (%d bytes)",
+                component,
+                dfiles,
+                dbytes,
+                kfiles,
+                kbytes,
+            )
 
-        delta = self.options["cleanup_keep_interval"]
+        deleted_files, deleted_bytes, kept_files, kept_bytes = (
+            sum(v[i] for v in stat.values()) for i in range(4)
+        )
+        logger.info("%d orphaned files found (%d bytes)", deleted_files, deleted_bytes)
+        logger.info("%d files remain (%d bytes)", kept_files, kept_bytes)
 
-        filename_re = re.compile(r"[0-9a-f]{32}")
-        for dirpath, dirnames, filenames in os.walk(self.path, topdown=False):
-            relist = False
+    def _cleanup_units(self):
+        # Storage is separated into component directories with two levels of
+        # subdirectories, so the first level ones are used as units of work.
+        for component in sorted(os.listdir(self.path)):
+            cpath = os.path.join(self.path, component)
+            if not os.path.isdir(cpath):
+                if component != CLEANUP_PROGRESS:
+                    logger.error("Unexpected file in storage: %s", component)
+                continue
+            for level in sorted(os.listdir(cpath)):
+                if os.path.isdir(os.path.join(cpath, level)):
+                    yield (component, level)
+                else:
+                    logger.error("Unexpected file in storage: %s/%s", component, level)
 
+    def _cleanup_scan(self, unit):
+        dirs, files, unexpected = [], [], []
+        for dirpath, dirnames, filenames in os.walk(os.path.join(self.path, *unit), topdown=False):
+            dirs.append(dirpath)
             for fn in filenames:
                 fullfn = os.path.join(dirpath, fn)
-                if not filename_re.fullmatch(fn):
-                    relfn = Path(fullfn).relative_to(self.path)
-                    logger.error("Unexpected file in storage: %s", str(relfn))
+                if not FILENAME_RE.fullmatch(fn):
+                    unexpected.append(fullfn)
                     continue
-
-                obj = FileObj.filter_by(uuid=fn).first()
                 stat = os.stat(fullfn)
-
-                if obj is None and (
-                    utcnow_naive()
-                    - dt.fromtimestamp(stat.st_ctime, tz=timezone.utc).replace(tzinfo=None)
-                    > delta
-                ):
-                    if not dry_run:
-                        os.remove(fullfn)
-                        relist = True
-                    deleted_files += 1
-                    deleted_bytes += stat.st_size
-                else:
-                    kept_files += 1
-                    kept_bytes += stat.st_size
-
-            if (
-                not dry_run
-                and dirpath != os.path.normpath(self.path)
-                and (
-                    (not relist and len(filenames) == 0 and len(dirnames) == 0)
-                    or len(os.listdir(dirpath)) == 0
-                )
-            ):
-                os.rmdir(dirpath)
-
-        logger.info("%d orphaned files found (%d bytes)", deleted_files, deleted_bytes)
-        logger.info("%d files remain (%d bytes)", kept_files, kept_bytes)
+                files.append((fullfn, fn, stat.st_size, stat.st_ctime))
+        return dirs, files, unexpected
 
     def check_integrity(self):
         for fileobj in FileObj.query():
@@ -179,5 +247,7 @@ class FileStorageComponent(Component):
     option_annotations = (
         Option("path", default=None),
         Option("cleanup_keep_interval", timedelta, default=timedelta(days=2)),
+        Option("cleanup_workers", int, default=4, doc="Number of threads scanning storage directories during cleanup."),
+        Option("dedup", bool, default=False, doc="Store files with the same contents as hard links to a single file."),
     )
     # fmt: on
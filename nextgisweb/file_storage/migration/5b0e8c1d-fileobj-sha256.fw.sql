@@ -0,0 +1,10 @@
+/*** {
+    "revision": "5b0e8c1d", "parents": ["42a4e9bb"],
+    "date": "2026-10-18T00:00:00",
+    "message": "FileObj SHA-256 digest"
+} ***/
+
+ALTER TABLE fileobj ADD COLUMN sha256 character varying(64);
+
+CREATE INDEX fileobj_sha256_idx ON fileobj
+    USING btree (sha256);
@@ -0,0 +1,5 @@
+/*** { "revision": "5b0e8c1d" } ***/
+
+DROP INDEX fileobj_sha256_idx;
+
+ALTER TABLE fileobj DROP COLUMN sha256;
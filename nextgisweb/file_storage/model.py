@@ -1,18 +1,27 @@
 from __future__ import annotations
 
+import fcntl
+import os
 import uuid
+from hashlib import file_digest
+from hashlib import sha256 as sha256_hash
 from pathlib import Path
-from shutil import copyfile, copyfileobj
+from shutil import copyfile
 from typing import Any
 
 import sqlalchemy as sa
 import sqlalchemy.event as sa_event
 from sqlalchemy.orm import Mapped, mapped_column
 
-from nextgisweb.env import Base
+from nextgisweb.env import Base, DBSession
 from nextgisweb.env.package import pkginfo
 from nextgisweb.lib.imptool import module_from_stack
 
+BUF_SIZE = 1024 * 1024
+
+# Linux ioctl for cloning file extents, see ioctl_ficlone(2)
+FICLONE = 0x40049409
+
 
 def _size_default(context):
     from .component import FileStorageComponent
@@ -30,8 +39,12 @@ class FileObj(Base):
     component: Mapped[str] = mapped_column()
     uuid: Mapped[str] = mapped_column(sa.String(32))
     size: Mapped[int] = mapped_column(sa.BigInteger, default=_size_default)
+    sha256: Mapped[str | None] = mapped_column(sa.String(64))
 
-    __table_args__ = (sa.Index("fileobj_uuid_component_idx", uuid, component, unique=True),)
+    __table_args__ = (
+        sa.Index("fileobj_uuid_component_idx", uuid, component, unique=True),
+        sa.Index("fileobj_sha256_idx", sha256),
+    )
 
     def __init__(self, *args, **kwargs):
         if "component" not in kwargs:
@@ -61,22 +74,105 @@ class FileObj(Base):
         assert not (not_exists and result.exists())
         return result
 
-    def copy_from(self, source: Path | str | Any) -> FileObj:
+    def copy_from(
+        self,
+        source: Path | str | Any,
+        *,
+        sha256: str | None = None,
+    ) -> FileObj:
+        """Write file contents from a path or a file-like object
+
+        :param sha256: SHA-256 hex digest of the source path contents, if
+            known, which is used for deduplication"""
+
+        from .component import FileStorageComponent
+
         dest = self.filename(makedirs=True, not_exists=True)
         if isinstance(source, (str, Path)):
-            copyfile(source, dest)
+            if sha256 is None and FileStorageComponent.current().dedup:
+                with open(source, "rb") as fd:
+                    sha256 = file_digest(fd, "sha256").hexdigest()
+            self.sha256 = sha256
+            if (blob := self._duplicate()) is not None:
+                _ingest(blob, dest, link=True)
+            else:
+                _ingest(source, dest, link=False)
         else:
+            digest = sha256_hash()
             with open(dest, "wb") as fd:
-                copyfileobj(source, fd)
+                while buf := source.read(BUF_SIZE):
+                    digest.update(buf)
+                    fd.write(buf)
+            self.sha256 = digest.hexdigest()
+            if (blob := self._duplicate()) is not None:
+                _replace_with_link(blob, dest)
         self.size = dest.stat().st_size
         return self
 
     def from_content(self, content: bytes) -> FileObj:
-        with open(self.filename(makedirs=True, not_exists=True), "wb") as fd:
-            fd.write(content)
+        dest = self.filename(makedirs=True, not_exists=True)
+        self.sha256 = sha256_hash(content).hexdigest()
+        if (blob := self._duplicate()) is not None:
+            _ingest(blob, dest, link=True)
+        else:
+            with open(dest, "wb") as fd:
+                fd.write(content)
         self.size = len(content)
         return self
 
+    def _duplicate(self) -> Path | None:
+        # Files with the same contents are hard links to a single inode, and
+        # its link count serves as a reference count. So deleting a file or a
+        # cleanup never affects other files, and FileObj.filename() remains
+        # the same regardless of deduplication.
+        from .component import FileStorageComponent
+
+        comp = FileStorageComponent.current()
+        if self.sha256 is None or not comp.dedup:
+            return None
+
+        with DBSession.no_autoflush:
+            query = (
+                sa.select(FileObj.component, FileObj.uuid)
+                .where(FileObj.sha256 == self.sha256)
+                .order_by(FileObj.id)
+                .limit(1)
+            )
+            for row in DBSession.execute(query):
+                fn = Path(comp.filename((row.component, row.uuid)))
+                if fn.is_file():
+                    return fn
+        return None
+
+
+def _ingest(source, dest, *, link):
+    """Copy a file trying a hard link (if allowed) and a reflink first"""
+
+    if link:
+        try:
+            os.link(source, dest)
+            return
+        except OSError:
+            pass
+
+    with open(source, "rb") as sfd, open(dest, "wb") as dfd:
+        try:
+            fcntl.ioctl(dfd.fileno(), FICLONE, sfd.fileno())
+            return
+        except OSError:
+            pass
+
+    copyfile(source, dest)
+
+
+def _replace_with_link(source, dest):
+    tmp = dest.with_name(dest.name + ".tmp")
+    try:
+        os.link(source, tmp)
+    except OSError:
+        return
+    os.replace(tmp, dest)
+
 
 @sa_event.listens_for(FileObj, "before_insert")
 def fileobj_before_insert(mapper, connection, obj):
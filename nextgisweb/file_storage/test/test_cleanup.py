@@ -1,4 +1,5 @@
 from datetime import timedelta
+from pathlib import Path
 
 import pytest
 
@@ -6,6 +7,8 @@ from nextgisweb.env import DBSession
 
 from nextgisweb.file_storage import FileObj
 
+from ..component import CLEANUP_PROGRESS
+
 
 @pytest.fixture(scope="module", autouse=True)
 def off_keep_interfal(ngw_env):
@@ -49,3 +52,18 @@ def test_cleanup(wet, kwargs, unref, orphan, ngw_env, ngw_txn):
         assert fe_orphan == orphan
     else:
         assert fe_unref and fe_orphan
+
+
+def test_cleanup_resume(ngw_env, ngw_txn):
+    comp = ngw_env.file_storage
+    fobj_orphan = FileObj(component="test").from_content(b"")
+
+    progress = Path(comp.path) / CLEANUP_PROGRESS
+    progress.write_text(f"test/{fobj_orphan.uuid[0:2]}")
+
+    comp.cleanup_orphaned(dry_run=False)
+    assert fobj_orphan.filename().is_file()
+    assert not progress.exists()
+
+    comp.cleanup_orphaned(dry_run=False)
+    assert not fobj_orphan.filename().is_file()
@@ -1,5 +1,9 @@
+from hashlib import sha256
+from io import BytesIO
+
 import pytest
 
+from ..component import FileStorageComponent
 from ..model import FileObj
 
 
@@ -31,3 +35,33 @@ def test_size_calc(ngw_txn):
     obj.require_session().flush()
 
     assert obj.size == 4
+
+
+@pytest.mark.parametrize("dedup", (True, False))
+def test_dedup(dedup, ngw_txn, tmp_path, monkeypatch):
+    monkeypatch.setattr(FileStorageComponent.current(), "dedup", dedup)
+
+    content = bytes.fromhex("deadbeef")
+    digest = sha256(content).hexdigest()
+
+    obj1 = FileObj(component="test").from_content(content).persist()
+    assert obj1.sha256 == digest
+    obj1.require_session().flush()
+
+    obj2 = FileObj(component="test").copy_from(BytesIO(content))
+    assert obj2.sha256 == digest
+
+    source = tmp_path / "source"
+    source.write_bytes(content)
+    obj3 = FileObj(component="test").copy_from(source, sha256=digest)
+
+    # Digest of a path is calculated if not given
+    obj4 = FileObj(component="test").copy_from(source)
+    assert obj4.sha256 == (digest if dedup else None)
+
+    inodes = {o.filename().stat().st_ino for o in (obj1, obj2, obj3, obj4)}
+    assert len(inodes) == (1 if dedup else 4)
+
+    for obj in (obj1, obj2, obj3, obj4):
+        assert obj.filename().read_bytes() == content
+        assert obj.size == len(content)
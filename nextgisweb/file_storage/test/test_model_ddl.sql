@@ -5,9 +5,12 @@ CREATE TABLE fileobj (
     component character varying NOT NULL,
     uuid character varying(32) NOT NULL,
     size bigint NOT NULL,
+    sha256 character varying(64),
     PRIMARY KEY (id)
 );
 
 COMMENT ON TABLE fileobj IS 'file_storage';
 
+CREATE INDEX fileobj_sha256_idx ON fileobj(sha256);
+
 CREATE UNIQUE INDEX fileobj_uuid_component_idx ON fileobj(uuid, component);
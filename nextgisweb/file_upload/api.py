@@ -1,6 +1,8 @@
 import re
 from base64 import b64decode
-from shutil import copyfileobj
+from collections import OrderedDict
+from hashlib import file_digest, sha256
+from threading import Lock
 from typing import Annotated
 
 import magic
@@ -14,6 +16,7 @@ from nextgisweb.lib.apitype import AnyOf, AsJSON, StatusCode
 from nextgisweb.core import CoreComponent
 from nextgisweb.core.exception import UserException
 from nextgisweb.core.storage import StorageInsufficient
+from nextgisweb.file_storage import FileStorageComponent
 from nextgisweb.pyramid.tomb import Request
 
 from .component import FileUploadComponent
@@ -22,6 +25,13 @@ from .model import FileUpload, FileUploadID, FileUploadNotCompleted, FileUploadN
 
 BUF_SIZE = 1024 * 1024
 
+# SHA-256 states of TUS uploads in progress, so digests are computed while
+# receiving chunks. If a chunk is received by another process, the state is
+# missing, and the digest is computed once the upload is completed.
+TUS_DIGESTS = OrderedDict()
+TUS_DIGESTS_LOCK = Lock()
+TUS_DIGESTS_SIZE = 256
+
 
 @inject()
 def check_storage_limit(file_size, *, core: CoreComponent):
@@ -88,7 +98,7 @@ def collection_put(
     fupload = FileUpload(size=0)
 
     with fupload.data_path.open("wb") as fd:
-        copyfileobj(request.body_file, fd)
+        fupload.sha256 = _copy_digest(request.body_file, fd)
         fupload.size = fd.tell()
 
     if (
@@ -176,7 +186,7 @@ def _collection_post_form(request: Request, *, comp: FileUploadComponent):
 
         fupload = FileUpload(size=size, name=_sanitize_name(ufile.filename), mime_type=ufile.type)
         with fupload.data_path.open("wb") as fd:
-            copyfileobj(ufile.file, fd)
+            fupload.sha256 = _copy_digest(ufile.file, fd)
 
         fupload.write_meta()
         upload_meta.append(
@@ -298,6 +308,8 @@ def item_patch_tus(fupload: FileUpload, request: Request) -> Annotated[None, Sta
         if upload_offset != fd.tell():
             raise exc.HTTPConflict()
 
+        digest = _tus_digest(fupload, upload_offset)
+
         # Copy request body to data file. Input streaming is also supported
         # here is some conditions: uwsgi - does, pserve - doesn't.
         src_fd = request.body_file
@@ -311,16 +323,30 @@ def item_patch_tus(fupload: FileUpload, request: Request) -> Annotated[None, Sta
             if upload_offset + read > fupload.size:
                 raise UploadedFileTooLarge()
             fd.write(buf)
+            if digest is not None:
+                digest.update(buf)
             upload_offset += read
 
     if fupload.size == upload_offset:
         fupload.incomplete = False
+        if digest is not None:
+            fupload.sha256 = digest.hexdigest()
+        elif FileStorageComponent.current().dedup:
+            # Digests are only used for deduplication, so the data isn't read
+            # again if it's disabled
+            with fupload.data_path.open("rb") as fd:
+                fupload.sha256 = file_digest(fd, sha256).hexdigest()
 
         # Detect MIME type if missing
         if not fupload.mime_type:
             fupload.mime_type = magic.from_file(fupload.data_path, mime=True)
 
         fupload.write_meta()
+    elif digest is not None:
+        with TUS_DIGESTS_LOCK:
+            TUS_DIGESTS[fupload.id] = (upload_offset, digest)
+            while len(TUS_DIGESTS) > TUS_DIGESTS_SIZE:
+                TUS_DIGESTS.popitem(last=False)
 
     return _tus_response(204, upload_offset=upload_offset)
 
@@ -340,6 +366,22 @@ def item_delete(fupload: FileUpload, request: Request) -> Annotated[None, Status
     return _tus_response(204)
 
 
+def _copy_digest(src, fd):
+    digest = sha256()
+    while buf := src.read(BUF_SIZE):
+        digest.update(buf)
+        fd.write(buf)
+    return digest.hexdigest()
+
+
+def _tus_digest(fupload: FileUpload, upload_offset):
+    with TUS_DIGESTS_LOCK:
+        state = TUS_DIGESTS.pop(fupload.id, None)
+    if state is not None and state[0] == upload_offset:
+        return state[1]
+    return sha256() if upload_offset == 0 else None
+
+
 def _sanitize_name(name: str | None):
     if name is None:
         return None
@@ -33,6 +33,7 @@ class FileUpload:
     name: str | None
     mime_type: str | None
     incomplete: bool
+    sha256: str | None
 
     data_path: Path
     meta_path: Path
@@ -49,6 +50,7 @@ class FileUpload:
         name: str | None = None,
         mime_type: str | None = None,
         incomplete: bool = False,
+        sha256: str | None = None,
     ):
         """Create new FileUpload"""
 
@@ -68,7 +70,7 @@ class FileUpload:
             self.__init__(**src, incomplete_ok=incomplete_ok)
             return
 
-        if invalid := (set(kwargs.keys()) - {"size", "name", "mime_type", "incomplete"}):
+        if invalid := (set(kwargs.keys()) - {"size", "name", "mime_type", "incomplete", "sha256"}):
             raise ValueError(f"Invalid keyword args: {','.join(invalid)}")
 
         create = id is UNSET
@@ -80,6 +82,7 @@ class FileUpload:
             self.name = kwargs.get("name", None)
             self.mime_type = kwargs.get("mime_type")
             self.incomplete = kwargs.get("incomplete", False)
+            self.sha256 = kwargs.get("sha256")
             self.__dict__.update(kwargs)
             return
 
@@ -97,6 +100,7 @@ class FileUpload:
         self.name = meta.get("name")
         self.mime_type = meta.get("mime_type")
         self.incomplete = meta.get("incomplete", False)
+        self.sha256 = meta.get("sha256")
 
     def write_meta(self):
         meta = dict(id=self.id, size=self.size)
@@ -112,11 +116,18 @@ class FileUpload:
         else:
             assert self.mime_type
 
+        if self.sha256:
+            meta.update(sha256=self.sha256)
+
         self.meta_path.write_bytes(pickle.dumps(meta))
 
     def to_fileobj(self, *, component: str | None = None) -> FileObj:
         component = FileObj.component_from_stack(1) if component is None else component
-        return FileObj(component=component).copy_from(self.data_path)
+        fileobj = FileObj(component=component)
+
+        # Upload data may be reused and modified by other consumers, so it's
+        # copied (or reflinked) instead of being hard linked
+        return fileobj.copy_from(self.data_path, sha256=self.sha256)
 
 
 def _filenames(id: FileUploadID, makedirs=False) -> tuple[Path, Path]:
@@ -1,11 +1,14 @@
+from hashlib import sha256
 from subprocess import check_call, check_output
 
 import pytest
 import transaction
 import webtest
 
+from nextgisweb.file_storage import FileStorageComponent
 from nextgisweb.pyramid.test import WebTestApp
 
+from ..api import TUS_DIGESTS
 from ..model import FileUpload
 
 FN0, FC0 = "zero.txt", b""
@@ -91,11 +94,42 @@ def test_tus_method(ngw_webtest_app: WebTestApp):
 
     assert get.json["size"] == len(FC1)
     assert get.json["name"] == "test"
+    assert FileUpload(id=get.json["id"]).sha256 == sha256(FC1).hexdigest()
 
     ngw_webtest_app.delete(location, status=204)
     ngw_webtest_app.delete(location, status=404)
 
 
+@pytest.mark.parametrize("dedup", (True, False))
+def test_tus_digest_state_missing(dedup, ngw_webtest_app: WebTestApp, monkeypatch):
+    monkeypatch.setattr(FileStorageComponent.current(), "dedup", dedup)
+
+    create = ngw_webtest_app.post(
+        "/api/component/file_upload/",
+        headers={"Tus-Resumable": "1.0.0", "Upload-Length": str(len(FC1))},
+        status=201,
+    )
+    location = create.headers["Location"][len("http://localhost") :]
+
+    for offset, chunk in ((0, FC1[:4]), (4, FC1[4:])):
+        # Chunks are received by different processes
+        TUS_DIGESTS.clear()
+        ngw_webtest_app.patch(
+            location,
+            data=chunk,
+            headers={
+                "Tus-Resumable": "1.0.0",
+                "Content-Type": "application/offset+octet-stream",
+                "Upload-Offset": str(offset),
+            },
+            status=204,
+        )
+
+    fupload = FileUpload(id=ngw_webtest_app.get(location).json["id"])
+    assert fupload.data_path.read_bytes() == FC1
+    assert fupload.sha256 == (sha256(FC1).hexdigest() if dedup else None)
+
+
 @pytest.mark.parametrize("size_m", (0, 1, 16))
 def test_tus_client(size_m, ngw_httptest_app, tmp_path):
     of = tmp_path / f"sample-{size_m}"
@@ -149,6 +183,7 @@ def test_put(ngw_webtest_app: WebTestApp):
     resp = ngw_webtest_app.put("/api/component/file_upload/", data=FC1)
     fupload = FileUpload(id=resp.json["id"])
     assert fupload.data_path.read_bytes() == FC1
+    assert fupload.sha256 == sha256(FC1).hexdigest()
 
 
 @pytest.fixture(scope="module")
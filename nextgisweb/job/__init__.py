@@ -0,0 +1,4 @@
+from .component import JobComponent
+from .context import JobCanceled, current_job, job_check_call, job_progress
+from .handler import JobHandler
+from .model import Job
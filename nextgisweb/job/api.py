@@ -0,0 +1,159 @@
+from datetime import datetime
+from typing import Annotated, Any
+
+import msgspec
+import sqlalchemy as sa
+from msgspec import Meta, Struct
+from pyramid.httpexceptions import HTTPNotFound
+from zope.sqlalchemy import mark_changed
+
+from nextgisweb.env import DBSession
+from nextgisweb.lib.apitype import StatusCode
+from nextgisweb.lib.datetime import utcnow_naive
+
+from nextgisweb.core import CoreComponent
+from nextgisweb.pyramid import AsJSON
+from nextgisweb.pyramid.tomb import Request
+from nextgisweb.pyramid.view import ModelFactory
+from nextgisweb.resource.api import CompositeCreate
+
+from .component import JobComponent
+from .model import Job, JobStatus
+
+JobID = Annotated[int, Meta(ge=1, description="Job ID")]
+
+
+class JobRef(Struct, kw_only=True):
+    id: JobID
+
+
+class JobRead(Struct, kw_only=True):
+    id: JobID
+    kind: Annotated[str, Meta(description="Job kind", examples=["resource.create"])]
+    status: JobStatus
+    progress: Annotated[float | None, Meta(description="Fraction of completed work")]
+    message: Annotated[str | None, Meta(description="Current stage description")]
+    cancel: Annotated[bool, Meta(description="Cancellation has been requested")]
+    created: datetime
+    started: datetime | None
+    finished: datetime | None
+    result: Annotated[Any, Meta(description="Result of the completed job")]
+    error: Annotated[Any, Meta(description="Error of the failed job")]
+
+    @classmethod
+    def from_obj(cls, obj: Job):
+        return cls(
+            id=obj.id,
+            kind=obj.kind,
+            status=obj.status,
+            progress=obj.progress,
+            message=obj.message,
+            cancel=obj.cancel,
+            created=obj.created,
+            started=obj.started,
+            finished=obj.finished,
+            result=obj.result,
+            error=obj.error,
+        )
+
+
+def _require_owner(obj: Job, request: Request):
+    if obj.user_id != request.user.id and not request.user.is_administrator:
+        raise HTTPNotFound()
+
+
+def cget(request: Request) -> AsJSON[list[JobRead]]:
+    """Read current user's jobs
+
+    :returns: List of jobs, recent first"""
+    request.require_authenticated()
+
+    query = Job.filter_by(user_id=request.user.id).order_by(Job.id.desc())
+    return [JobRead.from_obj(obj) for obj in query]
+
+
+def iget(obj: Job, request: Request) -> JobRead:
+    """Read job status
+
+    :returns: Job status, progress and result"""
+    _require_owner(obj, request)
+    return JobRead.from_obj(obj)
+
+
+def idelete(obj: Job, request: Request) -> JobRead:
+    """Cancel job
+
+    Pending jobs are canceled immediately, running jobs are canceled by the
+    worker at the next progress report.
+
+    :returns: Job status"""
+    _require_owner(obj, request)
+
+    # A worker may claim the job concurrently, so the status is checked and
+    # changed by the same statement
+    canceled = DBSession.execute(
+        sa.update(Job)
+        .where(Job.id == obj.id, Job.status == "pending")
+        .values(status="canceled", finished=utcnow_naive())
+    )
+    if canceled.rowcount == 0:
+        DBSession.execute(
+            sa.update(Job)
+            .where(Job.id == obj.id, Job.status.in_(("pending", "running")))
+            .values(cancel=True)
+        )
+    mark_changed(DBSession())
+
+    DBSession.refresh(obj)
+    return JobRead.from_obj(obj)
+
+
+def resource_create(
+    request: Request,
+    body: CompositeCreate,
+) -> Annotated[JobRef, StatusCode(202)]:
+    """Create resource in background
+
+    The request body is the same as for resource creation. The created
+    resource reference becomes the job result.
+
+    :returns: Created job"""
+    request.require_authenticated()
+    CoreComponent.current().check_storage_limit()
+
+    obj = Job(
+        kind="resource.create",
+        user_id=request.user.id,
+        locale=request.locale_name,
+        params=msgspec.to_builtins(body),
+    ).persist()
+
+    DBSession.flush()
+    request.audit_context("job", obj.id)
+
+    request.response.status_code = 202
+    return JobRef(id=obj.id)
+
+
+def setup_pyramid(comp: JobComponent, config):
+    job_factory = ModelFactory(Job, tdef=JobID)
+
+    config.add_route(
+        "job.collection",
+        "/api/component/job/",
+        get=cget,
+    )
+
+    config.add_route(
+        "job.item",
+        "/api/component/job/{id}",
+        factory=job_factory,
+        get=iget,
+        delete=idelete,
+    )
+
+    config.add_route(
+        "job.resource_create",
+        "/api/component/job/resource",
+        post=resource_create,
+    )
@@ -0,0 +1,34 @@
+import signal
+
+from nextgisweb.env.cli import EnvCommand, cli, opt
+
+from .component import JobComponent
+from .worker import Worker
+
+
+@cli.command()
+def worker(
+    self: EnvCommand,
+    once: bool = opt(False, flag=True),
+    name: str | None = opt(metavar="name"),
+    *,
+    job: JobComponent,
+):
+    """Execute background jobs
+
+    Any number of worker processes can be started, each of them executes
+    one job at a time.
+
+    :param once: Exit when there are no pending jobs
+    :param name: Worker name shown in job status (default: host:pid)"""
+
+    wrk = Worker(job, name=name)
+
+    def stop(signum, frame):
+        wrk.stop()
+
+    # Jobs in progress are finished before exit
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    wrk.run(once=once)
@@ -0,0 +1,45 @@
+from datetime import timedelta
+
+import sqlalchemy as sa
+import transaction
+from zope.sqlalchemy import mark_changed
+
+from nextgisweb.env import Component, DBSession, require
+from nextgisweb.lib.config import Option
+from nextgisweb.lib.datetime import utcnow_naive
+from nextgisweb.lib.logging import logger
+
+from .model import Job
+
+
+class JobComponent(Component):
+    @require("resource")
+    def setup_pyramid(self, config):
+        from . import api
+
+        api.setup_pyramid(self, config)
+
+    def maintenance(self):
+        super().maintenance()
+        self.cleanup()
+
+    def cleanup(self):
+        logger.info("Cleaning up finished jobs...")
+        keep = utcnow_naive() - self.options["keep_interval"]
+        with transaction.manager:
+            result = DBSession.execute(
+                sa.delete(Job)
+                .where(Job.status.in_(("done", "failed", "canceled")), Job.finished < keep)
+                .execution_options(synchronize_session=False)
+            )
+            mark_changed(DBSession())
+            logger.info("%d finished jobs deleted", result.rowcount)
+
+    # fmt: off
+    option_annotations = (
+        Option("keep_interval", timedelta, default=timedelta(days=7), doc="Time to keep finished jobs."),
+        Option("worker.poll_interval", timedelta, default=timedelta(seconds=2), doc="Interval of checking for pending jobs."),
+        Option("worker.heartbeat_interval", timedelta, default=timedelta(seconds=5), doc="Interval of updating running job progress."),
+        Option("worker.stale_timeout", timedelta, default=timedelta(minutes=5), doc="Running jobs without updates for this time are considered lost."),
+    )
+    # fmt: on
@@ -0,0 +1,116 @@
+import subprocess
+from contextvars import ContextVar
+from threading import Event, Lock, Thread
+
+# Interval of checking whether a job's subprocess is still running and the
+# job hasn't been canceled, in seconds
+PROCESS_POLL_INTERVAL = 1
+
+
+class JobCanceled(Exception):
+    pass
+
+
+class JobContext:
+    """State of a running job shared between the job and the worker thread
+    which updates its progress in the database"""
+
+    def __init__(self, job_id):
+        self.job_id = job_id
+        self.progress = None
+        self.message = None
+        self.canceled = Event()
+        self._lock = Lock()
+
+    def report(self, progress=None, message=None):
+        with self._lock:
+            if progress is not None:
+                self.progress = min(max(progress, 0), 1)
+            if message is not None:
+                self.message = message
+        self.check()
+
+    def snapshot(self):
+        with self._lock:
+            return self.progress, self.message
+
+    def check(self):
+        if self.canceled.is_set():
+            raise JobCanceled
+
+
+_current: ContextVar[JobContext | None] = ContextVar("job_context", default=None)
+
+
+def current_job():
+    return _current.get()
+
+
+def job_progress(progress=None, message=None):
+    """Report progress of the current job, does nothing outside of jobs
+
+    :param progress: Fraction of completed work from 0 to 1
+    :param message: Current stage description
+    :raises JobCanceled: If the job cancellation has been requested"""
+
+    if (ctx := _current.get()) is not None:
+        ctx.report(progress, message)
+
+
+def job_check_call(cmd, *, progress=None, **kwargs):
+    """Replacement for subprocess.check_call which kills the process if the
+    current job is canceled
+
+    :param progress: Range (start, end) of the job progress to report from
+        the progress output of GDAL utilities, which isn't printed then"""
+
+    ctx = _current.get()
+    if progress is not None:
+        kwargs["stdout"] = subprocess.DEVNULL if ctx is None else subprocess.PIPE
+
+    if ctx is None:
+        return subprocess.check_call(cmd, **kwargs)
+
+    proc = subprocess.Popen(cmd, **kwargs)
+    state = [None]
+    if progress is not None:
+        reader = Thread(target=_gdal_progress, args=(proc.stdout, state), daemon=True)
+        reader.start()
+
+    try:
+        while True:
+            try:
+                retcode = proc.wait(PROCESS_POLL_INTERVAL)
+                break
+            except subprocess.TimeoutExpired:
+                if progress is not None and (fraction := state[0]) is not None:
+                    start, end = progress
+                    ctx.report(start + (end - start) * fraction)
+                ctx.check()
+    except BaseException:
+        proc.kill()
+        proc.wait()
+        raise
+    finally:
+        if progress is not None:
+            reader.join()
+            proc.stdout.close()
+
+    if retcode != 0:
+        raise subprocess.CalledProcessError(retcode, cmd)
+    if progress is not None:
+        ctx.report(progress[1])
+    return retcode
+
+
+def _gdal_progress(stream, state):
+    # GDAL utilities print progress as "0...10...20...30", so a number
+    # followed by a dot is a completed percentage.
+    digits = b""
+    while char := stream.read(1):
+        if char.isdigit():
+            digits += char
+            continue
+        if char == b"." and digits:
+            state[0] = min(int(digits), 100) / 100
+        digits = b""
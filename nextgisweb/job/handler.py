@@ -0,0 +1,45 @@
+from typing import Any, ClassVar
+
+import msgspec
+
+from nextgisweb.lib.registry import DictRegistry, dict_registry
+
+from nextgisweb.auth import User
+
+
+@dict_registry
+class JobHandler:
+    """Base class of job kinds
+
+    Handlers are executed by workers within a transaction, which is committed
+    after the handler returns if the job hasn't been canceled."""
+
+    registry: ClassVar[DictRegistry[type["JobHandler"]]]
+    identity: ClassVar[str]
+
+    def __init__(self, user: User):
+        self.user = user
+
+    def __call__(self, params: Any) -> Any:
+        """Execute the job and return its JSON-serializable result"""
+        raise NotImplementedError
+
+
+class ResourceCreateJob(JobHandler):
+    """Create a resource from the same payload as POST /api/resource/"""
+
+    identity = "resource.create"
+
+    def __call__(self, params):
+        from nextgisweb.resource.api import CompositeCreate, create_resource
+        from nextgisweb.resource.sattribute import ResourceRefOptional, ResourceRefWithParent
+
+        # JSONB doesn't preserve types like datetime, so decode it as the
+        # original request body.
+        body = msgspec.json.decode(msgspec.json.encode(params), type=CompositeCreate)
+        resource = create_resource(body, user=self.user, request=None)
+
+        result = ResourceRefWithParent(
+            id=resource.id, parent=ResourceRefOptional(id=resource.parent.id)
+        )
+        return msgspec.to_builtins(result)
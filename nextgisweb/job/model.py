@@ -0,0 +1,49 @@
+from datetime import datetime
+from typing import Any, Literal
+
+import sqlalchemy as sa
+import sqlalchemy.dialects.postgresql as sa_pg
+import sqlalchemy.orm as orm
+from sqlalchemy.orm import Mapped, mapped_column
+
+from nextgisweb.env import Base
+from nextgisweb.lib import saext
+from nextgisweb.lib.datetime import utcnow_naive
+
+from nextgisweb.auth import User
+
+Base.depends_on("auth")
+
+JobStatus = Literal["pending", "running", "done", "failed", "canceled"]
+
+
+class Job(Base):
+    __tablename__ = "job"
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    kind: Mapped[str] = mapped_column(sa.Unicode)
+    status: Mapped[JobStatus] = mapped_column(saext.Enum(JobStatus), default="pending")
+    user_id: Mapped[int] = mapped_column(sa.ForeignKey(User.id, ondelete="CASCADE"))
+    locale: Mapped[str | None] = mapped_column(sa.Unicode)
+    params: Mapped[Any] = mapped_column(sa_pg.JSONB)
+    result: Mapped[Any | None] = mapped_column(sa_pg.JSONB)
+    error: Mapped[Any | None] = mapped_column(sa_pg.JSONB)
+    progress: Mapped[float | None] = mapped_column(sa.Float)
+    message: Mapped[str | None] = mapped_column(sa.Unicode)
+    cancel: Mapped[bool] = mapped_column(sa.Boolean, default=False)
+    worker: Mapped[str | None] = mapped_column(sa.Unicode)
+    created: Mapped[datetime] = mapped_column(sa.DateTime, default=utcnow_naive)
+    started: Mapped[datetime | None] = mapped_column(sa.DateTime)
+    updated: Mapped[datetime | None] = mapped_column(sa.DateTime)
+    finished: Mapped[datetime | None] = mapped_column(sa.DateTime)
+
+    __table_args__ = (
+        sa.Index("job_status_id_idx", status, id),
+        sa.Index("job_user_id_idx", user_id),
+    )
+
+    user: Mapped[User] = orm.relationship()
+
+    @property
+    def active(self):
+        return self.status in ("pending", "running")
@@ -0,0 +1,3 @@
+from nextgisweb.pytest.core import test_model_ddl
+
+__all__ = ["test_model_ddl"]
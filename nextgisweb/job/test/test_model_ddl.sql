@@ -0,0 +1,28 @@
+/*** Table: job ***/
+
+CREATE TABLE job (
+    id integer GENERATED BY DEFAULT AS IDENTITY NOT NULL,
+    kind character varying NOT NULL,
+    status character varying(50) NOT NULL,
+    user_id integer NOT NULL,
+    locale character varying,
+    params jsonb NOT NULL,
+    result jsonb,
+    error jsonb,
+    progress double precision,
+    message character varying,
+    cancel boolean NOT NULL,
+    worker character varying,
+    created timestamp without time zone NOT NULL,
+    started timestamp without time zone,
+    updated timestamp without time zone,
+    finished timestamp without time zone,
+    PRIMARY KEY (id),
+    FOREIGN KEY (user_id) REFERENCES auth_principal (id) ON DELETE CASCADE
+);
+
+COMMENT ON TABLE job IS 'job';
+
+CREATE INDEX job_status_id_idx ON job(status, id);
+
+CREATE INDEX job_user_id_idx ON job(user_id);
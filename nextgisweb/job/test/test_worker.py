@@ -0,0 +1,120 @@
+import pytest
+import sqlalchemy as sa
+import transaction
+import zope.event
+
+from nextgisweb.lib.datetime import utcnow_naive
+
+from nextgisweb.pyramid.test import WebTestApp
+from nextgisweb.resource import Resource
+from nextgisweb.resource.event import AfterResourceCollectionPost
+
+from ..worker import Worker
+
+pytestmark = pytest.mark.usefixtures("ngw_auth_administrator")
+
+
+@pytest.fixture
+def worker(ngw_env):
+    yield Worker(ngw_env.job, name="test")
+
+
+def job_status(app, job_id):
+    return app.get(f"/api/component/job/{job_id}").json
+
+
+def test_resource_create(ngw_resource_group_sub, worker, monkeypatch, ngw_webtest_app: WebTestApp):
+    events = []
+    monkeypatch.setattr(zope.event, "subscribers", [*zope.event.subscribers, events.append])
+
+    body = dict(
+        resource=dict(
+            cls="resource_group",
+            parent=dict(id=ngw_resource_group_sub),
+            display_name="Created in background",
+        )
+    )
+    resp = ngw_webtest_app.post_json("/api/component/job/resource", body, status=202)
+    job_id = resp.json["id"]
+    assert job_status(ngw_webtest_app, job_id)["status"] == "pending"
+
+    worker.run(once=True)
+
+    status = job_status(ngw_webtest_app, job_id)
+    assert status["status"] == "done"
+    assert status["progress"] == 1
+    assert status["result"]["parent"]["id"] == ngw_resource_group_sub
+
+    with transaction.manager:
+        res = Resource.filter_by(id=status["result"]["id"]).one()
+        assert res.display_name == "Created in background"
+
+    (event,) = [e for e in events if isinstance(e, AfterResourceCollectionPost)]
+    assert sa.inspect(event.resource).identity == (res.id,)
+    assert event.request is None
+
+    jobs = ngw_webtest_app.get("/api/component/job/").json
+    assert job_id in [j["id"] for j in jobs]
+
+
+def test_resource_create_error(ngw_resource_group_sub, worker, ngw_webtest_app: WebTestApp):
+    body = dict(
+        resource=dict(
+            cls="resource_group",
+            parent=dict(id=ngw_resource_group_sub),
+            display_name="Duplicate",
+        )
+    )
+    first, second = (
+        ngw_webtest_app.post_json("/api/component/job/resource", body).json["id"] for _ in range(2)
+    )
+
+    worker.run(once=True)
+
+    assert job_status(ngw_webtest_app, first)["status"] == "done"
+    status = job_status(ngw_webtest_app, second)
+    assert status["status"] == "failed"
+    assert status["error"]["exception"] == "DisplayNameNotUnique"
+
+
+def test_cancel(ngw_resource_group_sub, worker, ngw_webtest_app: WebTestApp):
+    body = dict(resource=dict(cls="resource_group", parent=dict(id=ngw_resource_group_sub)))
+    job_id = ngw_webtest_app.post_json("/api/component/job/resource", body).json["id"]
+
+    resp = ngw_webtest_app.delete(f"/api/component/job/{job_id}")
+    assert resp.json["status"] == "canceled"
+
+    worker.run(once=True)
+    assert job_status(ngw_webtest_app, job_id)["status"] == "canceled"
+
+
+def test_cancel_running(ngw_resource_group_sub, worker, ngw_webtest_app: WebTestApp):
+    body = dict(resource=dict(cls="resource_group", parent=dict(id=ngw_resource_group_sub)))
+    job_id = ngw_webtest_app.post_json("/api/component/job/resource", body).json["id"]
+    assert worker.claim()[0] == job_id
+
+    resp = ngw_webtest_app.delete(f"/api/component/job/{job_id}")
+    assert resp.json["status"] == "running"
+    assert resp.json["cancel"] is True
+
+    worker._update(job_id, status="canceled", finished=utcnow_naive())
+
+
+def test_cancel_before_done(ngw_resource_group_sub, worker, ngw_webtest_app: WebTestApp):
+    body = dict(
+        resource=dict(
+            cls="resource_group",
+            parent=dict(id=ngw_resource_group_sub),
+            display_name="Canceled before done",
+        )
+    )
+    job_id = ngw_webtest_app.post_json("/api/component/job/resource", body).json["id"]
+
+    # Cancellation requested after the last heartbeat prevents the job from
+    # being marked as done and its changes from being committed
+    worker._update(job_id, cancel=True)
+    worker.run(once=True)
+
+    assert job_status(ngw_webtest_app, job_id)["status"] == "canceled"
+    with transaction.manager:
+        assert Resource.filter_by(display_name="Canceled before done").first() is None
@@ -0,0 +1,200 @@
+import os
+import socket
+from threading import Event, Thread
+
+import sqlalchemy as sa
+import transaction
+from zope.sqlalchemy import mark_changed
+
+from nextgisweb.env import DBSession, gettext
+from nextgisweb.lib.datetime import utcnow_naive
+from nextgisweb.lib.logging import logger
+
+from nextgisweb.auth import User
+from nextgisweb.core import CoreComponent
+from nextgisweb.core.exception import UserException
+
+from .context import JobCanceled, JobContext, _current
+from .handler import JobHandler
+from .model import Job
+
+
+class Worker:
+    """Worker executing queued jobs one by one
+
+    Jobs are claimed with SELECT ... FOR UPDATE SKIP LOCKED, so any number of
+    workers can process the same queue. While a job is running, a separate
+    thread updates its progress and heartbeat time and watches for the
+    cancellation flag. Running jobs without heartbeat for the stale timeout
+    are considered lost and marked as failed."""
+
+    def __init__(self, comp, *, name=None):
+        self.comp = comp
+        self.name = name or f"{socket.gethostname()}:{os.getpid()}"
+        self.poll_interval = comp.options["worker.poll_interval"].total_seconds()
+        self.heartbeat_interval = comp.options["worker.heartbeat_interval"].total_seconds()
+        self.stale_timeout = comp.options["worker.stale_timeout"]
+        self.stopped = Event()
+
+    def run(self, *, once=False):
+        """Execute jobs until stopped
+
+        :param once: Stop when there are no pending jobs"""
+
+        logger.info("Job worker %s started", self.name)
+        while not self.stopped.is_set():
+            self.fail_stale()
+            if self.run_one():
+                continue
+            if once:
+                break
+            self.stopped.wait(self.poll_interval)
+        logger.info("Job worker %s stopped", self.name)
+
+    def stop(self):
+        self.stopped.set()
+
+    def claim(self):
+        with transaction.manager:
+            job = DBSession.scalars(
+                sa.select(Job)
+                .where(Job.status == "pending")
+                .order_by(Job.id)
+                .limit(1)
+                .with_for_update(skip_locked=True)
+            ).first()
+            if job is None:
+                return None
+
+            now = utcnow_naive()
+            job.status = "running"
+            job.worker = self.name
+            job.started = job.updated = now
+            return job.id, job.kind, job.params, job.user_id, job.locale
+
+    def run_one(self):
+        """Claim and execute a pending job
+
+        :returns: False if there are no pending jobs"""
+
+        if (claimed := self.claim()) is None:
+            return False
+
+        job_id, kind, params, user_id, locale = claimed
+        logger.info("Job #%d (%s) started", job_id, kind)
+
+        ctx = JobContext(job_id)
+        finished = Event()
+        heartbeat = Thread(target=self._heartbeat, args=(ctx, finished), daemon=True)
+        heartbeat.start()
+
+        token = _current.set(ctx)
+        try:
+            with transaction.manager:
+                user = User.filter_by(id=user_id).one()
+                handler = JobHandler.registry[kind](user)
+                result = handler(params)
+
+                # The job is marked as done within its own transaction, so
+                # heartbeat updates of the job row must be stopped before.
+                finished.set()
+                heartbeat.join()
+                ctx.check()
+                self._done(job_id, result, ctx)
+        except JobCanceled:
+            logger.info("Job #%d canceled", job_id)
+            values = dict(status="canceled")
+        except Exception as exc:
+            if not isinstance(exc, UserException):
+                logger.exception("Job #%d failed", job_id)
+            values = dict(status="failed", error=self.error_data(exc, locale))
+        else:
+            logger.info("Job #%d done", job_id)
+            return True
+        finally:
+            _current.reset(token)
+            finished.set()
+            heartbeat.join()
+
+        progress, message = ctx.snapshot()
+        values = dict(dict(progress=progress, message=message), **values)
+        self._update(job_id, finished=utcnow_naive(), **values)
+        return True
+
+    def fail_stale(self):
+        now = utcnow_naive()
+        with transaction.manager:
+            result = DBSession.execute(
+                sa.update(Job)
+                .where(Job.status == "running", Job.updated < now - self.stale_timeout)
+                .values(
+                    status="failed",
+                    finished=now,
+                    error=dict(
+                        title=str(gettext("Job failed")),
+                        message=str(gettext("The worker executing the job was terminated.")),
+                    ),
+                )
+                .execution_options(synchronize_session=False)
+            )
+            mark_changed(DBSession())
+            if result.rowcount > 0:
+                logger.warning("%d stale jobs marked as failed", result.rowcount)
+
+    def error_data(self, exc, locale):
+        tr = CoreComponent.current().localizer(locale).translate
+        if not isinstance(exc, UserException):
+            return dict(
+                title=tr(gettext("Internal server error")),
+                exception=type(exc).__name__,
+            )
+
+        return dict(
+            title=tr(exc.title),
+            message=tr(exc.message) if exc.message else None,
+            detail=tr(exc.detail) if exc.detail else None,
+            exception=type(exc).__name__,
+            data=exc.data,
+        )
+
+    def _heartbeat(self, ctx, finished):
+        while not finished.wait(self.heartbeat_interval):
+            progress, message = ctx.snapshot()
+            try:
+                cancel = self._update(ctx.job_id, progress=progress, message=message)
+            except Exception:
+                logger.exception("Failed to update job #%d", ctx.job_id)
+                continue
+            if cancel:
+                ctx.canceled.set()
+
+    def _done(self, job_id, result, ctx):
+        now = utcnow_naive()
+        done = DBSession.execute(
+            sa.update(Job)
+            .where(Job.id == job_id, Job.cancel.is_(False))
+            .values(
+                status="done",
+                result=result,
+                progress=1,
+                message=ctx.snapshot()[1],
+                updated=now,
+                finished=now,
+            )
+            .execution_options(synchronize_session=False)
+        )
+        if done.rowcount == 0:
+            raise JobCanceled
+        mark_changed(DBSession())
+
+    def _update(self, job_id, **values):
+        # Job execution transaction isn't committed until the job is done, so
+        # updates are made through a separate connection.
+        engine = CoreComponent.current().engine
+        with engine.connect() as con, con.begin():
+            return con.execute(
+                sa.update(Job.__table__)
+                .where(Job.__table__.c.id == job_id)
+                .values(updated=utcnow_naive(), **values)
+                .returning(Job.__table__.c.cancel)
+            ).scalar()
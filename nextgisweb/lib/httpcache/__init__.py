@@ -0,0 +1,251 @@
+import json
+import sqlite3
+from dataclasses import dataclass
+from email.utils import parsedate_to_datetime
+from hashlib import sha256
+from pathlib import Path
+from threading import Lock
+from time import time
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+SQLITE_TIMEOUT = 10
+
+# Statuses of responses which can be stored, tile servers usually respond
+# with 204 or 404 for missing tiles.
+CACHEABLE_STATUS = (200, 204, 404)
+
+# Eviction removes entries to this fraction of the size limit, so it doesn't
+# run on every write to a full cache
+EVICT_RATIO = 0.9
+
+# Access time of entries isn't updated more often than this number of seconds
+# to avoid writes on each cache hit
+ATIME_RESOLUTION = 60
+
+
+@dataclass
+class CacheEntry:
+    status: int
+    content: bytes
+    content_type: str | None
+    etag: str | None
+    last_modified: str | None
+    expires: float
+
+    @property
+    def fresh(self):
+        return self.expires > time()
+
+    def validators(self):
+        """Headers for a conditional request revalidating the entry"""
+
+        result = dict()
+        if self.etag is not None:
+            result["If-None-Match"] = self.etag
+        if self.last_modified is not None:
+            result["If-Modified-Since"] = self.last_modified
+        return result
+
+
+def cache_key(url, params=None, *, identity=None):
+    """Make a cache key from a URL and an authentication identity
+
+    Query parameters from the URL and params are sorted, so their order
+    doesn't matter. Identity can be anything JSON serializable, which affects
+    responses, like credentials and headers. It's only stored hashed."""
+
+    up = urlsplit(url)
+    query = parse_qsl(up.query, keep_blank_values=True)
+    if params is not None:
+        query.extend((k, str(v)) for k, v in params.items())
+    url = urlunsplit((up.scheme.lower(), up.netloc.lower(), up.path, urlencode(sorted(query)), ""))
+    data = json.dumps([url, identity], default=str, sort_keys=True)
+    return sha256(data.encode("utf-8")).hexdigest()
+
+
+def expires_at(headers, now=None):
+    """Expiration time of a response or None if it must not be stored
+
+    Responses without explicit freshness, but with validators, are stored
+    expired, so they are revalidated on each use."""
+
+    now = time() if now is None else now
+    validators = headers.get("ETag") is not None or headers.get("Last-Modified") is not None
+
+    directives = dict()
+    for item in (headers.get("Cache-Control") or "").split(","):
+        name, _, value = item.strip().partition("=")
+        directives[name.lower()] = value.strip('"')
+
+    if "no-store" in directives:
+        return None
+    if "no-cache" in directives:
+        return now if validators else None
+
+    for name in ("s-maxage", "max-age"):
+        if name in directives:
+            try:
+                max_age = int(directives[name])
+            except ValueError:
+                return now if validators else None
+            try:
+                age = int(headers.get("Age") or 0)
+            except ValueError:
+                age = 0
+            return now + max(max_age - age, 0)
+
+    if (expires := headers.get("Expires")) is not None:
+        try:
+            expires = parsedate_to_datetime(expires).timestamp()
+            date = headers.get("Date")
+            date = parsedate_to_datetime(date).timestamp() if date else now
+        except (TypeError, ValueError):
+            # Invalid dates like "0" mean already expired
+            return now if validators else None
+        return now + max(expires - date, 0)
+
+    return now if validators else None
+
+
+class HTTPCache:
+    """Disk cache of HTTP responses shared between processes
+
+    Entries are stored in a SQLite database and evicted in the order of
+    access when the total size of contents exceeds the limit."""
+
+    def __init__(self, path, max_size):
+        self.path = Path(path)
+        self.max_size = max_size
+        self._connection = None
+        self._written = 0
+        self._lock = Lock()
+
+    def _connect(self):
+        if self._connection is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            con = sqlite3.connect(
+                self.path,
+                isolation_level="DEFERRED",
+                timeout=SQLITE_TIMEOUT,
+                check_same_thread=False,
+            )
+            con.execute("PRAGMA journal_mode = WAL")
+            # fmt: off
+            con.execute("""
+                CREATE TABLE IF NOT EXISTS response (
+                    key TEXT NOT NULL PRIMARY KEY,
+                    status INTEGER NOT NULL,
+                    content BLOB NOT NULL,
+                    content_type TEXT,
+                    etag TEXT,
+                    last_modified TEXT,
+                    expires REAL NOT NULL,
+                    atime REAL NOT NULL
+                )
+            """)
+            # fmt: on
+            con.execute("CREATE INDEX IF NOT EXISTS response_atime_idx ON response (atime)")
+            con.commit()
+            self._connection = con
+        return self._connection
+
+    def get(self, key):
+        with self._lock:
+            con = self._connect()
+            row = con.execute(
+                "SELECT status, content, content_type, etag, last_modified, expires, atime "
+                "FROM response WHERE key = ?",
+                (key,),
+            ).fetchone()
+            if row is None:
+                return None
+
+            now = time()
+            if row[6] + ATIME_RESOLUTION < now:
+                try:
+                    con.execute("UPDATE response SET atime = ? WHERE key = ?", (now, key))
+                    con.commit()
+                except sqlite3.Error:
+                    con.rollback()
+
+        return CacheEntry(*row[:6])
+
+    def put(self, key, status, headers, content):
+        """Store a response if it's allowed by its status and headers
+
+        :returns: Stored entry or None"""
+
+        if status not in CACHEABLE_STATUS or (expires := expires_at(headers)) is None:
+            return None
+
+        entry = CacheEntry(
+            status=status,
+            content=content,
+            content_type=headers.get("Content-Type"),
+            etag=headers.get("ETag"),
+            last_modified=headers.get("Last-Modified"),
+            expires=expires,
+        )
+
+        with self._lock:
+            con = self._connect()
+            try:
+                con.execute(
+                    "INSERT OR REPLACE INTO response "
+                    "(key, status, content, content_type, etag, last_modified, expires, atime) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (key, *entry.__dict__.values(), time()),
+                )
+                con.commit()
+            except sqlite3.Error:
+                con.rollback()
+                raise
+
+            # Other processes write to the cache too, so the total size is
+            # only checked after writing a fraction of the limit.
+            self._written += len(content)
+            if evict := self._written > self.max_size * (1 - EVICT_RATIO):
+                self._written = 0
+
+        if evict:
+            self.evict()
+
+        return entry
+
+    def refresh(self, key, headers):
+        """Update expiration time of an entry after revalidation"""
+
+        with self._lock:
+            con = self._connect()
+            if (expires := expires_at(headers)) is None:
+                con.execute("DELETE FROM response WHERE key = ?", (key,))
+            else:
+                con.execute(
+                    "UPDATE response SET expires = ?, atime = ? WHERE key = ?",
+                    (expires, time(), key),
+                )
+            con.commit()
+
+    def evict(self):
+        """Remove least recently used entries if the size limit is exceeded
+
+        :returns: Number of deleted entries"""
+
+        with self._lock:
+            con = self._connect()
+            total = con.execute("SELECT coalesce(sum(length(content)), 0) FROM response")
+            total = total.fetchone()[0]
+            if total <= self.max_size:
+                return 0
+
+            deleted, keep = 0, self.max_size * EVICT_RATIO
+            rows = con.execute("SELECT key, length(content) FROM response ORDER BY atime")
+            for key, size in rows.fetchall():
+                if total <= keep:
+                    break
+                con.execute("DELETE FROM response WHERE key = ?", (key,))
+                total -= size
+                deleted += 1
+            con.commit()
+
+        return deleted
@@ -0,0 +1,62 @@
+import pytest
+
+from .. import HTTPCache, cache_key, expires_at
+
+NOW = 1_000_000
+
+
+@pytest.mark.parametrize(
+    "headers, expected",
+    (
+        ({}, None),
+        ({"Cache-Control": "no-store, max-age=60"}, None),
+        ({"Cache-Control": "no-cache"}, None),
+        ({"Cache-Control": "no-cache", "ETag": '"a"'}, NOW),
+        ({"Cache-Control": "public, max-age=60"}, NOW + 60),
+        ({"Cache-Control": "max-age=60, s-maxage=120"}, NOW + 120),
+        ({"Cache-Control": "max-age=60", "Age": "50"}, NOW + 10),
+        (
+            {
+                "Date": "Thu, 01 Jan 2026 00:00:00 GMT",
+                "Expires": "Thu, 01 Jan 2026 01:00:00 GMT",
+            },
+            NOW + 3600,
+        ),
+        ({"Expires": "0"}, None),
+        ({"Last-Modified": "Thu, 01 Jan 2026 00:00:00 GMT"}, NOW),
+    ),
+)
+def test_expires_at(headers, expected):
+    assert expires_at(headers, NOW) == expected
+
+
+def test_cache_key():
+    key = cache_key("http://Example.com/tile?b=2&a=1", identity=("user", "secret"))
+    assert key == cache_key("http://example.com/tile?a=1", dict(b=2), identity=("user", "secret"))
+    assert key != cache_key("http://example.com/tile?a=1&b=2", identity=("user", "other"))
+    assert "secret" not in key
+
+
+def test_cache(tmp_path):
+    cache = HTTPCache(tmp_path / "cache.sqlite", max_size=1000)
+
+    assert cache.put("nostore", 200, {}, b"data") is None
+    assert cache.put("error", 500, {"Cache-Control": "max-age=60"}, b"data") is None
+    assert cache.get("nostore") is None
+
+    cache.put("fresh", 200, {"Cache-Control": "max-age=60", "Content-Type": "image/png"}, b"x")
+    entry = cache.get("fresh")
+    assert entry.fresh and entry.content == b"x" and entry.content_type == "image/png"
+
+    cache.put("stale", 404, {"ETag": '"v1"'}, b"")
+    entry = cache.get("stale")
+    assert not entry.fresh and entry.status == 404
+    assert entry.validators() == {"If-None-Match": '"v1"'}
+
+    cache.refresh("stale", {"Cache-Control": "max-age=60"})
+    assert cache.get("stale").fresh
+
+    for i in range(10):
+        cache.put(f"big-{i}", 200, {"Cache-Control": "max-age=60"}, b"0" * 200)
+    assert cache.get("fresh") is None
+    assert cache.get("big-9") is not None
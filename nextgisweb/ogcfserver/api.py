@@ -3,15 +3,18 @@ from pyramid.httpexceptions import HTTPNotFound
 from pyramid.response import Response
 from shapely.geometry import box
 
+from nextgisweb.env import gettext
 from nextgisweb.lib.datetime import utcnow_naive
 from nextgisweb.lib.geometry import Geometry
+from nextgisweb.lib.json import dumpb as json_dumpb
 
 import nextgisweb.feature_layer.api as feature_layer_api
-from nextgisweb.feature_layer import Feature, IWritableFeatureLayer
+from nextgisweb.core.exception import ValidationError
+from nextgisweb.feature_layer import Feature, IFeatureQuerySeek, IWritableFeatureLayer
 from nextgisweb.feature_layer.api import query_feature_or_not_found
 from nextgisweb.pyramid import JSONType
 from nextgisweb.pyramid.tomb import Request
-from nextgisweb.resource import DataScope, ResourceFactory, ServiceScope
+from nextgisweb.resource import DataScope, Resource, ResourceFactory, ServiceScope
 
 from .component import OGCFServerComponent
 from .model import Service
@@ -221,58 +224,106 @@ def items(resource, request: Request) -> JSONType:
             )
             offset = int(request.GET.get("offset", 0))
 
-            dumper = dumper_factory(c.resource)
-            query = dumper.feature_query()
-            query.limit(limit, offset)
+            cursor = request.GET.get("cursor")
+            if cursor is not None and offset > 0:
+                raise ValidationError(message=gettext("Offset can't be used with cursor."))
 
             bbox = request.GET.get("bbox")
-            if bbox is not None:
-                box_coords = map(float, bbox.split(",")[:4])
-                box_geom = Geometry.from_shape(box(*box_coords), srid=4326, validate=False)
-                query.intersects(box_geom)
-
-            features = [feature_to_ogc(dumper, feature) for feature in query()]
-
-            items = dict(
-                type="FeatureCollection",
-                features=features,
-                timeStamp=utcnow_naive().strftime("%Y-%m-%dT%H:%M:%S.%fZ"),
-                links=[
-                    {
-                        "rel": "self",
-                        "type": "application/json",
-                        "title": "This document",
-                        "href": request.route_url(
-                            "ogcfserver.items",
-                            id=resource.id,
-                            collection_id=collection_id,
-                            _query=request.params,
-                        ),
-                    },
-                    {
-                        "rel": "next",
-                        "type": "application/geo+json",
-                        "title": "items (next)",
-                        "href": request.route_url(
-                            "ogcfserver.items",
-                            id=resource.id,
-                            collection_id=collection_id,
-                            _query={**request.params, "offset": limit + offset},
-                        ),
-                    },
-                    {
-                        "rel": "collection",
-                        "type": "application/json",
-                        "title": c.display_name,
-                        "href": request.route_url(
-                            "ogcfserver.collection",
-                            id=resource.id,
-                            collection_id=collection_id,
-                        ),
-                    },
-                ],
+
+            def feature_query(layer):
+                dumper = dumper_factory(layer)
+                query = dumper.feature_query()
+                query.limit(limit, offset)
+
+                if bbox is not None:
+                    box_coords = map(float, bbox.split(",")[:4])
+                    box_geom = Geometry.from_shape(box(*box_coords), srid=4326, validate=False)
+                    query.intersects(box_geom)
+
+                if cursor is not None:
+                    feature_layer_api.seek_cursor_load(query, cursor, ())
+
+                return dumper, query
+
+            # Validate parameters before the response is started
+            feature_query(c.resource)
+
+            layer_id = c.resource.id
+            page = dict(count=0, last=None, seek=False)
+
+            def features():
+                dumper, query = feature_query(Resource.filter_by(id=layer_id).one())
+                page["seek"] = IFeatureQuerySeek.providedBy(query)
+                for feature in query():
+                    page["count"] += 1
+                    page["last"] = feature
+                    yield feature_to_ogc(dumper, feature)
+
+            links = [
+                {
+                    "rel": "self",
+                    "type": "application/json",
+                    "title": "This document",
+                    "href": request.route_url(
+                        "ogcfserver.items",
+                        id=resource.id,
+                        collection_id=collection_id,
+                        _query=request.params,
+                    ),
+                },
+                {
+                    "rel": "collection",
+                    "type": "application/json",
+                    "title": c.display_name,
+                    "href": request.route_url(
+                        "ogcfserver.collection",
+                        id=resource.id,
+                        collection_id=collection_id,
+                    ),
+                },
+            ]
+
+            def tail():
+                # Keyset pagination is used unless offset is given explicitly
+                if offset == 0 and page["seek"]:
+                    if page["count"] == limit and limit > 0:
+                        next_query = {
+                            **request.params,
+                            "cursor": feature_layer_api.seek_cursor_dump(page["last"], ()),
+                        }
+                    else:
+                        next_query = None
+                else:
+                    next_query = {**request.params, "offset": limit + offset}
+
+                if next_query is not None:
+                    links.insert(
+                        1,
+                        {
+                            "rel": "next",
+                            "type": "application/geo+json",
+                            "title": "items (next)",
+                            "href": request.route_url(
+                                "ogcfserver.items",
+                                id=resource.id,
+                                collection_id=collection_id,
+                                _query=next_query,
+                            ),
+                        },
+                    )
+
+                timestamp = utcnow_naive().strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+                return b"," + json_dumpb(dict(timeStamp=timestamp, links=links))[1:]
+
+            # Features are encoded by batches and the next link depends on the
+            # last feature, so it goes after them.
+            return feature_layer_api.stream_response(
+                feature_layer_api.stream_json_array(
+                    features(),
+                    head=b'{"type":"FeatureCollection","features":',
+                    tail=tail,
+                )
             )
-            return items
     return HTTPNotFound()
 
 
@@ -28,25 +28,33 @@ from nextgisweb.feature_layer import (
     FIELD_TYPE,
     GEOM_TYPE,
     Feature,
+    FeatureLayerComponent,
     FeatureLayerGeometryType,
     FeatureLayerMixin,
     FeatureLayerTransactionContext,
+    FeatureQueryGMLMixin,
     FeatureQueryIntersectsMixin,
+    FeatureQuerySeekMixin,
     FeatureSet,
     IAggregatableFeatureQuery,
     IFeatureLayer,
     IFeatureQuery,
     IFeatureQueryFilter,
     IFeatureQueryFilterBy,
+    IFeatureQueryGML,
     IFeatureQueryIlike,
     IFeatureQueryIntersects,
     IFeatureQueryLike,
+    IFeatureQueryMVT,
     IFeatureQueryOrderBy,
+    IFeatureQuerySeek,
     IFilterableFeatureLayer,
     IWritableFeatureLayer,
     LayerField,
+    mvt_cache_invalidate,
 )
 from nextgisweb.feature_layer.filter import FilterParser
+from nextgisweb.feature_layer.mvt import mvt_query
 from nextgisweb.layer import IBboxLayer
 from nextgisweb.resource import (
     ConnectionScope,
@@ -555,6 +563,7 @@ class PostgisLayer(Resource, FeatureLayerMixin):
         super().feature_transaction_enter(ftxn)
         ftxn.enter_context(self._connection_context())
 
+    @mvt_cache_invalidate
     def feature_put(self, feature):
         """Update existing object
 
@@ -568,6 +577,7 @@ class PostgisLayer(Resource, FeatureLayerMixin):
         with self.connect() as conn:
             conn.execute(stmt, update=True)
 
+    @mvt_cache_invalidate
     def feature_create(self, feature):
         """Insert new object to DB which is described in feature
 
@@ -584,6 +594,7 @@ class PostgisLayer(Resource, FeatureLayerMixin):
             fid = conn.execute(stmt, update=True).scalar()
         return fid
 
+    @mvt_cache_invalidate
     def feature_delete(self, feature_id):
         """Remove record with id
 
@@ -597,6 +608,7 @@ class PostgisLayer(Resource, FeatureLayerMixin):
         with self.connect() as conn:
             conn.execute(stmt, update=True)
 
+    @mvt_cache_invalidate
     def feature_delete_all(self):
         """Remove all records from a layer"""
         tab = self._sa_table()
@@ -662,9 +674,12 @@ class PostgisLayerSerializer(Serializer, resource=PostgisLayer):
     IFeatureQueryIlike,
     IFeatureQueryIntersects,
     IFeatureQueryOrderBy,
+    IFeatureQuerySeek,
+    IFeatureQueryMVT,
+    IFeatureQueryGML,
     IAggregatableFeatureQuery,
 )
-class FeatureQueryBase(FeatureQueryIntersectsMixin):
+class FeatureQueryBase(FeatureQueryIntersectsMixin, FeatureQuerySeekMixin, FeatureQueryGMLMixin):
     def __init__(self):
         super().__init__()
 
@@ -851,6 +866,32 @@ class FeatureQueryBase(FeatureQueryIntersectsMixin):
 
         return tab, col_map, where
 
+    def mvt(self, bounds, *, name, extent, buffer, simplify=None):
+        tab, col_map, where = self.build_query_context()
+
+        fields = [
+            (fld.keyname, tab.columns[fld.column_name], fld.datatype)
+            for fld in self.layer.fields
+            if self._fields is None or fld.keyname in self._fields
+        ]
+
+        query = mvt_query(
+            tab.columns[self.layer.column_id],
+            tab.columns[self.layer.column_geom],
+            self.layer.geometry_srid,
+            fields,
+            where,
+            bounds=bounds,
+            name=name,
+            extent=extent,
+            buffer=buffer,
+            simplify=simplify,
+        )
+
+        with self.layer.connect() as conn:
+            data = conn.execute(query, update=False).scalar()
+        return bytes(data) if data else b""
+
     def __call__(self):
         tab, col_map, where = self.build_query_context()
 
@@ -867,16 +908,21 @@ class FeatureQueryBase(FeatureQueryIntersectsMixin):
             geomexpr = geomcol
 
         if self._geom:
-            if self._geom_format == "WKB":
+            if self._gml is not None:
+                geomexpr = self.gml_expr(geomexpr, idcol)
+            elif self._geom_format == "WKB":
                 geomexpr = func.st_asbinary(geomexpr, "NDR")
             else:
                 geomexpr = func.st_astext(geomexpr)
 
             columns.append(geomexpr.label("geom"))
 
+        # Ordering fields are always selected to get a seek key from features
+        order_fields = [k for _, k in self._order_by or ()]
+
         selected_fields = []
         for idx, fld in enumerate(self.layer.fields):
-            if self._fields is None or fld.keyname in self._fields:
+            if self._fields is None or fld.keyname in self._fields or fld.keyname in order_fields:
                 label = f"fld_{idx}"
                 columns.append(tab.columns[fld.column_name].label(label))
                 selected_fields.append((fld.keyname, label))
@@ -900,11 +946,19 @@ class FeatureQueryBase(FeatureQueryIntersectsMixin):
                 )
         order_criterion.append(idcol)
 
+        seek_where = []
+        if self._seek is not None:
+            keys = [
+                (tab.columns[self.layer.field_by_keyname(k).column_name], order)
+                for order, k in self._order_by or ()
+            ]
+            seek_where.append(self.seek_clause(keys + [(idcol, "asc")]))
+
         class QueryFeatureSet(FeatureSet):
             layer = self.layer
 
             _geom = self._geom
-            _geom_format = self._geom_format
+            _geom_format = "GML" if self._gml is not None else self._geom_format
             _box = self._box
             _fields = self._fields
             _limit = self._limit
@@ -918,17 +972,22 @@ class FeatureQueryBase(FeatureQueryIntersectsMixin):
                     .order_by(*order_criterion)
                 )
 
-                if len(where) > 0:
-                    query = query.where(sa.and_(*where))
+                if len(where) + len(seek_where) > 0:
+                    query = query.where(sa.and_(*where, *seek_where))
+
+                comp = FeatureLayerComponent.current()
+                options = comp.query_execution_options(self._limit)
 
                 with self.layer.connect() as conn:
-                    result = conn.execute(query, update=False)
+                    result = conn.execute(query, update=False, execution_options=options)
                     for row in result.mappings():
                         fdict = dict((keyname, row[label]) for keyname, label in selected_fields)
 
                         if self._geom:
                             if (geom_data := row.geom) is None:
                                 geom = None
+                            elif self._geom_format == "GML":
+                                geom = geom_data
                             elif self._geom_format == "WKB":
                                 # TODO: bytes(...) can be removed after psycopg3 upgrade
                                 geom = Geometry.from_wkb(bytes(geom_data), validate=False)
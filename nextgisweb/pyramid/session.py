@@ -1,7 +1,9 @@
+import sqlalchemy as sa
+import sqlalchemy.dialects.postgresql as sa_pg
 import transaction
 from pyramid.interfaces import ISession
-from sqlalchemy.exc import NoResultFound
 from zope.interface import implementer
+from zope.sqlalchemy import mark_changed
 
 from nextgisweb.env import DBSession
 from nextgisweb.lib.datetime import utcnow_naive
@@ -17,7 +19,6 @@ class WebSession(dict):
     def __init__(self, request: Request):
         pyramid = request.env.component(PyramidComponent)
 
-        self._refreshed = False
         self._updated = list()
         self._cleared = False
         self._deleted = list()
@@ -27,15 +28,29 @@ class WebSession(dict):
         self._last_activity = None
 
         if self._session_id is not None:
-            try:
-                actual_date = utcnow_naive() - self._cookie_max_age
-                session = Session.filter(
-                    Session.id == self._session_id, Session.last_activity > actual_date
-                ).one()
+            # Load the session and all its keys at once, so there are no
+            # queries on reading keys later.
+            actual_date = utcnow_naive() - self._cookie_max_age
+            rows = DBSession.execute(
+                sa.select(
+                    Session.created,
+                    Session.last_activity,
+                    SessionStore.key,
+                    SessionStore.value,
+                )
+                .select_from(Session)
+                .outerjoin(SessionStore, SessionStore.session_id == Session.id)
+                .where(Session.id == self._session_id, Session.last_activity > actual_date)
+            ).all()
+
+            if len(rows) > 0:
                 self.new = False
-                self.created = datetime_to_unix(session.created)
-                self._last_activity = session.last_activity
-            except NoResultFound:
+                self.created = datetime_to_unix(rows[0].created)
+                self._last_activity = rows[0].last_activity
+                for row in rows:
+                    if row.key is not None:
+                        super().__setitem__(row.key, row.value)
+            else:
                 self._session_id = None
 
         if self._session_id is None:
@@ -70,20 +85,26 @@ class WebSession(dict):
                 if len(self._updated) > 0:
                     if self._session_id is None:
                         self._session_id = gensecret(32)
-                        Session(
-                            id=self._session_id, created=utcnow, last_activity=utcnow
-                        ).persist()
+                        DBSession.execute(
+                            sa.insert(Session).values(
+                                id=self._session_id, created=utcnow, last_activity=utcnow
+                            )
+                        )
                         update_cookie = True
 
-                    with DBSession.no_autoflush:
-                        for key in self._updated:
-                            try:
-                                kv = SessionStore.filter_by(
-                                    session_id=self._session_id, key=key
-                                ).one()
-                            except NoResultFound:
-                                kv = SessionStore(session_id=self._session_id, key=key).persist()
-                            kv.value = self[key]
+                    stmt = sa_pg.insert(SessionStore).values(
+                        [
+                            dict(session_id=self._session_id, key=key, value=self[key])
+                            for key in self._updated
+                        ]
+                    )
+                    DBSession.execute(
+                        stmt.on_conflict_do_update(
+                            index_elements=[SessionStore.session_id, SessionStore.key],
+                            set_=dict(value=stmt.excluded.value),
+                        )
+                    )
+                    mark_changed(DBSession())
 
             if update_cookie:
                 # Check if another session is set
@@ -111,29 +132,6 @@ class WebSession(dict):
     def id(self):
         return self._session_id
 
-    @property
-    def _keys(self):
-        return super().keys()
-
-    def _refresh_all(self):
-        if self._session_id is None or self._refreshed:
-            return
-        for kv in SessionStore.filter(
-            SessionStore.session_id == self._session_id, ~SessionStore.key.in_(self._keys)
-        ).all():
-            self[kv.key] = kv.value
-        self._refreshed = True
-
-    def _refresh(self, key):
-        if self._session_id is None or self._refreshed or key in self._keys:
-            return
-        if key not in self._deleted:
-            try:
-                kv = SessionStore.filter_by(session_id=self._session_id, key=key).one()
-                self[key] = kv.value
-            except NoResultFound:
-                pass
-
     # ISession
 
     def flash(self, msg, queue="", allow_duplicate=True):
@@ -147,38 +145,6 @@ class WebSession(dict):
 
     # dict
 
-    def __contains__(self, key, *args, **kwargs):
-        self._refresh(key)
-        return super().__contains__(key, *args, **kwargs)
-
-    def keys(self, *args, **kwargs):
-        self._refresh_all()
-        return super().keys(*args, **kwargs)
-
-    def values(self, *args, **kwargs):
-        self._refresh_all()
-        return super().values(*args, **kwargs)
-
-    def items(self, *args, **kwargs):
-        self._refresh_all()
-        return super().items(*args, **kwargs)
-
-    def __len__(self, *args, **kwargs):
-        self._refresh_all()
-        return super().__len__(*args, **kwargs)
-
-    def __getitem__(self, key, *args, **kwargs):
-        self._refresh(key)
-        return super().__getitem__(key, *args, **kwargs)
-
-    def get(self, key, *args, **kwargs):
-        self._refresh(key)
-        return super().get(key, *args, **kwargs)
-
-    def __iter__(self, *args, **kwargs):
-        self._refresh_all()
-        return super().__iter__(*args, **kwargs)
-
     def __setitem__(self, key, value, *args, **kwargs):
         if key not in self._updated:
             self._updated.append(key)
@@ -193,7 +159,6 @@ class WebSession(dict):
         raise NotImplementedError()
 
     def __delitem__(self, key, *args, **kwargs):
-        self._refresh(key)
         if key not in self._deleted:
             self._deleted.append(key)
         if key in self._updated:
@@ -210,5 +175,4 @@ class WebSession(dict):
         del self._updated[:]
         del self._deleted[:]
         self._cleared = True
-        self._refreshed = True
         return super().clear(*args, **kwargs)
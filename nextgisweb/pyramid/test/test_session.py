@@ -238,6 +238,23 @@ def test_set_del(ngw_webtest_app: WebTestApp, ngw_request_handler):
             ngw_webtest_app.get("/test/request/")
 
 
+def test_read(ngw_webtest_app: WebTestApp, ngw_request_handler):
+    def _set(request):
+        request.session["foo"] = 1
+        request.session["bar"] = 2
+        return Response()
+
+    def _read(request):
+        assert request.session["foo"] == 1
+        assert {"foo", "bar"} <= set(request.session.keys())
+        assert request.session._updated == []
+        return Response()
+
+    for req in (_set, _read):
+        with ngw_request_handler(req):
+            ngw_webtest_app.get("/test/request/")
+
+
 def test_exception(ngw_webtest_app: WebTestApp, ngw_request_handler):
     def _handler(request):
         with pytest.raises(KeyError):
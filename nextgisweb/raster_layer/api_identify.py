@@ -1,18 +1,25 @@
 from typing import Annotated, Any
 
-from msgspec import Struct
-from osgeo import gdal
+from msgspec import Meta, Struct
+from osgeo import gdal, osr
 
-from nextgisweb.env import DBSession
+from nextgisweb.env import DBSession, gettext, gettextf
 from nextgisweb.lib.apitype import Query
+from nextgisweb.lib.geometry import Geometry, GeometryNotValid, Transformer
+from nextgisweb.lib.osrhelper import sr_from_wkt
 
+from nextgisweb.core.exception import ValidationError
 from nextgisweb.pyramid.tomb import Request
 from nextgisweb.resource import DataScope, ResourceRef
+from nextgisweb.spatial_ref_sys import SRS, SRSID
 
 from .component import RasterLayerComponent
 from .model import RasterLayer
+from .sampling import pixel_classes, sample_points, select_level, zonal_statistics
 from .util import band_color_interp
 
+SAMPLE_MAX_POINTS = 10000
+
 
 class Point(Struct, kw_only=True):
     x: float
@@ -97,9 +104,232 @@ def val_at_coord(ds: gdal.Dataset, point: Point):
     return result
 
 
+Bands = Annotated[
+    list[Annotated[int, Meta(ge=1)]] | None,
+    Meta(description="Band numbers, all bands by default"),
+]
+
+Resolution = Annotated[
+    float | None,
+    Meta(
+        gt=0,
+        description="Pixel size in units of raster SRS, the coarsest overview "
+        "with pixel size not exceeding it is used",
+    ),
+]
+
+
+class RasterLayerSampleBody(Struct, kw_only=True):
+    resources: list[int]
+    srs: SRSID
+    points: Annotated[list[Point], Meta(max_length=SAMPLE_MAX_POINTS)]
+    bands: Bands = None
+    resolution: Resolution = None
+
+
+class RasterLayerSampleItem(Struct, kw_only=True):
+    resource: ResourceRef
+    color_interpretation: list[str]
+    pixel_size: tuple[float, float]
+    values: Annotated[
+        list[list[Any] | None],
+        Meta(description="Band values per point, null for points outside the raster"),
+    ]
+    pixel_class: list[list[str | None] | None]
+
+
+class RasterLayerSampleResponse(Struct, kw_only=True):
+    items: list[RasterLayerSampleItem]
+
+
+def sample(request: Request, *, body: RasterLayerSampleBody) -> RasterLayerSampleResponse:
+    """Get raster values at multiple points for list of resources
+
+    :returns: Raster pixel values at the specified points per resource"""
+
+    srs = SRS.filter_by(id=body.srs).one()
+    xs = [p.x for p in body.points]
+    ys = [p.y for p in body.points]
+
+    items: list[RasterLayerSampleItem] = []
+    for res in _readable(request, body.resources):
+        bands = _bands(res, body.bands)
+        ds = res.gdal_dataset()
+        level = select_level(ds, body.resolution)
+
+        if res.srs_id == srs.id:
+            values, inside = sample_points(ds, xs, ys, bands, level=level)
+        else:
+            transform = osr.CoordinateTransformation(
+                sr_from_wkt(srs.wkt), sr_from_wkt(res.srs.wkt)
+            )
+            points = transform.TransformPoints(list(zip(xs, ys)))
+            rxs, rys = [p[0] for p in points], [p[1] for p in points]
+            values, inside = sample_points(ds, rxs, rys, bands, level=level)
+
+        color_interpretation = []
+        band_classes = []
+        for i, bidx in enumerate(bands):
+            band = ds.GetRasterBand(bidx)
+            color_interpretation.append(band_color_interp(band))
+            band_classes.append(pixel_classes(band, values[inside, i]))
+
+        inside = inside.tolist()
+        point_values = [None] * len(inside)
+        point_classes = [None] * len(inside)
+        pidx = 0
+        for idx, row in enumerate(values.tolist()):
+            if not inside[idx]:
+                continue
+            point_values[idx] = row
+            point_classes[idx] = [(c[pidx] if c is not None else None) for c in band_classes]
+            pidx += 1
+
+        items.append(
+            RasterLayerSampleItem(
+                resource=ResourceRef(id=res.id),
+                color_interpretation=color_interpretation,
+                pixel_size=level.pixel_size,
+                values=point_values,
+                pixel_class=point_classes,
+            )
+        )
+
+    return RasterLayerSampleResponse(items=items)
+
+
+class RasterLayerStatisticsBody(Struct, kw_only=True):
+    resources: list[int]
+    srs: SRSID
+    geom: Annotated[str, Meta(description="Zone geometry in WKT format")]
+    bands: Bands = None
+    resolution: Resolution = None
+    bins: Annotated[int, Meta(ge=0, le=1024, description="Number of histogram bins")] = 0
+
+
+class RasterBandStatistics(Struct, kw_only=True):
+    count: Annotated[int, Meta(description="Number of pixels within the zone")]
+    min: float | None
+    max: float | None
+    mean: float | None
+    std: float | None
+    histogram: Annotated[
+        list[int] | None,
+        Meta(description="Pixel counts of equal bins within band value range"),
+    ]
+    histogram_range: tuple[float, float] | None
+
+
+class RasterLayerStatisticsItem(Struct, kw_only=True):
+    resource: ResourceRef
+    pixel_size: tuple[float, float]
+    bands: list[RasterBandStatistics]
+
+
+class RasterLayerStatisticsResponse(Struct, kw_only=True):
+    items: list[RasterLayerStatisticsItem]
+
+
+def statistics(
+    request: Request,
+    *,
+    body: RasterLayerStatisticsBody,
+) -> RasterLayerStatisticsResponse:
+    """Compute zonal statistics of raster values for list of resources
+
+    :returns: Statistics of band values within the specified geometry per resource"""
+
+    srs = SRS.filter_by(id=body.srs).one()
+    try:
+        geom = Geometry.from_wkt(body.geom, srid=srs.id)
+    except GeometryNotValid:
+        raise ValidationError(gettext("Geometry is not valid."))
+
+    max_pixels = RasterLayerComponent.current().options["statistics.max_pixels"]
+
+    items: list[RasterLayerStatisticsItem] = []
+    for res in _readable(request, body.resources):
+        bands = _bands(res, body.bands)
+        ds = res.gdal_dataset()
+        level = select_level(ds, body.resolution)
+
+        zone = geom if res.srs_id == srs.id else Transformer(srs.wkt, res.srs.wkt).transform(geom)
+
+        ranges = None
+        if body.bins > 0:
+            ranges = []
+            for bidx in bands:
+                meta = res.meta.bands[bidx - 1] if res.meta is not None else None
+                if meta is not None and meta.min is not None and meta.max is not None:
+                    ranges.append((meta.min, meta.max))
+                else:
+                    ranges.append(tuple(ds.GetRasterBand(bidx).ComputeRasterMinMax(True)))
+
+        result = zonal_statistics(
+            ds,
+            zone.ogr,
+            bands,
+            level=level,
+            ranges=ranges,
+            bins=body.bins if body.bins > 0 else None,
+            max_pixels=max_pixels,
+        )
+
+        items.append(
+            RasterLayerStatisticsItem(
+                resource=ResourceRef(id=res.id),
+                pixel_size=level.pixel_size,
+                bands=[
+                    RasterBandStatistics(
+                        count=stat.count,
+                        min=stat.min,
+                        max=stat.max,
+                        mean=stat.mean,
+                        std=stat.std,
+                        histogram=stat.histogram,
+                        histogram_range=stat.histogram_range,
+                    )
+                    for stat in result
+                ],
+            )
+        )
+
+    return RasterLayerStatisticsResponse(items=items)
+
+
+def _readable(request, resources):
+    query = DBSession.query(RasterLayer).filter(RasterLayer.id.in_(resources))
+    for res in query:
+        if res.has_permission(DataScope.read, request.user):
+            yield res
+
+
+def _bands(res, bands):
+    if bands is None:
+        return list(range(1, res.band_count + 1))
+    for bidx in bands:
+        if bidx > res.band_count:
+            raise ValidationError(
+                gettextf("Band #{} doesn't exist in raster layer #{}.")(bidx, res.id)
+            )
+    return bands
+
+
 def setup_pyramid(comp: RasterLayerComponent, config):
     config.add_route(
         "raster_layer.identify",
         "/api/component/raster_layer/identify",
         get=identify,
     )
+
+    config.add_route(
+        "raster_layer.sample",
+        "/api/component/raster_layer/sample",
+        post=sample,
+    )
+
+    config.add_route(
+        "raster_layer.statistics",
+        "/api/component/raster_layer/statistics",
+        post=statistics,
+    )
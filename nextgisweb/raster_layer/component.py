@@ -9,6 +9,7 @@ from nextgisweb.lib.logging import logger
 from nextgisweb.core.component import CoreComponent
 from nextgisweb.file_upload import FileUploadComponent
 
+from .dataset_cache import DatasetCache
 from .kind_of_data import RasterLayerData
 from .model import RasterBand, RasterLayer, RasterLayerMeta, estimate_raster_layer_data
 from .util import band_color_interp
@@ -23,6 +24,7 @@ class RasterLayerComponent(Component, WorkdirMixin):
         core.mksdir(self)
         self.wdir = core.gtsdir(self)
         self.cog_default = self.options["cog_default"]
+        self.dataset_cache = DatasetCache(self.options["dataset_cache.size"])
 
         if "size_limit" not in self.options:
             file_upload = self.env.component(FileUploadComponent)
@@ -99,4 +101,16 @@ class RasterLayerComponent(Component, WorkdirMixin):
             default=None,
             doc="Uncompressed raster size limit (by default equals 2x file upload max size)",
         ),
+        Option(
+            "dataset_cache.size",
+            int,
+            default=16,
+            doc="Number of opened GDAL datasets cached per thread, 0 to disable caching.",
+        ),
+        Option(
+            "statistics.max_pixels",
+            int,
+            default=64 * 2**20,
+            doc="Maximum zone size in pixels for raster statistics.",
+        ),
     )
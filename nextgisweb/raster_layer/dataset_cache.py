@@ -0,0 +1,37 @@
+from collections import OrderedDict
+from threading import local
+
+
+class DatasetCache:
+    """Per-thread LRU cache of opened GDAL datasets
+
+    A GDAL dataset can't be used by multiple threads at the same time, so each
+    thread has its own datasets. Keys must identify dataset contents, like a
+    FileObj UUID, so datasets of replaced files are never returned and are
+    evicted eventually."""
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._local = local()
+
+    def get(self, key, opener):
+        if self.maxsize == 0:
+            return opener()
+
+        if (data := getattr(self._local, "data", None)) is None:
+            data = self._local.data = OrderedDict()
+
+        if (ds := data.get(key)) is not None:
+            data.move_to_end(key)
+            return ds
+
+        if (ds := opener()) is not None:
+            data[key] = ds
+            while len(data) > self.maxsize:
+                data.popitem(last=False)
+        return ds
+
+    def clear(self):
+        """Close datasets of the current thread"""
+        if (data := getattr(self._local, "data", None)) is not None:
+            data.clear()
@@ -1,7 +1,6 @@
 import glob
 import math
 import os
-import subprocess
 from functools import cached_property
 from pathlib import Path
 from tempfile import NamedTemporaryFile, TemporaryDirectory
@@ -32,6 +31,7 @@ from nextgisweb.file_storage import FileObj
 from nextgisweb.file_upload import FileUploadRef
 from nextgisweb.file_upload.exception import UnsupportedFile
 from nextgisweb.file_upload.model import FileUpload
+from nextgisweb.job import job_check_call, job_progress
 from nextgisweb.layer import IBboxLayer, SpatialLayerMixin
 from nextgisweb.resource import (
     ConnectionScope,
@@ -494,8 +494,8 @@ class RasterLayer(Resource, SpatialLayerMixin):
         fobj = FileObj(component="raster_layer")
         dst_file = str(comp.workdir_path(fobj, None, makedirs=True))
         self.fileobj = fobj
-        subprocess.check_call(cmd + [dst_file])
-        self.build_overview()
+        job_check_call(cmd + [dst_file], progress=(0, 0.5))
+        self.build_overview(progress=(0.5, 1))
         if os.path.exists(aux_xml_file := dst_file + ".aux.xml"):
             fobj_pam = FileObj(component="raster_layer")
             fobj_pam = fobj_pam.copy_from(aux_xml_file)
@@ -518,13 +518,16 @@ class RasterLayer(Resource, SpatialLayerMixin):
         s3_path = storage.vsi_path(self.storage_filename)
         with TemporaryDirectory() as tmpdir:
             local = os.path.join(tmpdir, "raster.tif")
-            subprocess.check_call(cmd + [local])
+            job_check_call(cmd + [local], progress=(0, 0.5))
+            size, written = os.path.getsize(local), 0
             with gdal.config_options(s3_env):
                 vsi = gdal.VSIFOpenL(s3_path, "wb")
                 try:
                     with open(local, "rb") as f:
                         while chunk := f.read(16 * 1024 * 1024):
                             gdal.VSIFWriteL(chunk, 1, len(chunk), vsi)
+                            written += len(chunk)
+                            job_progress(0.5 + 0.5 * written / size)
                 finally:
                     gdal.VSIFCloseL(vsi)
         return self._s3_open(s3_path)
@@ -591,14 +594,38 @@ class RasterLayer(Resource, SpatialLayerMixin):
         self.populate_meta(ds, data_type)
 
     def gdal_dataset(self):
+        """Open the dataset for reading
+
+        Datasets are cached, so they must not be modified."""
+
         from .component import RasterLayerComponent
 
+        comp = RasterLayerComponent.current()
+
         if self.storage is not None:
-            return self._s3_open(self.storage.vsi_path(self.storage_filename))
-        fn = RasterLayerComponent.current().workdir_path(self.fileobj, self.fileobj_pam)
-        return gdal.Open(str(fn), gdalconst.GA_ReadOnly)
+            vsi_path = self.storage.vsi_path(self.storage_filename)
+            credentials = tuple(sorted(self.storage.vsi_credentials().items()))
+            key = (vsi_path, hash(credentials))
+
+            # Credentials are registered anyway as they may be overwritten by
+            # another storage with the same path prefix, see register_credentials.
+            self.storage.configure_gdal()
+            return comp.dataset_cache.get(key, lambda: gdal.Open(vsi_path, gdalconst.GA_ReadOnly))
+
+        fobj, fobj_pam = self.fileobj, self.fileobj_pam
+        fn = comp.workdir_path(fobj, fobj_pam)
+
+        # Overviews of non-COG rasters may be built later by another process,
+        # and a dataset opened before that doesn't see them.
+        ovr = not self.cog and fn.with_suffix(".ovr").exists()
+        key = (fobj.uuid, fobj_pam.uuid if fobj_pam is not None else None, ovr)
+
+        def opener():
+            return gdal.Open(str(fn), gdalconst.GA_ReadOnly)
+
+        return comp.dataset_cache.get(key, opener)
 
-    def build_overview(self, missing_only=False, fn=None):
+    def build_overview(self, missing_only=False, fn=None, *, progress=None):
         from .component import RasterLayerComponent
 
         if fn is None and self.cog:
@@ -620,7 +647,7 @@ class RasterLayer(Resource, SpatialLayerMixin):
         cmd = ["gdaladdo", "-q", "-clean", str(fn)]
 
         logger.debug("Removing existing overviews with command: " + " ".join(cmd))
-        subprocess.check_call(cmd)
+        job_check_call(cmd)
 
         # IMPORTANT: "nearest" method does not create new values by averaging.
         # It is the best choice to preserve initial pixel values for thematic
@@ -639,7 +666,6 @@ class RasterLayer(Resource, SpatialLayerMixin):
 
         cmd = [
             "gdaladdo",
-            "-q",
             "-ro",
             "-r",
             resampling,
@@ -666,7 +692,7 @@ class RasterLayer(Resource, SpatialLayerMixin):
         cmd.extend(levels)
 
         logger.debug("Building raster overview with command: " + " ".join(cmd))
-        subprocess.check_call(cmd)
+        job_check_call(cmd, progress=progress or (0, 1))
 
     def get_info(self):
         band_summary = ngettextf(
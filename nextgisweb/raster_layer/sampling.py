@@ -0,0 +1,267 @@
+from dataclasses import dataclass, field
+from math import ceil
+
+import numpy
+from osgeo import gdal, gdal_array, ogr
+
+from nextgisweb.env import gettextf
+
+from nextgisweb.core.exception import ValidationError
+
+
+@dataclass
+class Level:
+    """Full resolution or overview level of a dataset"""
+
+    overview: int | None
+    xsize: int
+    ysize: int
+    geo_transform: tuple[float, ...]
+
+    @property
+    def pixel_size(self):
+        return (abs(self.geo_transform[1]), abs(self.geo_transform[5]))
+
+    def bands(self, ds, bands):
+        result = []
+        for bidx in bands:
+            band = ds.GetRasterBand(bidx)
+            if self.overview is not None:
+                band = band.GetOverview(self.overview)
+            result.append(band)
+        return result
+
+
+@dataclass
+class BandStatistics:
+    """Band statistics accumulated by chunks of values
+
+    Mean and variance of chunks are merged with the parallel algorithm by
+    Chan et al., so precision isn't lost on values with a small variance
+    relative to their magnitude."""
+
+    count: int = 0
+    min: float | None = None
+    max: float | None = None
+    mean: float | None = None
+    std: float | None = None
+    histogram: list[int] | None = None
+    histogram_range: tuple[float, float] | None = None
+
+    # Sum of squared deviations from the mean
+    m2: float = field(default=0, repr=False)
+
+    def update(self, values):
+        if len(values) == 0:
+            return
+
+        vmin, vmax = values.min().item(), values.max().item()
+        self.min = vmin if self.min is None else min(self.min, vmin)
+        self.max = vmax if self.max is None else max(self.max, vmax)
+
+        values = values.astype(numpy.float64)
+        count, mean = len(values), values.mean().item()
+        m2 = numpy.var(values).item() * count
+
+        if self.count == 0:
+            self.mean, self.m2 = mean, m2
+        else:
+            total = self.count + count
+            delta = mean - self.mean
+            self.mean += delta * count / total
+            self.m2 += m2 + delta**2 * self.count * count / total
+        self.count += count
+
+        if self.histogram is not None:
+            counts, _ = numpy.histogram(values, len(self.histogram), self.histogram_range)
+            self.histogram = [a + b for a, b in zip(self.histogram, counts.tolist())]
+
+    def finish(self):
+        if self.count > 0:
+            self.std = (self.m2 / self.count) ** 0.5
+        return self
+
+
+def select_level(ds, resolution=None):
+    """Select the coarsest dataset level with pixel size not exceeding the
+    resolution or the full resolution level if the resolution is None"""
+
+    gt = ds.GetGeoTransform()
+    xsize, ysize = ds.RasterXSize, ds.RasterYSize
+    result = Level(None, xsize, ysize, gt)
+    if resolution is None or resolution <= abs(gt[1]):
+        return result
+
+    band = ds.GetRasterBand(1)
+    for idx in range(band.GetOverviewCount()):
+        ovr = band.GetOverview(idx)
+        fx, fy = xsize / ovr.XSize, ysize / ovr.YSize
+        if abs(gt[1]) * fx > resolution:
+            continue
+        if ovr.XSize < result.xsize:
+            ovr_gt = (gt[0], gt[1] * fx, gt[2] * fy, gt[3], gt[4] * fx, gt[5] * fy)
+            result = Level(idx, ovr.XSize, ovr.YSize, ovr_gt)
+    return result
+
+
+def pixel_indices(geo_transform, xs, ys):
+    """Convert coordinates to column and row indices of pixels"""
+
+    inv = gdal.InvGeoTransform(geo_transform)
+    xs, ys = numpy.asarray(xs, dtype=numpy.float64), numpy.asarray(ys, dtype=numpy.float64)
+    cols = numpy.floor(inv[0] + inv[1] * xs + inv[2] * ys).astype(numpy.int64)
+    rows = numpy.floor(inv[3] + inv[4] * xs + inv[5] * ys).astype(numpy.int64)
+    return cols, rows
+
+
+def sample_points(ds, xs, ys, bands, *, level=None):
+    """Read pixel values at points
+
+    Points are grouped by blocks of the internal tiling, and each block is read
+    once for all points within it.
+
+    :returns: Tuple of values array with (points, bands) shape and boolean
+        array of points within the dataset extent"""
+
+    if level is None:
+        level = select_level(ds)
+    gdal_bands = level.bands(ds, bands)
+    dtype = gdal_array.GDALTypeCodeToNumericTypeCode(gdal_bands[0].DataType)
+
+    cols, rows = pixel_indices(level.geo_transform, xs, ys)
+    inside = (cols >= 0) & (cols < level.xsize) & (rows >= 0) & (rows < level.ysize)
+    values = numpy.zeros((len(cols), len(bands)), dtype=dtype)
+    if not inside.any():
+        return values, inside
+
+    bw, bh = gdal_bands[0].GetBlockSize()
+    idx = numpy.flatnonzero(inside)
+    bx, by = cols[idx] // bw, rows[idx] // bh
+    blocks, inverse = numpy.unique(by * ceil(level.xsize / bw) + bx, return_inverse=True)
+
+    for bnum in range(len(blocks)):
+        sel = idx[inverse == bnum]
+        c0, r0 = (cols[sel[0]] // bw) * bw, (rows[sel[0]] // bh) * bh
+        width, height = min(bw, level.xsize - c0), min(bh, level.ysize - r0)
+        for i, band in enumerate(gdal_bands):
+            block = band.ReadAsArray(int(c0), int(r0), int(width), int(height))
+            values[sel, i] = block[rows[sel] - r0, cols[sel] - c0]
+
+    return values, inside
+
+
+def pixel_classes(band, values):
+    """Classes of pixel values from the thematic raster attribute table of
+    the band or None if the band doesn't have it"""
+
+    rat = band.GetDefaultRAT()
+    if rat is None or rat.GetTableType() != gdal.GRTT_THEMATIC:
+        return None
+
+    if (rat_col := rat.GetColOfUsage(gdal.GFU_Name)) == -1:
+        return [None] * len(values)
+
+    lookup = dict()
+    for value in numpy.unique(values).tolist():
+        rat_row = rat.GetRowOfValue(value)
+        lookup[value] = rat.GetValueAsString(rat_row, rat_col) if rat_row != -1 else None
+    return [lookup[v] for v in values.tolist()]
+
+
+def zonal_statistics(ds, geom, bands, *, level=None, ranges=None, bins=None, max_pixels=None):
+    """Compute statistics of band values within an OGR geometry
+
+    Pixels are selected by their centers, and nodata pixels are skipped. The
+    zone is read in strips of the internal tiling block height, so memory
+    usage doesn't depend on the zone size.
+
+    :param ranges: Histogram value ranges per band, histograms are computed
+        only if ranges and bins are given
+    :param max_pixels: Limit of the zone bounding box size in pixels
+    :returns: List of BandStatistics per band"""
+
+    if level is None:
+        level = select_level(ds)
+    gdal_bands = level.bands(ds, bands)
+
+    result = []
+    for bidx in range(len(bands)):
+        stat = BandStatistics()
+        if ranges is not None and bins is not None:
+            stat.histogram = [0] * bins
+            stat.histogram_range = ranges[bidx]
+        result.append(stat)
+
+    window = _window(level, geom)
+    if window is None:
+        return [stat.finish() for stat in result]
+
+    c0, r0, width, height = window
+    if max_pixels is not None and width * height > max_pixels:
+        raise ValidationError(
+            gettextf(
+                "The zone is too large: {width} × {height} pixels exceeds the limit "
+                "of {max_pixels} pixels. Request a coarser resolution."
+            )(width=width, height=height, max_pixels=max_pixels)
+        )
+
+    mask = _rasterize(level, geom, window)
+    nodata = [band.GetNoDataValue() for band in gdal_bands]
+
+    _, bh = gdal_bands[0].GetBlockSize()
+    strip = (r0 // bh) * bh
+    while strip < r0 + height:
+        s0, s1 = max(strip, r0), min(strip + bh, r0 + height)
+        strip_mask = mask[s0 - r0 : s1 - r0]
+        strip += bh
+        if not strip_mask.any():
+            continue
+
+        for band, nd, stat in zip(gdal_bands, nodata, result):
+            data = band.ReadAsArray(c0, s0, width, s1 - s0)
+            valid = strip_mask
+            if nd is not None:
+                valid = valid & (data != nd)
+            if data.dtype.kind == "f":
+                valid = valid & ~numpy.isnan(data)
+            stat.update(data[valid])
+
+    return [stat.finish() for stat in result]
+
+
+def _window(level, geom):
+    minx, maxx, miny, maxy = geom.GetEnvelope()
+    cols, rows = pixel_indices(
+        level.geo_transform, (minx, maxx, minx, maxx), (miny, miny, maxy, maxy)
+    )
+    c0, c1 = max(cols.min().item(), 0), min(cols.max().item() + 1, level.xsize)
+    r0, r1 = max(rows.min().item(), 0), min(rows.max().item() + 1, level.ysize)
+    if c0 >= c1 or r0 >= r1:
+        return None
+    return c0, r0, c1 - c0, r1 - r0
+
+
+def _rasterize(level, geom, window):
+    c0, r0, width, height = window
+    gt = level.geo_transform
+
+    mem = gdal.GetDriverByName("MEM").Create("", width, height, 1, gdal.GDT_Byte)
+    mem.SetGeoTransform(
+        (
+            gt[0] + c0 * gt[1] + r0 * gt[2],
+            gt[1],
+            gt[2],
+            gt[3] + c0 * gt[4] + r0 * gt[5],
+            gt[4],
+            gt[5],
+        )
+    )
+
+    ogr_ds = ogr.GetDriverByName("Memory").CreateDataSource("")
+    layer = ogr_ds.CreateLayer("zone", geom_type=ogr.wkbUnknown)
+    feature = ogr.Feature(layer.GetLayerDefn())
+    feature.SetGeometry(geom)
+    layer.CreateFeature(feature)
+
+    gdal.RasterizeLayer(mem, [1], layer, burn_values=[1])
+    return mem.ReadAsArray().astype(bool)
@@ -0,0 +1,82 @@
+import numpy
+import pytest
+import transaction
+
+from nextgisweb.pyramid.test import WebTestApp
+
+from ..model import RasterLayer
+
+pytestmark = pytest.mark.usefixtures("ngw_resource_defaults", "ngw_auth_administrator")
+
+
+@pytest.fixture(scope="module")
+def raster(ngw_data_path, ngw_env):
+    with transaction.manager:
+        obj = RasterLayer().persist()
+        obj.load_file(ngw_data_path / "sochi-aster-dem.tif")
+
+    with transaction.manager:
+        obj = RasterLayer.filter_by(id=obj.id).one()
+        ds = obj.gdal_dataset()
+        gt = ds.GetGeoTransform()
+        data = ds.GetRasterBand(1).ReadAsArray()
+
+    yield obj.id, obj.srs_id, gt, data
+
+
+def test_sample(raster, ngw_webtest_app: WebTestApp):
+    rid, srs_id, gt, data = raster
+    ysize, xsize = data.shape
+
+    pixels = [(0, 0), (xsize - 1, ysize - 1), (xsize // 2, ysize // 3), (-1, 0)]
+    points = [dict(x=gt[0] + (c + 0.5) * gt[1], y=gt[3] + (r + 0.5) * gt[5]) for c, r in pixels]
+
+    resp = ngw_webtest_app.post_json(
+        "/api/component/raster_layer/sample",
+        dict(resources=[rid], srs=srs_id, points=points),
+    )
+    item = resp.json["items"][0]
+    assert item["resource"]["id"] == rid
+    assert item["values"][:3] == [[data[r, c].item()] for c, r in pixels[:3]]
+    assert item["values"][3] is None
+
+    resp = ngw_webtest_app.get(
+        "/api/component/raster_layer/identify",
+        query=dict(resources=rid, **points[2]),
+    )
+    assert resp.json["items"][0]["values"] == item["values"][2]
+
+
+def test_statistics(raster, ngw_webtest_app: WebTestApp):
+    rid, srs_id, gt, data = raster
+    ysize, xsize = data.shape
+
+    minx, maxy = gt[0], gt[3]
+    maxx, miny = gt[0] + xsize * gt[1], gt[3] + ysize * gt[5]
+    geom = f"POLYGON(({minx} {miny}, {minx} {maxy}, {maxx} {maxy}, {maxx} {miny}, {minx} {miny}))"
+
+    resp = ngw_webtest_app.post_json(
+        "/api/component/raster_layer/statistics",
+        dict(resources=[rid], srs=srs_id, geom=geom, bins=16),
+    )
+    band = resp.json["items"][0]["bands"][0]
+    assert band["count"] == data.size
+    assert band["min"] == data.min().item()
+    assert band["max"] == data.max().item()
+    assert band["mean"] == pytest.approx(data.mean().item())
+    assert band["std"] == pytest.approx(numpy.std(data.astype(numpy.float64)).item())
+    assert sum(band["histogram"]) == data.size
+
+    resp = ngw_webtest_app.post_json(
+        "/api/component/raster_layer/statistics",
+        dict(resources=[rid], srs=srs_id, geom=geom, resolution=abs(gt[1]) * 4),
+    )
+    item = resp.json["items"][0]
+    assert item["pixel_size"][0] >= abs(gt[1])
+    assert item["bands"][0]["histogram"] is None
+
+    ngw_webtest_app.post_json(
+        "/api/component/raster_layer/statistics",
+        dict(resources=[rid], srs=srs_id, geom=geom, bands=[100]),
+        status=422,
+    )
@@ -0,0 +1,43 @@
+from threading import Thread
+
+from ..dataset_cache import DatasetCache
+
+
+def test_dataset_cache():
+    opened = []
+
+    def opener(key):
+        def _open():
+            opened.append(key)
+            return object()
+
+        return _open
+
+    cache = DatasetCache(2)
+    a = cache.get("a", opener("a"))
+    assert cache.get("a", opener("a")) is a
+    cache.get("b", opener("b"))
+    cache.get("a", opener("a"))
+    cache.get("c", opener("c"))  # Evicts "b"
+    assert cache.get("a", opener("a")) is a
+    cache.get("b", opener("b"))
+    assert opened == ["a", "b", "c", "b"]
+
+    # Failed opens aren't cached
+    assert cache.get("d", lambda: None) is None
+    assert cache.get("d", opener("d")) is not None
+
+    # Datasets aren't shared between threads
+    result = []
+    thread = Thread(target=lambda: result.append(cache.get("a", opener("a"))))
+    thread.start()
+    thread.join()
+    assert result[0] is not a
+
+    cache.clear()
+    assert cache.get("a", opener("a")) is not a
+
+
+def test_dataset_cache_disabled():
+    cache = DatasetCache(0)
+    assert cache.get("a", object) is not cache.get("a", object)
@@ -0,0 +1,27 @@
+import numpy
+import pytest
+
+from ..sampling import BandStatistics
+
+
+def test_band_statistics():
+    # Elevations around 1000 m varying by centimetres
+    rng = numpy.random.default_rng(0)
+    data = 1000 + rng.normal(0, 0.01, 10000).astype(numpy.float32)
+
+    stat = BandStatistics()
+    for chunk in numpy.array_split(data, 7):
+        stat.update(chunk)
+    stat.update(data[:0])
+    stat.finish()
+
+    expected = data.astype(numpy.float64)
+    assert stat.count == len(data)
+    assert stat.min == data.min().item() and stat.max == data.max().item()
+    assert stat.mean == pytest.approx(expected.mean().item(), rel=1e-12)
+    assert stat.std == pytest.approx(expected.std().item(), rel=1e-9)
+
+
+def test_band_statistics_empty():
+    stat = BandStatistics().finish()
+    assert stat.count == 0 and stat.mean is None and stat.std is None
@@ -171,16 +171,17 @@ class RasterMosaicItem(Base):
         # treat the fourth band as alpha
         if ds.RasterCount == 4 and alpha_band is None:
             alpha_band = 4
-            ds = gdal.Open(filename, gdal.GA_Update)
+            # The source file may be shared, for example, with a FileObj, so
+            # it's wrapped in a VRT instead of being modified
+            ds = gdal.Translate("", ds, format="VRT")
             ds.GetRasterBand(alpha_band).SetColorInterpretation(gdal.GCI_AlphaBand)
-            ds = None
 
         src_osr = sr_from_wkt(dsproj)
         dst_osr = self.resource.srs.to_osr()
 
         reproject = not src_osr.IsSame(dst_osr)
 
-        info = gdal.Info(filename, format="json")
+        info = gdal.Info(ds, format="json")
         geom = Geometry.from_geojson(info["wgs84Extent"])
         self.footprint = geom
         self.fileobj = FileStorageComponent.current().fileobj(component="raster_mosaic")
@@ -190,7 +191,7 @@ class RasterMosaicItem(Base):
         if reproject:
             gdal.Warp(
                 str(dst_file),
-                filename,
+                ds,
                 options=gdal.WarpOptions(
                     format="GTiff",
                     dstSRS="EPSG:%d" % self.resource.srs.id,
@@ -201,7 +202,7 @@ class RasterMosaicItem(Base):
         else:
             gdal.Translate(
                 str(dst_file),
-                filename,
+                ds,
                 options=gdal.TranslateOptions(format="GTiff", creationOptions=co),
             )
 
@@ -11,15 +11,16 @@ from nextgisweb.lib.imptool import module_path
 from nextgisweb.render import (
     IExtentRenderRequest,
     ILegendableStyle,
+    IMetatileRenderRequest,
     IRenderableStyle,
-    ITileRenderRequest,
 )
 from nextgisweb.resource import DataScope, Resource
+from nextgisweb.spatial_ref_sys import WKT_EPSG_3857
 
 Base.depends_on("resource")
 
 
-@implementer(IExtentRenderRequest, ITileRenderRequest)
+@implementer(IExtentRenderRequest, IMetatileRenderRequest)
 class RenderRequest:
     def __init__(self, style, srs, cond):
         self.style = style
@@ -33,6 +34,15 @@ class RenderRequest:
         extent = self.srs.tile_extent(tile)
         return self.style.render_image(extent, (size, size))
 
+    def render_metatile(self, mrange, size):
+        z, xmin, ymin, xmax, ymax = mrange
+        extent = (
+            self.srs.tile_extent((z, xmin, ymax))[0:2] + self.srs.tile_extent((z, xmax, ymin))[2:4]
+        )
+        return self.style.render_image(
+            extent, ((xmax - xmin + 1) * size, (ymax - ymin + 1) * size)
+        )
+
 
 @implementer(IRenderableStyle, ILegendableStyle)
 class RasterStyle(Resource):
@@ -78,8 +88,9 @@ class RasterStyle(Resource):
                 format="MEM",
                 warpOptions=["UNIFIED_SRC_NODATA=ON"],
                 dstAlpha=True,
-                srcSRS=f"{self.srs.auth_name}:{self.srs.auth_srid}",
-                dstSRS="EPSG:3857",
+                # WKT doesn't require lookups in the PROJ database
+                srcSRS=self.srs.wkt,
+                dstSRS=WKT_EPSG_3857,
             ),
         )
 
@@ -10,6 +10,7 @@ from .imgcodec import (
 from .interface import (
     IExtentRenderRequest,
     ILegendableStyle,
+    IMetatileRenderRequest,
     IRenderableNonCached,
     IRenderableScaleRange,
     IRenderableStyle,
@@ -1,3 +1,5 @@
+from functools import lru_cache
+from hashlib import md5
 from io import BytesIO
 from itertools import product
 from math import ceil, floor
@@ -21,14 +23,27 @@ from nextgisweb.resource import (
     ResourceID,
     ResourceNotFound,
     ResourceRef,
+    ResourceScope,
 )
 from nextgisweb.spatial_ref_sys import SRS
 from nextgisweb.spatial_ref_sys.api import SRSID
 
 from .component import RenderComponent
 from .imgcodec import COMPRESSION_FAST, FORMAT_PNG, image_encoder_factory
-from .interface import ILegendableStyle, IRenderableStyle
+from .interface import ILegendableStyle, IMetatileRenderRequest, IRenderableStyle
 from .legend import ILegendSymbols
+from .metatile import render_metatile
+from .model import tile_data_image
+from .seed import (
+    SeedParams,
+    SeedStatus,
+    TileSeeder,
+    lock_progress,
+    read_progress,
+    spawn_seeding,
+    write_progress,
+)
+from .singleflight import render_tile_once
 from .util import TILE_SIZE, af_transform, image_zoom
 
 RenderResource = Annotated[
@@ -133,6 +148,13 @@ def image_response(img, empty_code, size):
     return Response(body_file=buf, content_type="image/png")
 
 
+@lru_cache(64)
+def solid_tile_png(color):
+    buf = BytesIO()
+    image_encoder(Image.new("RGBA", (TILE_SIZE, TILE_SIZE), color), buf)
+    return buf.getvalue()
+
+
 def check_origin(request: Request):
     if request.env.component(RenderComponent).options["check_origin"]:
         origin = request.headers.get("Origin")
@@ -177,10 +199,15 @@ def tile(
     check_origin(request)
 
     p_symbols = process_symbols(symbols) if symbols else dict()
-    p_cache = cache and request.env.component(RenderComponent).tile_cache_enabled
+    comp = request.env.component(RenderComponent)
+    p_cache = cache and comp.tile_cache_enabled
+    p_metatile = comp.options["tile_cache.metatile"]
+    p_coalesce = comp.options["tile_cache.coalesce"]
+    p_coalesce_lock = comp.options["tile_cache.coalesce_lock"]
     srs_obj = SRS.filter_by(id=3857).one()
 
-    aimg = None
+    parts = []  # Non-empty resource tiles: PIL images or cached tile data
+    validators = []  # Tile cache identifiers and timestamps for ETag
     for resid in resource:
         obj = Resource.filter_by(id=resid).one_or_none()
 
@@ -192,8 +219,6 @@ def tile(
 
         request.resource_permission(DataScope.read, obj)
 
-        rimg = None  # Resulting resource image
-
         rsymbols = p_symbols.get(resid)
         rfilter = p_filter.get(resid)
         tcache = obj.tile_cache
@@ -210,22 +235,52 @@ def tile(
 
         cache_exists = False
         if cache_enabled:
-            cache_exists, rimg = tcache.get_tile((z, x, y))
+            cache_exists, rdata, tstamp = tcache.get_tile_data((z, x, y))
 
-        if not cache_exists:
-            cond = dict()
-            if rsymbols is not None:
-                cond["symbols"] = rsymbols
-            if rfilter is not None:
-                cond["filter"] = rfilter
-            req = obj.render_request(srs_obj, cond=cond)
-            rimg = req.render_tile((z, x, y), TILE_SIZE)
+        if cache_exists:
+            validators.append((tcache.uuid.hex, tstamp))
+            if rdata is not None:
+                parts.append((obj, rdata))
+            continue
 
+        cond = dict()
+        if rsymbols is not None:
+            cond["symbols"] = rsymbols
+        if rfilter is not None:
+            cond["filter"] = rfilter
+        req = obj.render_request(srs_obj, cond=cond)
+
+        def render(wait):
+            if cache_enabled and p_metatile > 1 and IMetatileRenderRequest.providedBy(req):
+                return render_metatile(req, tcache, (z, x, y), p_metatile, wait=wait)
+            rimg = req.render_tile((z, x, y), TILE_SIZE)
             if cache_enabled:
-                tcache.put_tile((z, x, y), rimg)
+                tcache.put_tile((z, x, y), rimg, wait=wait)
+            return rimg
 
-        if rimg is None:
-            continue
+        if cache_enabled and p_coalesce:
+            rimg = render_tile_once(tcache, (z, x, y), render, advisory_lock=p_coalesce_lock)
+        else:
+            rimg = render(None)
+
+        if rimg is not None:
+            parts.append((obj, rimg))
+
+    if len(parts) == 1 and not isinstance(parts[0][1], Image.Image):
+        # Zero-decode fast path: the only non-empty tile comes from the tile
+        # cache, so it can be sent as is without decoding and encoding.
+        rdata = parts[0][1]
+        body = rdata if isinstance(rdata, bytes) else solid_tile_png(rdata)
+        response = Response(body, content_type="image/png", conditional_response=True)
+        if len(validators) == len(resource):
+            response.etag = md5(repr(validators).encode("utf-8")).hexdigest()
+            response.last_modified = max(tstamp for _, tstamp in validators)
+        return response
+
+    aimg = None
+    for obj, rimg in parts:
+        if not isinstance(rimg, Image.Image):
+            rimg = tile_data_image(rimg)
 
         if aimg is None:
             aimg = rimg
@@ -563,6 +618,72 @@ def resource_legend_symbols(
     return ResourceLegendSymbolsResponse(items=items)
 
 
+class SeedAlreadyRunning(UserException):
+    title = gettext("Seeding is already running")
+    http_status_code = 409
+
+
+class TileCacheSeedStatus(Struct, kw_only=True):
+    status: Annotated[SeedStatus | None, Meta(description="Seeding status")]
+    total: Annotated[int, Meta(description="Number of tiles to be seeded")]
+    done: Annotated[int, Meta(description="Number of seeded tiles")]
+
+
+def tile_cache_seed_get(request: Request) -> TileCacheSeedStatus:
+    """Read tile cache seeding progress
+
+    :returns: Status of the last seeding"""
+    request.resource_permission(ResourceScope.read)
+
+    if (progress := read_progress(request.context.id)) is None:
+        return TileCacheSeedStatus(status=None, total=0, done=0)
+    return TileCacheSeedStatus(status=progress.status, total=progress.total, done=progress.done)
+
+
+def tile_cache_seed_post(
+    request: Request,
+    *,
+    body: SeedParams,
+    dry_run: Annotated[bool, Meta(description="Only count tiles to be seeded")] = False,
+    rate: Annotated[
+        Annotated[int, Meta(gt=0)] | None,
+        Meta(description="Maximum number of tiles per second"),
+    ] = None,
+) -> TileCacheSeedStatus:
+    """Start tile cache seeding in background
+
+    Seeding with the same parameters resumes from the last saved progress.
+
+    :returns: Status of the started seeding"""
+    request.resource_permission(ResourceScope.update)
+
+    seeder = TileSeeder(request.context, body)
+    if dry_run:
+        return TileCacheSeedStatus(status=None, total=seeder.count(), done=0)
+
+    if (progress := seeder.start()) is None:
+        raise SeedAlreadyRunning
+
+    spawn_seeding(request.context.id, body, rate=rate)
+    return TileCacheSeedStatus(status=progress.status, total=progress.total, done=progress.done)
+
+
+def tile_cache_seed_delete(request: Request) -> TileCacheSeedStatus:
+    """Cancel running tile cache seeding
+
+    :returns: Status of the cancelled seeding"""
+    request.resource_permission(ResourceScope.update)
+
+    lock_progress(request.context.id)
+    if (progress := read_progress(request.context.id)) is None:
+        return TileCacheSeedStatus(status=None, total=0, done=0)
+
+    if progress.running:
+        progress.status = "cancelled"
+        write_progress(progress)
+    return TileCacheSeedStatus(status=progress.status, total=progress.total, done=progress.done)
+
+
 def setup_pyramid(comp: RenderComponent, config):
     config.add_route(
         "render.tile",
@@ -575,6 +696,15 @@ def setup_pyramid(comp: RenderComponent, config):
         "/api/component/render/image",
     ).get(image, http_cache=0)
 
+    config.add_route(
+        "render.tile_cache_seed",
+        "/api/resource/{id}/tile_cache/seed",
+        factory=ResourceFactory(context=IRenderableStyle),
+        get=tile_cache_seed_get,
+        post=tile_cache_seed_post,
+        delete=tile_cache_seed_delete,
+    )
+
     config.add_route(
         "render.legend",
         "/api/resource/{id}/legend",
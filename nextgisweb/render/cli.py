@@ -0,0 +1,53 @@
+import transaction
+
+from nextgisweb.env.cli import DryRunOptions, EnvCommand, arg, comp_cli, opt
+
+from nextgisweb.resource import Resource
+
+from .seed import SeedFeature, SeedParams, TileSeeder
+
+
+@comp_cli.command()
+class seed(DryRunOptions, EnvCommand):
+    """Pre-render tiles of a resource into its tile cache"""
+
+    resource: int = arg(doc="Resource ID")
+    zmin: int = opt(0, doc="Minimum zoom level")
+    zmax: int = opt(doc="Maximum zoom level")
+    extent: str | None = opt(metavar="minx,miny,maxx,maxy", doc="Extent in EPSG:3857")
+    feature: str | None = opt(metavar="layer:fid", doc="Feature to limit tiles by geometry")
+    workers: int = opt(0, doc="Number of rendering processes (0 to render in-process)")
+    rate: int | None = opt(doc="Maximum number of tiles per second")
+    resume: bool = opt(True, flag=True, doc="Resume (default) or not the previous seeding")
+    attach: bool = opt(False, doc="Run seeding started through the API")
+
+    def __call__(self):
+        params = SeedParams(zmin=self.zmin, zmax=self.zmax)
+        if self.extent is not None:
+            params.extent = [float(v) for v in self.extent.split(",")]
+        if self.feature is not None:
+            layer, fid = (int(v) for v in self.feature.split(":"))
+            params.feature = SeedFeature(layer=layer, fid=fid)
+
+        with transaction.manager:
+            seeder = TileSeeder(Resource.filter_by(id=self.resource).one(), params)
+
+        if self.dry_run:
+            print(f"{seeder.count()} tiles to be seeded")
+            print("Use --no-dry-run option to seed them!")
+            return
+
+        with transaction.manager:
+            if self.attach:
+                progress = seeder.attach()
+            else:
+                progress = seeder.start(resume=self.resume)
+        if progress is None:
+            if self.attach:
+                print("Seeding of the resource with the same parameters isn't running")
+            else:
+                print("Seeding of the resource is already running")
+            return
+
+        progress = seeder.run(progress, workers=self.workers, rate=self.rate)
+        print(f"{progress.done} of {progress.total} tiles seeded ({progress.status})")
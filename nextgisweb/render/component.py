@@ -14,7 +14,7 @@ from nextgisweb.lib.logging import logger
 from nextgisweb.core import KindOfData
 from nextgisweb.core.component import CoreComponent
 
-from .model import TIMESTAMP_EPOCH
+from .model import TIMESTAMP_EPOCH, TilestorWriter
 from .model import ResourceTileCache as RTC
 
 vacuum_freepage_coeff = 0.5
@@ -33,6 +33,7 @@ class RenderComponent(Component):
         self.tile_cache_path = os.path.join(core.gtsdir(self), "tile_cache")
         if not os.path.isdir(self.tile_cache_path):
             os.makedirs(self.tile_cache_path)
+        self.seed_path = os.path.join(core.gtsdir(self), "seed")
 
     @require("resource")
     def setup_pyramid(self, config):
@@ -46,6 +47,14 @@ class RenderComponent(Component):
 
         yield ("Fast PNG", gettext("Enabled") if has_fpng else gettext("Disabled"))
 
+    def query_stat(self):
+        from . import singleflight
+
+        return dict(
+            tile_writer=TilestorWriter.instance_stat(),
+            tile_render=singleflight.query_stat(),
+        )
+
     def maintenance(self):
         self.cleanup()
 
@@ -169,8 +178,14 @@ class RenderComponent(Component):
 
             yield TileCacheData, tc.resource_id, size_img + size_color
 
+    # fmt: off
     option_annotations = (
         Option("check_origin", bool, default=False, doc="Check request Origin header."),
         Option("tile_cache.enabled", bool, default=True),
+        Option("tile_cache.writer.workers", int, default=2, doc="Number of tile cache writer threads."),
+        Option("tile_cache.coalesce", bool, default=True, doc="Render concurrently requested uncached tiles once."),
+        Option("tile_cache.coalesce_lock", bool, default=False, doc="Coalesce tile renders across processes using PostgreSQL advisory locks."),
+        Option("tile_cache.metatile", int, default=1, doc="Metatile size in tiles for styles supporting metatiles (1 to disable)."),
         Option("legend_symbols_section", bool, default=False),
     )
+    # fmt: on
@@ -27,6 +27,11 @@ class ITileRenderRequest(Interface):
         pass
 
 
+class IMetatileRenderRequest(ITileRenderRequest):
+    def render_metatile(self, mrange, size):
+        """Render tile range (z, xmin, ymin, xmax, ymax) as a single image"""
+
+
 class IRenderableNonCached(IRenderableStyle):
     pass
 
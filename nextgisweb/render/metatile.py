@@ -0,0 +1,69 @@
+from threading import Lock
+
+from cachetools import TTLCache
+
+from .util import TILE_SIZE
+
+# Recently rendered metatiles for requests which were waiting for the same
+# metatile. Tile cache writing is asynchronous, so these requests can't rely
+# on the tile cache yet.
+_rendered = TTLCache(maxsize=32, ttl=30)
+_rendered_lock = Lock()
+
+_locks = dict()
+_locks_guard = Lock()
+
+
+def metatile_range(tile, msize):
+    """Tile range (z, xmin, ymin, xmax, ymax) of a metatile containing tile"""
+    z, x, y = tile
+    msize = min(msize, 2**z)
+    xmin, ymin = x // msize * msize, y // msize * msize
+    return z, xmin, ymin, xmin + msize - 1, ymin + msize - 1
+
+
+def render_metatile(req, tcache, tile, msize, *, wait=None):
+    """Render a tile as a part of a metatile and put all its tiles to cache
+
+    Requests for the tiles of the same metatile are serialized, so that the
+    metatile is rendered only once."""
+
+    mrange = metatile_range(tile, msize)
+    key = (tcache.uuid.hex, mrange)
+
+    with _locks_guard:
+        lock = _locks.setdefault(key, [Lock(), 0])
+        lock[1] += 1
+
+    try:
+        with lock[0]:
+            with _rendered_lock:
+                tiles = _rendered.get(key)
+
+            if tiles is None:
+                tiles = _render(req, mrange)
+                with _rendered_lock:
+                    _rendered[key] = tiles
+                tcache.put_tiles(tiles.items(), wait=wait)
+    finally:
+        with _locks_guard:
+            lock[1] -= 1
+            if lock[1] == 0:
+                del _locks[key]
+
+    return tiles[tile]
+
+
+def _render(req, mrange):
+    z, xmin, ymin, xmax, ymax = mrange
+    img = req.render_metatile(mrange, TILE_SIZE)
+
+    result = dict()
+    for y in range(ymin, ymax + 1):
+        for x in range(xmin, xmax + 1):
+            if img is None:
+                result[(z, x, y)] = None
+            else:
+                ox, oy = (x - xmin) * TILE_SIZE, (y - ymin) * TILE_SIZE
+                result[(z, x, y)] = img.crop((ox, oy, ox + TILE_SIZE, oy + TILE_SIZE))
+    return result
@@ -17,6 +17,7 @@ import sqlalchemy.orm as orm
 import transaction
 from PIL import Image
 from sqlalchemy import MetaData, Table
+from sqlalchemy.dialects import postgresql
 from sqlalchemy.orm import Mapped, mapped_column
 from zope.sqlalchemy import mark_changed
 
@@ -89,6 +90,96 @@ def get_tile_db(db_path):
     return connection, Lock()
 
 
+def tile_data_image(data):
+    """Convert tile data returned by ResourceTileCache.get_tile_data to image"""
+    if data is None:
+        return None
+    elif isinstance(data, tuple):
+        return Image.new("RGBA", (TILE_SIZE, TILE_SIZE), data)
+    else:
+        return Image.open(BytesIO(data))
+
+
+def tile_record(tile, img, *, uuid, db_path):
+    """Prepare a tile for writing: detect solid color or encode to PNG"""
+    z, x, y = tile
+    tstamp = int((utcnow_naive() - TIMESTAMP_EPOCH).total_seconds())
+
+    if img is not None and img.mode != "RGBA":
+        img = img.convert("RGBA")
+
+    colortuple = imgcolor(img)
+    color = pack_color(colortuple) if colortuple is not None else None
+
+    value = None
+    if color is None:
+        buf = BytesIO()
+        img.save(buf, format="PNG", compress_level=3)
+        value = buf.getvalue()
+
+    return dict(uuid=uuid, db_path=db_path, z=z, x=x, y=y, color=color, tstamp=tstamp, value=value)
+
+
+def write_tiles(records):
+    """Write prepared tile records of the same tile cache in one transaction"""
+
+    db_path = records[0]["db_path"]
+    table_uuid = records[0]["uuid"]
+
+    # Deduplicate tiles as multi-row ON CONFLICT DO UPDATE can't affect the
+    # same row twice. Tiles are ordered by time, so keep the last one.
+    rows = list({(r["z"], r["x"], r["y"]): r for r in records}.values())
+
+    with transaction.manager:
+        conn = DBSession.connection()
+        _write_tile_meta(conn, table_uuid, rows)
+
+        data_rows = [r for r in rows if r["value"] is not None]
+        if len(data_rows) > 0:
+            tilestor, lock = get_tile_db(db_path)
+            with lock:
+                try:
+                    _write_tile_data(tilestor, data_rows)
+                    tilestor.commit()
+                except Exception:
+                    tilestor.rollback()
+                    raise
+
+        # Force zope session management to commit changes
+        mark_changed(DBSession())
+
+
+def _write_tile_meta(conn, table_uuid, rows):
+    tab = sa.table(
+        table_uuid,
+        *(sa.column(c) for c in ("z", "x", "y", "color", "tstamp")),
+        schema="tile_cache",
+    )
+    stmt = postgresql.insert(tab).values(
+        [{k: r[k] for k in ("z", "x", "y", "color", "tstamp")} for r in rows]
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=("z", "x", "y"),
+        set_=dict(color=stmt.excluded.color, tstamp=stmt.excluded.tstamp),
+        where=tab.c.tstamp < stmt.excluded.tstamp,
+    )
+    conn.execute(stmt)
+
+
+def _write_tile_data(tilestor, rows):
+    # fmt: off
+    tilestor.executemany("""
+        INSERT INTO tile VALUES (?, ?, ?, ?, ?)
+        ON CONFLICT (z, x, y) DO UPDATE
+        SET tstamp = ?, data = ?
+        WHERE tstamp < ?
+    """, [
+        (r["z"], r["x"], r["y"], r["tstamp"], r["value"], r["tstamp"], r["value"], r["tstamp"])
+        for r in rows
+    ])
+    # fmt: on
+
+
 class TileWriterQueueException(Exception):
     pass
 
@@ -97,23 +188,29 @@ class TileWriterQueueFullException(TileWriterQueueException):
     pass
 
 
-class TilestorWriter:
-    __instance = None
+class TilestorWriterShard:
+    """Tile cache writer worker thread with its own queue
 
-    def __init__(self):
-        if TilestorWriter.__instance is None:
-            self.queue = Queue(maxsize=QUEUE_MAX_SIZE)
-            self.cstart = None
+    Each shard serves a disjoint subset of tile caches, so a SQLite tile
+    storage is always written by a single thread."""
 
-            self._worker = Thread(target=self._job)
-            self._worker.daemon = True
-            self._worker.start()
+    def __init__(self, index):
+        self.index = index
+        self.queue = Queue(maxsize=QUEUE_MAX_SIZE)
+        self.cstart = None
 
-    @classmethod
-    def getInstance(cls):
-        if cls.__instance is None:
-            cls.__instance = TilestorWriter()
-        return cls.__instance
+        self.tiles_written = 0
+        self.tiles_dropped = 0
+        self.tiles_failed = 0
+        self.batch_count = 0
+        self.batch_time_total = 0.0
+        self.batch_time_max = 0.0
+        self._stat_lock = Lock()
+
+        self._shutdown = False
+        self._worker = Thread(target=self._job, name=f"TilestorWriter-{index}")
+        self._worker.daemon = True
+        self._worker.start()
 
     def put(self, payload, timeout):
         try:
@@ -122,16 +219,32 @@ class TilestorWriter:
             else:
                 self.queue.put(payload, timeout=timeout)
         except Full:
+            with self._stat_lock:
+                self.tiles_dropped += len(payload["tiles"])
             raise TileWriterQueueFullException(
-                "Tile writer queue is full at maxsize {}.".format(self.queue.maxsize)
+                "Tile writer queue #{} is full at maxsize {}.".format(
+                    self.index, self.queue.maxsize
+                )
             )
 
-    def _job(self):
-        self._shutdown = False
-        atexit.register(self.wait_for_shutdown)
+    def stat(self):
+        with self._stat_lock:
+            tiles_dropped = self.tiles_dropped
+        return dict(
+            qsize=self.queue.qsize(),
+            maxsize=self.queue.maxsize,
+            tiles_written=self.tiles_written,
+            tiles_dropped=tiles_dropped,
+            tiles_failed=self.tiles_failed,
+            batch_count=self.batch_count,
+            batch_time_avg=(
+                self.batch_time_total / self.batch_count if self.batch_count > 0 else None
+            ),
+            batch_time_max=self.batch_time_max,
+        )
 
+    def _job(self):
         data = None
-        tilestor = None
         while True:
             self.cstart = None
 
@@ -144,142 +257,163 @@ class TilestorWriter:
                     data = self.queue.get(True, get_timeout)
                 except Empty:
                     if self._shutdown:
-                        logger.debug("Tile cache writer queue is empty now. Exiting!")
+                        logger.debug(
+                            "Tile cache writer #%d queue is empty now. Exiting!", self.index
+                        )
                         break
                     else:
                         continue
 
-            db_path = data["db_path"]
+            self.cstart = time()
+            batch, answers, data = self._collect_batch(data)
+            self._write_batch(batch, answers)
 
-            self.cstart = ptime = time()
+            time_taken = time() - self.cstart
+            self.batch_count += 1
+            self.batch_time_total += time_taken
+            self.batch_time_max = max(self.batch_time_max, time_taken)
 
-            tiles_written = 0
-            time_taken = 0.0
+    def _collect_batch(self, data):
+        """Collect tiles for the same tile storage into a batch
 
-            answers = []
+        Returns the batch, answer queues of the batch, and the first payload
+        of the next batch (if any)."""
 
-            # Tile cache writer may fall sometimes in case of database connecti
-            # problem for example. So we just skip a tile with error and log an
-            # exception.
-            try:
-                with transaction.manager:
-                    conn = DBSession.connection()
-                    tilestor, lock = get_tile_db(db_path)
+        db_path = data["db_path"]
+        batch = []
+        answers = []
+        ptime = time()
+        time_taken = 0.0
 
-                    while data is not None and data["db_path"] == db_path:
-                        z, x, y = data["tile"]
-                        tstamp = int((utcnow_naive() - TIMESTAMP_EPOCH).total_seconds())
+        while data is not None and data["db_path"] == db_path:
+            for tile, img in data["tiles"]:
+                batch.append(tile_record(tile, img, uuid=data["uuid"], db_path=db_path))
+            if "answer_queue" in data:
+                answers.append(data["answer_queue"])
 
-                        img = data["img"]
-                        if img is not None and img.mode != "RGBA":
-                            img = img.convert("RGBA")
+            ctime = time()
+            time_taken += ctime - ptime
 
-                        colortuple = imgcolor(img)
-                        color = pack_color(colortuple) if colortuple is not None else None
+            if len(batch) >= BATCH_MAX_TILES or time_taken >= BATCH_DEADLINE:
+                data = None
+            else:
+                # Try to get next tile for the batch. Or break the batch if
+                # there is no tiles left.
+                try:
+                    data = self.queue.get(timeout=(BATCH_DEADLINE - time_taken))
+                except Empty:
+                    data = None
 
-                        self._write_tile_meta(
-                            conn, data["uuid"], dict(z=z, x=x, y=y, color=color, tstamp=tstamp)
-                        )
+            # Do not account queue block time
+            ptime = time()
 
-                        if color is None:
-                            buf = BytesIO()
-                            img.save(buf, format="PNG", compress_level=3)
-                            value = buf.getvalue()
-
-                            with lock:
-                                self._write_tile_data(tilestor, z, x, y, tstamp, value)
-
-                        if "answer_queue" in data:
-                            answers.append(data["answer_queue"])
-
-                        tiles_written += 1
-
-                        ctime = time()
-                        time_taken += ctime - ptime
-
-                        if tiles_written >= BATCH_MAX_TILES:
-                            # Break the batch
-                            data = None
-                        else:
-                            # Try to get next tile for the batch. Or break
-                            # the batch if there is no tiles left.
-                            if time_taken < BATCH_DEADLINE:
-                                try:
-                                    data = self.queue.get(timeout=(BATCH_DEADLINE - time_taken))
-                                except Empty:
-                                    data = None
-                            else:
-                                data = None
-
-                        # Do not account queue block time
-                        ptime = time()
-
-                    # Force zope session management to commit changes
-                    mark_changed(DBSession())
-                    tilestor.commit()
-                    tilestor = None
+        return batch, answers, data
 
-                    time_taken += time() - ptime
-                    logger.debug(
-                        "%d tiles were written in %0.3f seconds (%0.1f per second, qsize = %d)",
-                        tiles_written,
-                        time_taken,
-                        tiles_written / time_taken,
-                        self.queue.qsize(),
-                    )
+    def _write_batch(self, batch, answers):
+        # Tile cache writer may fall sometimes in case of database connection
+        # problem for example. So we just skip a batch with error and log an
+        # exception.
+        try:
+            write_tiles(batch)
+
+            self.tiles_written += len(batch)
+            time_taken = time() - self.cstart
+            logger.debug(
+                "%d tiles were written by #%d in %0.3f seconds (%0.1f per second, qsize = %d)",
+                len(batch),
+                self.index,
+                time_taken,
+                len(batch) / time_taken,
+                self.queue.qsize(),
+            )
 
-                # Report about sucess only after transaction commit
-                for a in answers:
-                    a.put_nowait(None)
+        except Exception:
+            logger.exception("Uncaught exception in tile cache writer #%d", self.index)
+            self.tiles_failed += len(batch)
 
-            except Exception:
-                logger.exception("Uncaught exception in tile cache writer")
+        finally:
+            # Report about completion only after transaction commit or
+            # rollback, otherwise waiting requests would stuck forever.
+            for a in answers:
+                a.put_nowait(None)
 
-                data = None
-                self.cstart = None
-                if tilestor is not None:
-                    tilestor.rollback()
+    def shutdown(self):
+        self._shutdown = True
 
-    def _write_tile_meta(self, conn, table_uuid, row):
-        # fmt: off
-        conn.execute(sa.sql.text("""
-            INSERT INTO tile_cache."{0}" AS tc (z, x, y, color, tstamp)
-            VALUES (:z, :x, :y, :color, :tstamp)
-            ON CONFLICT (z, x, y) DO UPDATE
-            SET color = :color, tstamp = :tstamp
-            WHERE tc.tstamp < :tstamp
-        """.format(table_uuid)), row)
-        # fmt: on
+    def join(self, timeout):
+        self._worker.join(timeout)
+        return not self._worker.is_alive()
 
-    def _write_tile_data(self, tilestor, z, x, y, tstamp, value):
-        # fmt: off
-        tilestor.execute("""
-            INSERT INTO tile VALUES (?, ?, ?, ?, ?)
-            ON CONFLICT (z, x, y) DO UPDATE
-            SET tstamp = ?, data = ?
-            WHERE tstamp < ?
-        """, (z, x, y, tstamp, value, tstamp, value, tstamp))
-        # fmt: on
 
-    def wait_for_shutdown(self, timeout=SHUTDOWN_TIMEOUT):
-        if not self._worker.is_alive():
-            return True
+class TilestorWriter:
+    """Pool of tile cache writer shards
+
+    Tiles are routed to shards by tile cache UUID, so the tiles of the same
+    tile cache are always written sequentially, while different tile caches
+    are written concurrently."""
 
+    __instance = None
+    __instance_lock = Lock()
+
+    def __init__(self, workers=1):
+        self.shards = tuple(TilestorWriterShard(i) for i in range(max(workers, 1)))
+        atexit.register(self.wait_for_shutdown)
+
+    @classmethod
+    def getInstance(cls):
+        if cls.__instance is None:
+            with cls.__instance_lock:
+                if cls.__instance is None:
+                    from .component import RenderComponent
+
+                    comp = RenderComponent.current()
+                    cls.__instance = TilestorWriter(comp.options["tile_cache.writer.workers"])
+        return cls.__instance
+
+    @classmethod
+    def instance_stat(cls):
+        """Statistics of the process writer or None if it hasn't started"""
+        if (instance := cls.__instance) is None:
+            return None
+        return instance.stat()
+
+    def shard(self, uuid):
+        return self.shards[int(uuid[:8], 16) % len(self.shards)]
+
+    def put(self, payload, timeout):
+        self.shard(payload["uuid"]).put(payload, timeout)
+
+    def stat(self):
+        shards = [s.stat() for s in self.shards]
+        return dict(
+            workers=len(shards),
+            qsize=sum(s["qsize"] for s in shards),
+            tiles_written=sum(s["tiles_written"] for s in shards),
+            tiles_dropped=sum(s["tiles_dropped"] for s in shards),
+            tiles_failed=sum(s["tiles_failed"] for s in shards),
+            shards=shards,
+        )
+
+    def wait_for_shutdown(self, timeout=SHUTDOWN_TIMEOUT):
         logger.debug(
             "Waiting for shutdown of tile cache writer for %d seconds (qsize = %d)...",
             timeout,
-            self.queue.qsize(),
+            sum(s.queue.qsize() for s in self.shards),
         )
 
-        self._shutdown = True
-        self._worker.join(timeout)
+        for s in self.shards:
+            s.shutdown()
+
+        deadline = time() + timeout
+        success = True
+        for s in self.shards:
+            success = s.join(max(deadline - time(), 0)) and success
 
-        if self._worker.is_alive():
+        if not success:
             logger.warning("Tile cache writer is still running. It'll be killed!")
-            return False
         else:
             logger.debug("Tile cache writer has successfully shut down.")
-            return True
+        return success
 
 
 class ResourceTileCache(Base):
@@ -357,7 +491,14 @@ class ResourceTileCache(Base):
 
         return os.path.join(tcpath, suuid[0:2], suuid[2:4], suuid)
 
-    def get_tile(self, tile):
+    def get_tile_data(self, tile):
+        """Get tile from the cache without decoding it
+
+        Returns a tuple of three elements: existence flag, tile data and
+        timestamp (in seconds since epoch). Tile data is None for an empty
+        tile, an RGBA tuple for a solid color tile, and PNG-encoded bytes
+        otherwise."""
+
         z, x, y = tile
 
         conn = DBSession.connection()
@@ -371,20 +512,20 @@ class ResourceTileCache(Base):
         ).fetchone()
 
         if trow is None:
-            return False, None
+            return False, None, None
 
         color, tstamp = trow
 
         if self.ttl is not None:
             expdt = TIMESTAMP_EPOCH + timedelta(seconds=tstamp + self.ttl)
             if expdt <= utcnow_naive():
-                return False, None
+                return False, None, None
 
         if color is not None:
             colors = unpack_color(color)
             if colors[3] == 0:
-                return True, None
-            return True, Image.new("RGBA", (TILE_SIZE, TILE_SIZE), colors)
+                return True, None, tstamp
+            return True, colors, tstamp
 
         else:
             tilestor, lock = self.get_tilestor()
@@ -395,21 +536,34 @@ class ResourceTileCache(Base):
                 ).fetchone()
 
             if srow is None:
-                return False, None
+                return False, None, None
+
+            return True, srow[0], tstamp
+
+    def get_tile(self, tile):
+        exists, data, _ = self.get_tile_data(tile)
+        return exists, tile_data_image(data)
+
+    def put_tile(self, tile, img, timeout=None, *, wait=None):
+        return self.put_tiles(((tile, img),), timeout, wait=wait)
+
+    def put_tiles(self, tiles, timeout=None, *, wait=None):
+        """Put multiple tiles to the tile cache writer as one queue item
+
+        :param tiles: Iterable of (tile, image) pairs
+        :param wait: Wait until tiles are written, defaults to async_writing"""
 
-            return True, Image.open(BytesIO(srow[0]))
+        wait = self.async_writing if wait is None else wait
 
-    def put_tile(self, tile, img, timeout=None):
         params = dict(
-            tile=tile,
-            img=None if img is None else img.copy(),
+            tiles=[(tile, None if img is None else img.copy()) for tile, img in tiles],
             uuid=self.uuid.hex,
             db_path=self.tilestor_path,
         )
 
         writer = TilestorWriter.getInstance()
 
-        if self.async_writing:
+        if wait:
             answer_queue = Queue(maxsize=1)
             params["answer_queue"] = answer_queue
 
@@ -420,13 +574,13 @@ class ResourceTileCache(Base):
         except TileWriterQueueException as exc:
             result = False
             logger.error(
-                "Failed to put tile {} to tile cache for resource {}. {}".format(
-                    params["tile"], self.resource_id, exc
+                "Failed to put {} tile(s) to tile cache for resource {}. {}".format(
+                    len(params["tiles"]), self.resource_id, exc
                 ),
                 exc_info=True,
             )
 
-        if self.async_writing:
+        if wait and result:
             try:
                 answer_queue.get()
             except Exception:
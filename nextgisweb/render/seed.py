@@ -0,0 +1,370 @@
+import multiprocessing
+import os
+import subprocess
+import sys
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import batched, islice
+from time import monotonic, sleep, time
+from typing import Annotated, Literal
+
+import msgspec
+import sqlalchemy as sa
+import transaction
+from msgspec import Meta, Struct
+from shapely.geometry import box
+from shapely.prepared import prep
+
+from nextgisweb.env import DBSession, gettext
+from nextgisweb.lib.logging import logger
+
+from nextgisweb.core import CoreComponent
+from nextgisweb.core.exception import ValidationError
+from nextgisweb.feature_layer import IFeatureLayer
+from nextgisweb.resource import Resource
+from nextgisweb.spatial_ref_sys import SRS
+
+from .interface import IRenderableStyle
+from .model import tile_record, write_tiles
+from .util import TILE_SIZE
+
+SeedZoom = Annotated[int, Meta(ge=0, le=24)]
+SeedStatus = Literal["running", "completed", "failed", "cancelled"]
+
+CHUNK_SIZE = 16
+
+# Running seeding updates its progress after each chunk, so progress that
+# hasn't been updated for a while belongs to a dead process.
+PROGRESS_STALE_TIMEOUT = 300
+
+
+class SeedFeature(Struct, kw_only=True):
+    layer: Annotated[int, Meta(description="Feature layer ID")]
+    fid: Annotated[int, Meta(description="Feature ID")]
+
+
+class SeedParams(Struct, kw_only=True):
+    zmin: Annotated[SeedZoom, Meta(description="Minimum zoom level")]
+    zmax: Annotated[SeedZoom, Meta(description="Maximum zoom level")]
+    extent: Annotated[
+        Annotated[list[float], Meta(min_length=4, max_length=4)] | None,
+        Meta(description="Extent in EPSG:3857 coordinates"),
+    ] = None
+    feature: Annotated[
+        SeedFeature | None,
+        Meta(description="Feature which geometry limits the tile set"),
+    ] = None
+
+
+class SeedProgress(Struct, kw_only=True):
+    resource_id: int
+    params: SeedParams
+    total: int
+    done: int = 0
+    status: SeedStatus = "running"
+    started: float
+    updated: float
+
+    @property
+    def running(self):
+        return self.status == "running" and time() - self.updated < PROGRESS_STALE_TIMEOUT
+
+
+class TileSeeder:
+    """Pre-render tiles of a renderable resource into its tile cache
+
+    Tiles are enumerated in a stable order (by zoom level, then by rows), so
+    the progress is a number of processed tiles, which allows to resume
+    seeding from the last written chunk."""
+
+    def __init__(self, resource: Resource, params: SeedParams):
+        if not IRenderableStyle.providedBy(resource):
+            raise ValidationError("Resource (ID=%d) cannot be rendered." % (resource.id,))
+
+        tcache = resource.tile_cache
+        if tcache is None or not tcache.enabled:
+            raise ValidationError(gettext("Tile cache is not enabled for the resource."))
+
+        if params.zmin > params.zmax:
+            raise ValidationError(gettext("Minimum zoom level exceeds maximum zoom level."))
+
+        self.resource_id = resource.id
+        self.params = params
+        self.srs = SRS.filter_by(id=3857).one()
+
+        self.zmin = params.zmin
+        self.zmax = params.zmax if tcache.max_z is None else min(params.zmax, tcache.max_z)
+
+        self.tcache_uuid = tcache.uuid.hex
+        self.tcache_path = tcache.tilestor_path
+
+        self.shape = None
+        if params.feature is not None:
+            geom = _feature_geom(params.feature, self.srs)
+            self.shape = prep(geom.shape)
+            self.extent = geom.bounds
+        elif params.extent is not None:
+            self.extent = tuple(params.extent)
+        else:
+            raise ValidationError(gettext("Either extent or feature must be given."))
+
+    def tile_ranges(self):
+        for z in range(self.zmin, self.zmax + 1):
+            xmin, ymin, xmax, ymax = self.srs.extent_tile_range(self.extent, z)
+            yield z, (max(xmin, 0), max(ymin, 0), min(xmax, 2**z - 1), min(ymax, 2**z - 1))
+
+    def tiles(self):
+        for z, (xmin, ymin, xmax, ymax) in self.tile_ranges():
+            for y in range(ymin, ymax + 1):
+                for x in range(xmin, xmax + 1):
+                    tile = (z, x, y)
+                    if self.shape is None or self.shape.intersects(
+                        box(*self.srs.tile_extent(tile))
+                    ):
+                        yield tile
+
+    def count(self):
+        if self.shape is not None:
+            return sum(1 for _ in self.tiles())
+        return sum(
+            max(xmax - xmin + 1, 0) * max(ymax - ymin + 1, 0)
+            for _, (xmin, ymin, xmax, ymax) in self.tile_ranges()
+        )
+
+    def start(self, *, resume=True):
+        """Save initial progress unless seeding of the resource is running
+
+        Progress is checked and saved under a transaction-level advisory
+        lock, so only one of concurrent starts succeeds. The lock is held
+        until the end of the current transaction.
+
+        :param resume: Continue seeding with the same parameters from the
+            last saved progress
+        :returns: Progress to be passed to run or None if seeding is
+            already running"""
+
+        lock_progress(self.resource_id)
+        progress = read_progress(self.resource_id)
+        if progress is not None and progress.running:
+            return None
+
+        now = time()
+        if (
+            resume
+            and progress is not None
+            and progress.params == self.params
+            and progress.status != "completed"
+        ):
+            logger.info("Resuming seeding from tile #%d of %d", progress.done, progress.total)
+            progress.status = "running"
+        else:
+            progress = SeedProgress(
+                resource_id=self.resource_id,
+                params=self.params,
+                total=self.count(),
+                started=now,
+                updated=now,
+            )
+        self._save(progress)
+        return progress
+
+    def attach(self):
+        """Get progress of seeding started by another process with the same
+        parameters, see spawn_seeding
+
+        :returns: Progress to be passed to run or None if there is no such
+            seeding"""
+
+        lock_progress(self.resource_id)
+        progress = read_progress(self.resource_id)
+        if progress is None or not progress.running or progress.params != self.params:
+            return None
+        return progress
+
+    def run(self, progress, *, workers=0, rate=None):
+        """Render tiles and write them to the tile cache
+
+        :param progress: Progress returned by start
+        :param workers: Number of rendering processes, 0 to render in the
+            current thread
+        :param rate: Maximum number of tiles per second"""
+
+        chunks = batched(islice(self.tiles(), progress.done, None), CHUNK_SIZE)
+        args = (self.resource_id, self.tcache_uuid, self.tcache_path)
+
+        executor = None
+        if workers > 0:
+            executor = ProcessPoolExecutor(
+                workers,
+                mp_context=multiprocessing.get_context("fork"),
+                initializer=_worker_init,
+            )
+
+        t0, written = monotonic(), 0
+        try:
+            pending = deque()
+            for chunk in chunks:
+                if executor is None:
+                    pending.append(_render_chunk(*args, chunk))
+                else:
+                    pending.append(executor.submit(_render_chunk, *args, chunk))
+                if len(pending) < max(workers * 2, 1):
+                    continue
+
+                if not self._write(progress, pending.popleft()):
+                    break
+
+                written += CHUNK_SIZE
+                if rate is not None and (delay := written / rate - (monotonic() - t0)) > 0:
+                    sleep(delay)
+            else:
+                while pending:
+                    if not self._write(progress, pending.popleft()):
+                        break
+                else:
+                    self._update(progress, status="completed")
+        except BaseException:
+            self._update(progress, status="failed")
+            raise
+        finally:
+            if executor is not None:
+                executor.shutdown(cancel_futures=True)
+
+        return progress
+
+    def _write(self, progress, result):
+        records = result if isinstance(result, list) else result.result()
+        write_tiles(records)
+
+        if not self._update(progress, done=progress.done + len(records)):
+            logger.info("Seeding cancelled at tile #%d", progress.done)
+            return False
+
+        logger.debug("%d of %d tiles seeded", progress.done, progress.total)
+        return True
+
+    def _update(self, progress, **values):
+        """Update and save progress unless seeding has been cancelled
+
+        Seeding can be cancelled by another process through the progress
+        file, so it's checked and overwritten under the same lock.
+
+        :returns: False if seeding has been cancelled"""
+
+        with transaction.manager:
+            lock_progress(self.resource_id)
+            current = read_progress(self.resource_id)
+            if current is not None and current.status == "cancelled":
+                progress.status = "cancelled"
+                return False
+
+            for k, v in values.items():
+                setattr(progress, k, v)
+            self._save(progress)
+            return True
+
+    def _save(self, progress):
+        progress.updated = time()
+        write_progress(progress)
+
+
+def spawn_seeding(resource_id, params: SeedParams, *, rate=None):
+    """Run started seeding in a separate process with the seed command, so
+    it doesn't depend on the lifetime of the calling process
+
+    :returns: Popen object of the spawned process"""
+
+    cmd = [sys.executable, "-m", "nextgisweb", "render", "seed", str(resource_id)]
+    cmd.extend((f"--zmin={params.zmin}", f"--zmax={params.zmax}"))
+    if params.extent is not None:
+        cmd.append("--extent=" + ",".join(str(v) for v in params.extent))
+    if params.feature is not None:
+        cmd.append(f"--feature={params.feature.layer}:{params.feature.fid}")
+    if rate is not None:
+        cmd.append(f"--rate={rate}")
+    cmd.extend(("--attach", "--no-dry-run"))
+
+    return subprocess.Popen(
+        cmd,
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.DEVNULL,
+        start_new_session=True,
+    )
+
+
+def progress_path(resource_id):
+    from .component import RenderComponent
+
+    return os.path.join(RenderComponent.current().seed_path, f"{resource_id}.json")
+
+
+def lock_progress(resource_id):
+    """Lock seeding progress of the resource until the end of the current
+    transaction"""
+
+    DBSession.execute(
+        sa.text("SELECT pg_advisory_xact_lock(hashtext(:key))"),
+        dict(key=f"tile_cache_seed/{resource_id}"),
+    )
+
+
+def read_progress(resource_id) -> SeedProgress | None:
+    try:
+        with open(progress_path(resource_id), "rb") as fd:
+            return msgspec.json.decode(fd.read(), type=SeedProgress)
+    except FileNotFoundError:
+        return None
+
+
+def write_progress(progress: SeedProgress):
+    path = progress_path(progress.resource_id)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    # Write to a temporary file and rename it to make it atomic for readers
+    tmp = f"{path}.{os.getpid()}"
+    with open(tmp, "wb") as fd:
+        fd.write(msgspec.json.encode(progress))
+    os.replace(tmp, path)
+
+
+def _feature_geom(feature: SeedFeature, srs):
+    layer = Resource.filter_by(id=feature.layer).one_or_none()
+    if layer is None or not IFeatureLayer.providedBy(layer):
+        raise ValidationError(gettext("Feature layer not found."))
+
+    query = layer.feature_query()
+    query.srs(srs)
+    query.geom()
+    query.filter_by(id=feature.fid)
+    query.limit(1)
+
+    for feat in query():
+        if feat.geom is None:
+            break
+        return feat.geom
+
+    raise ValidationError(gettext("Feature not found or has no geometry."))
+
+
+def _worker_init():
+    # Connections inherited from the parent process can't be shared, so drop
+    # them without closing to get new ones on demand.
+    CoreComponent.current().engine.dispose(close=False)
+    DBSession.remove()
+
+
+def _render_chunk(resource_id, tcache_uuid, tcache_path, tiles):
+    with transaction.manager:
+        obj = Resource.filter_by(id=resource_id).one()
+        srs = SRS.filter_by(id=3857).one()
+        req = obj.render_request(srs)
+
+        return [
+            tile_record(
+                tile,
+                req.render_tile(tile, TILE_SIZE),
+                uuid=tcache_uuid,
+                db_path=tcache_path,
+            )
+            for tile in tiles
+        ]
@@ -0,0 +1,104 @@
+from threading import Event, Lock
+
+import sqlalchemy as sa
+
+from nextgisweb.env import DBSession
+
+from .model import tile_data_image
+
+
+class _Call:
+    __slots__ = ("error", "event", "result")
+
+    def __init__(self):
+        self.event = Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Coalesce concurrent calls with the same key into a single call
+
+    The first caller executes the function, others wait for it and get the
+    same result or exception."""
+
+    def __init__(self):
+        self._lock = Lock()
+        self._calls = dict()
+
+        self.calls = 0
+        self.coalesced = 0
+
+    def do(self, key, fn):
+        with self._lock:
+            if (call := self._calls.get(key)) is None:
+                call = self._calls[key] = _Call()
+                self.calls += 1
+                leader = True
+            else:
+                self.coalesced += 1
+                leader = False
+
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except Exception as exc:
+            call.error = exc
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.event.set()
+
+
+tile_flight = SingleFlight()
+
+# Number of tiles found in the tile cache after waiting for another process
+lock_hits = 0
+
+
+def render_tile_once(tcache, tile, render, *, advisory_lock=False):
+    """Render an uncached tile once for concurrent requests
+
+    The render callable takes a single argument, which tells it to wait until
+    the rendered tile is written to the tile cache. With advisory_lock, the
+    tile is rendered once across processes: a process holds a PostgreSQL
+    advisory lock while rendering and writing the tile, and others read it
+    from the tile cache after the lock is released."""
+
+    def fn():
+        if not advisory_lock:
+            return render(tcache.async_writing)
+        return _render_locked(tcache, tile, render)
+
+    return tile_flight.do((tcache.uuid.hex, tile), fn)
+
+
+def _render_locked(tcache, tile, render):
+    global lock_hits
+
+    conn = DBSession.connection()
+    params = dict(key="tile_cache/{}/{}/{}/{}".format(tcache.uuid.hex, *tile))
+    conn.execute(sa.text("SELECT pg_advisory_lock(hashtext(:key))"), params)
+    try:
+        exists, data, _ = tcache.get_tile_data(tile)
+        if exists:
+            lock_hits += 1
+            return tile_data_image(data)
+        return render(True)
+    finally:
+        conn.execute(sa.text("SELECT pg_advisory_unlock(hashtext(:key))"), params)
+
+
+def query_stat():
+    return dict(
+        renders=tile_flight.calls,
+        coalesced=tile_flight.coalesced,
+        lock_hits=lock_hits,
+    )
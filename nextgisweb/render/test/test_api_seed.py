@@ -0,0 +1,65 @@
+import pytest
+import transaction
+
+from nextgisweb.pyramid.test import WebTestApp
+from nextgisweb.raster_layer import RasterLayer
+from nextgisweb.raster_style import RasterStyle
+
+from .. import api
+from ..model import ResourceTileCache
+from ..seed import spawn_seeding
+
+pytestmark = pytest.mark.usefixtures("ngw_resource_defaults", "ngw_auth_administrator")
+
+WORLD = [-20037508.34, -20037508.34, 20037508.34, 20037508.34]
+
+
+@pytest.fixture
+def style_id(ngw_data_path, ngw_env):
+    with transaction.manager:
+        layer = RasterLayer().persist()
+        layer.load_file(ngw_data_path / "sochi-aster-colorized.tif")
+        obj = RasterStyle(parent=layer).persist()
+        obj.tile_cache = ResourceTileCache(enabled=True)
+
+    yield obj.id
+
+
+@pytest.fixture
+def spawned(monkeypatch):
+    result = []
+
+    def spawn(*args, **kwargs):
+        result.append(proc := spawn_seeding(*args, **kwargs))
+        return proc
+
+    monkeypatch.setattr(api, "spawn_seeding", spawn)
+    yield result
+
+    for proc in result:
+        if proc.poll() is None:
+            proc.kill()
+        proc.wait()
+
+
+def test_seed(style_id, spawned, ngw_webtest_app: WebTestApp):
+    url = f"/api/resource/{style_id}/tile_cache/seed"
+    body = dict(zmin=0, zmax=4, extent=WORLD)
+
+    resp = ngw_webtest_app.post_json(url + "?dry_run=true", body)
+    assert resp.json == dict(status=None, total=1 + 4 + 16 + 64 + 256, done=0)
+
+    # The rate limit keeps seeding running during the test
+    resp = ngw_webtest_app.post_json(url + "?rate=16", body)
+    assert resp.json == dict(status="running", total=341, done=0)
+
+    ngw_webtest_app.post_json(url, body, status=409)
+    assert ngw_webtest_app.get(url).json["status"] == "running"
+
+    resp = ngw_webtest_app.delete(url)
+    assert resp.json["status"] == "cancelled"
+    assert ngw_webtest_app.get(url).json["status"] == "cancelled"
+
+    # Seeding process stops after writing the current chunk
+    assert spawned[0].wait(timeout=30) == 0
+    assert ngw_webtest_app.get(url).json["status"] == "cancelled"
@@ -0,0 +1,62 @@
+from threading import Thread
+from time import sleep
+from uuid import uuid4
+
+import pytest
+from PIL import Image
+
+from ..metatile import metatile_range, render_metatile
+
+
+@pytest.mark.parametrize(
+    "tile, msize, expected",
+    (
+        ((0, 0, 0), 4, (0, 0, 0, 0, 0)),
+        ((1, 1, 0), 4, (1, 0, 0, 1, 1)),
+        ((5, 6, 9), 4, (5, 4, 8, 7, 11)),
+        ((5, 6, 9), 1, (5, 6, 9, 6, 9)),
+    ),
+)
+def test_metatile_range(tile, msize, expected):
+    assert metatile_range(tile, msize) == expected
+
+
+class RenderRequest:
+    calls = 0
+
+    def render_metatile(self, mrange, size):
+        self.calls += 1
+        sleep(0.1)
+        z, xmin, ymin, xmax, ymax = mrange
+        img = Image.new("RGBA", ((xmax - xmin + 1) * size, (ymax - ymin + 1) * size))
+        img.putpixel((size, size), (255, 0, 0, 255))
+        return img
+
+
+class TileCache:
+    def __init__(self):
+        self.uuid = uuid4()
+        self.tiles = dict()
+
+    def put_tiles(self, tiles, *, wait=None):
+        self.tiles.update(tiles)
+
+
+def test_render_metatile():
+    req, tcache = RenderRequest(), TileCache()
+
+    result = dict()
+
+    def target(tile):
+        result[tile] = render_metatile(req, tcache, tile, 2)
+
+    threads = [Thread(target=target, args=((2, x, y),)) for x in (0, 1) for y in (0, 1)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert req.calls == 1
+    assert len(tcache.tiles) == 4
+    assert result[(2, 1, 1)].getpixel((0, 0)) == (255, 0, 0, 255)
+    assert result[(2, 0, 0)].getpixel((0, 0)) == (0, 0, 0, 0)
@@ -0,0 +1,29 @@
+import pytest
+
+from nextgisweb.raster_layer import RasterLayer
+from nextgisweb.raster_style import RasterStyle
+
+from ..model import ResourceTileCache
+from ..seed import SeedParams, TileSeeder
+
+pytestmark = pytest.mark.usefixtures("ngw_resource_defaults", "ngw_txn")
+
+WORLD = [-20037508.34, -20037508.34, 20037508.34, 20037508.34]
+
+
+@pytest.fixture
+def style():
+    layer = RasterLayer(xsize=100, ysize=100, dtype="Byte", band_count=3).persist()
+    result = RasterStyle(parent=layer).persist()
+    result.tile_cache = ResourceTileCache(enabled=True, max_z=3)
+    return result
+
+
+def test_count(style):
+    seeder = TileSeeder(style, SeedParams(zmin=0, zmax=2, extent=WORLD))
+    assert seeder.count() == 1 + 4 + 16
+    assert seeder.count() == len(list(seeder.tiles()))
+
+    # Limited by the tile cache maximum zoom level
+    seeder = TileSeeder(style, SeedParams(zmin=3, zmax=10, extent=[0, 0, 1, 1]))
+    assert list(seeder.tiles()) == [(3, 4, 3)]
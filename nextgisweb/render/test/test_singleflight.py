@@ -0,0 +1,43 @@
+from threading import Barrier, Thread
+from time import sleep
+
+import pytest
+
+from ..singleflight import SingleFlight
+
+
+def test_coalesce():
+    sf = SingleFlight()
+    barrier = Barrier(8)
+    result = []
+
+    def fn():
+        sleep(0.2)
+        return object()
+
+    def target():
+        barrier.wait()
+        result.append(sf.do("key", fn))
+
+    threads = [Thread(target=target) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len(set(map(id, result))) == 1
+    assert sf.calls == 1 and sf.coalesced == 7
+
+    # Completed calls aren't reused
+    assert sf.do("key", fn) is not result[0]
+
+
+def test_error():
+    sf = SingleFlight()
+
+    def fn():
+        raise ValueError
+
+    with pytest.raises(ValueError):
+        sf.do("key", fn)
+    assert sf.do("key", lambda: 1) == 1
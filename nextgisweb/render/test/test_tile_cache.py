@@ -124,3 +124,45 @@ def test_clear(frtc, img_cross_red):
     frtc.clear()
     exists, cimg = frtc.get_tile(tile)
     assert not exists
+
+
+def test_writer_stat(frtc, img_cross_red):
+    writer = TilestorWriter.getInstance()
+    written = writer.stat()["tiles_written"]
+    frtc.put_tile((0, 0, 0), img_cross_red)
+    frtc.put_tile((1, 0, 0), img_cross_red)
+
+    stat = writer.stat()
+    assert stat["tiles_written"] == written + 2
+    assert stat["workers"] == len(stat["shards"])
+
+
+def test_get_tile_data(frtc, img_cross_red, img_fill, img_empty):
+    frtc.put_tile((0, 0, 0), img_cross_red)
+    exists, data, tstamp = frtc.get_tile_data((0, 0, 0))
+    assert exists and data.startswith(b"\x89PNG") and tstamp > 0
+
+    frtc.put_tile((1, 0, 0), img_fill)
+    exists, data, _ = frtc.get_tile_data((1, 0, 0))
+    assert exists and data == (100, 100, 100, 100)
+
+    frtc.put_tile((1, 1, 0), img_empty)
+    exists, data, _ = frtc.get_tile_data((1, 1, 0))
+    assert exists and data is None
+
+
+@pytest.mark.usefixtures("ngw_auth_administrator")
+def test_tile_not_modified(frtc, img_cross_red, ngw_webtest_app):
+    with transaction.manager:
+        ResourceTileCache.filter_by(resource_id=frtc.resource_id).one().enabled = True
+    frtc.put_tile((0, 0, 0), img_cross_red)
+
+    url = f"/api/component/render/tile?z=0&x=0&y=0&resource={frtc.resource_id}"
+    resp = ngw_webtest_app.get(url)
+    assert resp.body.startswith(b"\x89PNG")
+    etag = resp.headers["ETag"]
+    assert resp.headers.get("Last-Modified") is not None
+
+    resp = ngw_webtest_app.get(url, headers={"If-None-Match": etag}, status=304)
+    assert resp.headers["ETag"] == etag
+    assert resp.body == b""
@@ -1,4 +1,5 @@
 from .component import ResourceComponent
+from .effective import ResourceEffectivePermission, effective_permissions
 from .exception import DisplayNameNotUnique, HierarchyError, ResourceNotFound, ValidationError
 from .favorite import ResourceFavoriteModel
 from .interface import IResourceAdapter, IResourceBase, interface_registry
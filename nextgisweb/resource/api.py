@@ -2,7 +2,6 @@ from collections.abc import Mapping
 from typing import TYPE_CHECKING, Annotated, Any, ClassVar, Literal
 
 import sqlalchemy as sa
-import sqlalchemy.orm as orm
 import zope.event
 import zope.event.classhandler
 from msgspec import UNSET, DecodeError, Meta, Struct, UnsetType, defstruct, field, to_builtins
@@ -47,7 +46,13 @@ from .model import (
     ResourceScopeIdentity,
     resource_registry,
 )
-from .presolver import ExplainACLRule, ExplainDefault, ExplainRequirement, PermissionResolver
+from .presolver import (
+    ExplainACLRule,
+    ExplainDefault,
+    ExplainRequirement,
+    PermissionResolver,
+    read_filter,
+)
 from .sattribute import ResourceRefOptional, ResourceRefWithParent
 from .scope import ResourceScope, Scope
 from .view import resource_factory
@@ -206,39 +211,36 @@ def collection_get(
     """Read children resources
 
     :returns: List of child resources"""
-    query = (
-        Resource.query()
-        .filter_by(parent_id=parent)
-        .order_by(Resource.display_name)
-        .options(orm.subqueryload(Resource.acl))
-    )
+    query = Resource.query().filter_by(parent_id=parent).order_by(Resource.display_name)
 
-    serializer = CompositeSerializer(user=request.user)
-    result = list()
-    for resource in query:
-        if resource.has_permission(ResourceScope.read, request.user):
-            result.append(serializer.serialize(resource, CompositeRead))
+    pcache = request.permission_cache
+    serializer = CompositeSerializer(user=request.user, pcache=pcache)
+    resources = query.all()
+    pcache.preload(resources)
 
-    serializer = CompositeSerializer(user=request.user)
-    check_perm = lambda res, u=request.user: res.has_permission(ResourceScope.read, u)
-    resources = [res for res in query if check_perm(res)]
+    resources = [res for res in resources if pcache.has_permission(res, ResourceScope.read)]
     resources.sort(key=lambda res: (res.cls_order, res.display_name))
     return [serializer.serialize(res, CompositeRead) for res in resources]
 
 
-def collection_post(
-    request: Request,
+def create_resource(
     body: CompositeCreate,
-) -> Annotated[ResourceRefWithParent, StatusCode(201)]:
-    """Create resource
+    *,
+    user: User,
+    request: Request | None,
+) -> Resource:
+    """Create a resource from the resource creation payload
 
-    :returns: Created resource"""
+    :param user: Owner of the resource, who makes the changes
+    :param request: Request which created the resource, None for background
+        jobs
+    :returns: Created and flushed resource"""
 
     CoreComponent.current().check_storage_limit()
 
     resource_cls = body.resource.cls
-    resource = resource_registry[resource_cls](owner_user=request.user)
-    serializer = CompositeSerializer(user=request.user)
+    resource = resource_registry[resource_cls](owner_user=user)
+    serializer = CompositeSerializer(user=user)
 
     resource.persist()
     with DBSession.no_autoflush:
@@ -249,8 +251,20 @@ def collection_post(
 
     DBSession.flush()
 
-    request.audit_context("resource", resource.id)
     zope.event.notify(AfterResourceCollectionPost(resource, request))
+    return resource
+
+
+def collection_post(
+    request: Request,
+    body: CompositeCreate,
+) -> Annotated[ResourceRefWithParent, StatusCode(201)]:
+    """Create resource
+
+    :returns: Created resource"""
+
+    resource = create_resource(body, user=request.user, request=request)
+    request.audit_context("resource", resource.id)
 
     request.response.status_code = 201
     parent_ref = ResourceRefOptional(id=resource.parent.id)
@@ -922,31 +936,29 @@ def search(
 
     :returns: List of resources matching the search criteria"""
 
-    query = root.query().where(*attrs.filters(), *resmeta.filters(Resource.id))
+    query = root.query().where(
+        *attrs.filters(),
+        *resmeta.filters(Resource.id),
+        read_filter(request.user),
+    )
 
     order_norm, order_clauses, need_owner_join = _search_order(order)
     if need_owner_join:
         query = query.join(Resource.owner_user)
-    query = query.order_by(*order_clauses)
 
     cs_keys = None if serialization == "full" else ("resource",)
-    serializer = CompositeSerializer(keys=cs_keys, user=request.user)
-    check_perm = lambda res, u=request.user: res.has_permission(ResourceScope.read, u)
+    pcache = request.permission_cache
+    serializer = CompositeSerializer(keys=cs_keys, user=request.user, pcache=pcache)
 
     legacy_mode = not breadcrumb and limit is None and offset == 0 and len(order) == 0
     if legacy_mode:
-        return [
-            serializer.serialize(res, CompositeRead)
-            for (res,) in DBSession.execute(query)
-            if check_perm(res)
-        ]
-
-    permitted = [res for (res,) in DBSession.execute(query) if check_perm(res)]
-    total_count = len(permitted)
-
-    page = permitted[offset:]
-    if limit is not None:
-        page = page[:limit]
+        page = DBSession.scalars(query.order_by(*order_clauses)).all()
+        pcache.preload(page)
+        return [serializer.serialize(res, CompositeRead) for res in page]
+
+    total_count = DBSession.scalar(sa.select(sa.func.count()).select_from(query.subquery()))
+    page = DBSession.scalars(query.order_by(*order_clauses).limit(limit).offset(offset)).all()
+    pcache.preload(page)
 
     items = [serializer.serialize(res, CompositeRead) for res in page]
 
@@ -13,6 +13,8 @@ from nextgisweb.auth import Group, User
 from nextgisweb.core.component import CoreComponent
 
 from .category import ResourceCategory, ResourceCategoryIdentity
+from .effective import EffectivePermissionLRU
+from .effective import listen as effective_listen
 from .exception import QuotaExceeded, ResourceDisabled
 from .interface import interface_registry
 from .model import (
@@ -43,6 +45,11 @@ class ResourceComponent(Component):
         self.quota_resource_cls = self.options["quota.resource_cls"]
         self.quota_resource_by_cls = self._parse_quota_resource_by_cls()
 
+        self.effective_permission_lru = EffectivePermissionLRU(
+            self.options["effective_permission.lru_size"]
+        )
+        effective_listen(DBSession)
+
     def _parse_disabled_resource_cls(self):
         disabled = []
         for cls in self.options["disabled_cls"]:
@@ -195,5 +202,8 @@ class ResourceComponent(Component):
         Option("home.enabled", bool, default=False),
         Option("home.keyname", str, default="resource_home"),
         Option("home.groups", list, default=[]),
+        Option("effective_permission.lru_size", int, default=10000, doc=(
+            "Number of resource and user pairs which effective permissions "
+            "are cached in memory.")),
     )
     # fmt: on
@@ -6,12 +6,20 @@ from nextgisweb.auth import User
 from nextgisweb.core.exception import UserException
 
 from .model import Resource
+from .presolver import PermissionCache
 from .serialize import CRUTypes, Serializer
 
 
 class CompositeSerializer:
-    def __init__(self, *, keys: tuple[str, ...] | None = None, user: User):
+    def __init__(
+        self,
+        *,
+        keys: tuple[str, ...] | None = None,
+        user: User,
+        pcache: PermissionCache | None = None,
+    ):
         self.user = user
+        self.pcache = pcache
         self.members: tuple[tuple[str, type[Serializer]], ...] = tuple(
             (identity, srlzrcls)
             for identity, srlzrcls in Serializer.registry.items()
@@ -22,7 +30,7 @@ class CompositeSerializer:
         result = dict()
         for identity, srlzrcls in self.members:
             if srlzrcls.is_applicable(obj):
-                srlzr = srlzrcls(obj, user=self.user, data=None)
+                srlzr = srlzrcls(obj, user=self.user, data=None, pcache=self.pcache)
                 srlzr.serialize()
                 result[identity] = srlzr.data
         return cls(**result)
@@ -0,0 +1,294 @@
+from collections import OrderedDict
+from itertools import chain
+from threading import Lock
+
+import sqlalchemy as sa
+import sqlalchemy.dialects.postgresql as sa_pg
+import sqlalchemy.event as sa_event
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Mapped, mapped_column
+
+from nextgisweb.env import Base, DBSession
+
+from nextgisweb.auth import Group, User
+from nextgisweb.core import CoreComponent
+
+from .model import Resource, ResourceACLRule, resource_registry
+
+SERIAL_KEY = "resource.eperm_serial"
+CHANGED_KEY = "resource.eperm_changed"
+
+
+class ResourceEffectivePermission(Base):
+    __tablename__ = "resource_effective_permission"
+
+    resource_id: Mapped[int] = mapped_column(
+        sa.ForeignKey(Resource.id, ondelete="CASCADE"), primary_key=True
+    )
+    principal_id: Mapped[int] = mapped_column(
+        sa.ForeignKey(User.id, ondelete="CASCADE"), primary_key=True
+    )
+    permission: Mapped[str] = mapped_column(sa.Unicode, primary_key=True)
+    allowed: Mapped[bool] = mapped_column(sa.Boolean)
+
+
+class ResourceEffectivePermissionSerial(Base):
+    __tablename__ = "resource_effective_permission_serial"
+
+    id: Mapped[int] = mapped_column(sa.Integer, primary_key=True, autoincrement=False)
+    value: Mapped[int] = mapped_column(sa.BigInteger)
+
+
+class EffectivePermissionLRU:
+    """In-process cache of effective permissions
+
+    Entries are tagged with the serial of the invalidation counter they were
+    computed at, so an invalidation in any process discards them."""
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, key, serial):
+        with self._lock:
+            if (entry := self._data.get(key)) is None:
+                return None
+            if entry[0] != serial:
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return entry[1]
+
+    def put(self, key, serial, value):
+        with self._lock:
+            self._data[key] = (serial, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+def effective_permissions(resource, user):
+    """Permissions of the user for the resource
+
+    Results are stored in the resource_effective_permission table and in the
+    in-process LRU. The table is written in a separate short transaction, so
+    the current transaction stays read-only. Within a transaction, which has
+    changed ACL rules, the resource tree or group membership, they are
+    evaluated directly."""
+
+    session = DBSession()
+    if user.superuser or resource.id is None or user.id is None or _changed(session):
+        return frozenset(resource.permissions(user))
+
+    from .component import ResourceComponent
+
+    lru = ResourceComponent.current().effective_permission_lru
+    serial = _serial(session)
+    key = (resource.id, user.id)
+    if (result := lru.get(key, serial)) is not None:
+        return result
+
+    class_permissions = {str(p): p for p in resource.class_permissions()}
+
+    EP = ResourceEffectivePermission
+    rows = session.execute(
+        sa.select(EP.permission, EP.allowed).where(
+            EP.resource_id == resource.id,
+            EP.principal_id == user.id,
+        )
+    ).all()
+
+    # Permissions stored before adding new ones to the class are recomputed
+    if len(rows) > 0 and {r.permission for r in rows} == set(class_permissions):
+        result = frozenset(class_permissions[r.permission] for r in rows if r.allowed)
+    else:
+        result = frozenset(resource.permissions(user))
+        _store(serial, resource.id, user.id, class_permissions, result)
+
+    lru.put(key, serial, result)
+    return result
+
+
+def _serial(session):
+    if (serial := session.info.get(SERIAL_KEY)) is None:
+        SR = ResourceEffectivePermissionSerial
+        serial = session.scalar(sa.select(SR.value).where(SR.id == 1)) or 0
+        session.info[SERIAL_KEY] = serial
+    return serial
+
+
+def _store(serial, resource_id, user_id, class_permissions, result):
+    # Locking the counter row blocks concurrent invalidation until the end of
+    # this short transaction. The result isn't stored if the row is locked by
+    # invalidation in progress or if the counter has been changed since the
+    # current transaction start, as it may be computed from outdated data.
+    SR = ResourceEffectivePermissionSerial
+    EP = ResourceEffectivePermission
+
+    engine = CoreComponent.current().engine
+    try:
+        with engine.connect() as con, con.begin():
+            current = con.scalar(
+                sa.select(SR.value).where(SR.id == 1).with_for_update(read=True, nowait=True)
+            )
+            if (current or 0) != serial:
+                return
+
+            con.execute(
+                sa.delete(EP).where(
+                    EP.resource_id == resource_id,
+                    EP.principal_id == user_id,
+                )
+            )
+            con.execute(
+                sa_pg.insert(EP)
+                .values(
+                    [
+                        dict(
+                            resource_id=resource_id,
+                            principal_id=user_id,
+                            permission=name,
+                            allowed=perm in result,
+                        )
+                        for name, perm in class_permissions.items()
+                    ]
+                )
+                .on_conflict_do_nothing()
+            )
+    except OperationalError as exc:
+        if exc.orig.__class__.__name__ != "LockNotAvailable":
+            raise
+
+
+def _affected(session):
+    """Resources and users which effective permissions are affected by
+    changes in the session: a tuple of (resource IDs which subtrees are
+    affected, user IDs, whether everything is affected)"""
+
+    roots, users, full = set(), set(), False
+    new, dirty, deleted = session.new, session.dirty, session.deleted
+
+    for obj in chain(new, dirty, deleted):
+        if isinstance(obj, ResourceACLRule):
+            if (resource_id := obj.resource_id) is None and obj.resource is not None:
+                resource_id = obj.resource.id
+            if resource_id is not None:
+                roots.add(resource_id)
+
+    for obj in dirty:
+        if isinstance(obj, Resource):
+            if _changed_attrs(obj, _requirement_attrs(type(obj))):
+                roots.add(obj.id)
+        elif isinstance(obj, Group):
+            added, _, removed = sa.inspect(obj).attrs.members.history
+            users.update(u.id for u in chain(added, removed) if u.id is not None)
+        elif isinstance(obj, User):
+            if _changed_attrs(obj, ("member_of",)):
+                users.add(obj.id)
+
+    for obj in deleted:
+        if isinstance(obj, Group):
+            full = True
+
+    return roots, users, full
+
+
+def _changed(session):
+    return session.info.get(CHANGED_KEY, False) or any(_affected(session))
+
+
+def _changed_attrs(obj, attrs):
+    iattrs = sa.inspect(obj).attrs
+    return any(attr in iattrs and iattrs[attr].history.has_changes() for attr in attrs)
+
+
+def _requirement_attrs(cls):
+    return {"parent"} | {r.attr for r in cls.class_requirements() if r.attr is not None}
+
+
+def _dependent_columns():
+    # Resources of these classes depend on permissions of resources outside
+    # their lineage, for example, on permissions of connections.
+    result = []
+    for cls in resource_registry.values():
+        for req in cls.class_requirements():
+            if req.attr in (None, "parent"):
+                continue
+            if (rel := sa.inspect(cls).relationships.get(req.attr)) is None:
+                # Unknown references, so all resources of the class are affected
+                result.append((cls, None))
+            else:
+                result.extend((cls, column) for column in rel.local_columns)
+    return result
+
+
+def _affected_tree(conn, roots):
+    """CTE of resource IDs affected by changes of the roots: their subtrees
+    and subtrees of resources, which depend on them through requirements"""
+
+    roots, columns = set(roots), _dependent_columns()
+    while True:
+        tree = sa.select(Resource.id).where(Resource.id.in_(roots)).cte("tree", recursive=True)
+        tree = tree.union_all(sa.select(Resource.id).where(Resource.parent_id == tree.c.id))
+
+        found = set()
+        for cls, column in columns:
+            found.update(
+                conn.execute(
+                    sa.select(cls.id).where(
+                        column.in_(sa.select(tree.c.id)) if column is not None else sa.true(),
+                        cls.id.not_in(sa.select(tree.c.id)),
+                    )
+                ).scalars()
+            )
+
+        if not found:
+            return tree
+        roots |= found
+
+
+def after_flush(session, flush_context):
+    roots, users, full = _affected(session)
+    if not (roots or users or full):
+        return
+
+    conn = session.connection()
+
+    # The counter must be incremented before deleting stored permissions, see
+    # the comment in _store for details.
+    SR = ResourceEffectivePermissionSerial
+    conn.execute(
+        sa_pg.insert(SR)
+        .values(id=1, value=1)
+        .on_conflict_do_update(index_elements=[SR.id], set_=dict(value=SR.value + 1))
+    )
+
+    EP = ResourceEffectivePermission
+    if full:
+        conn.execute(sa.delete(EP))
+    else:
+        where = []
+        if roots:
+            tree = _affected_tree(conn, roots)
+            where.append(EP.resource_id.in_(sa.select(tree.c.id)))
+        if users:
+            where.append(EP.principal_id.in_(users))
+        conn.execute(sa.delete(EP).where(sa.or_(*where)))
+
+    session.info[CHANGED_KEY] = True
+
+
+def after_transaction_end(session, transaction):
+    if transaction.parent is None:
+        session.info.pop(SERIAL_KEY, None)
+        session.info.pop(CHANGED_KEY, None)
+
+
+def listen(session):
+    sa_event.listen(session, "after_flush", after_flush)
+    sa_event.listen(session, "after_transaction_end", after_transaction_end)
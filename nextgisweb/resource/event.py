@@ -17,7 +17,7 @@ class AfterResourcePut:
 
 
 class AfterResourceCollectionPost:
-    def __init__(self, resource, request: Request):
+    def __init__(self, resource, request: Request | None):
         self.resource = resource
         self.request = request
 
@@ -0,0 +1,25 @@
+/*** {
+    "revision": "7c3e9a21", "parents": ["51aa8784"],
+    "date": "2026-10-18T00:00:00",
+    "message": "Effective permission"
+} ***/
+
+CREATE TABLE resource_effective_permission (
+    resource_id integer NOT NULL,
+    principal_id integer NOT NULL,
+    permission character varying NOT NULL,
+    allowed boolean NOT NULL,
+    PRIMARY KEY (resource_id, principal_id, permission),
+    FOREIGN KEY (resource_id) REFERENCES resource (id) ON DELETE CASCADE,
+    FOREIGN KEY (principal_id) REFERENCES auth_principal (id) ON DELETE CASCADE
+);
+
+COMMENT ON TABLE resource_effective_permission IS 'resource';
+
+CREATE TABLE resource_effective_permission_serial (
+    id integer NOT NULL,
+    value bigint NOT NULL,
+    PRIMARY KEY (id)
+);
+
+COMMENT ON TABLE resource_effective_permission_serial IS 'resource';
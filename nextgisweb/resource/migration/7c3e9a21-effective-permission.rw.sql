@@ -0,0 +1,4 @@
+/*** { "revision": "7c3e9a21" } ***/
+
+DROP TABLE resource_effective_permission_serial;
+DROP TABLE resource_effective_permission;
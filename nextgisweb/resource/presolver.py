@@ -1,5 +1,14 @@
 from collections import defaultdict, namedtuple
 
+import sqlalchemy as sa
+import sqlalchemy.dialects.postgresql as sa_pg
+import sqlalchemy.orm as orm
+
+from nextgisweb.env import DBSession
+
+from .model import Resource, ResourceACLRule
+from .scope import ResourceScope
+
 ExplainDefault = namedtuple("ExplainDefault", ["result", "resource"])
 ExplainACLRule = namedtuple("ExplainACLRule", ["result", "resource", "acl_rule"])
 ExplainRequirement = namedtuple(
@@ -142,3 +151,241 @@ def _acl_rules(resource, user, permissions):
             for perm in permissions:
                 if rule.cmp_permission(perm):
                     yield perm, rule
+
+
+class PermissionCache:
+    """Effective permissions of a user for many resources
+
+    Ancestors and ACL rules of resources are loaded in bulk, and results are
+    memoized. So it's intended for a single request and doesn't track ACL
+    changes made after resources have been loaded."""
+
+    def __init__(self, user):
+        self.user = user
+
+        self._parent = dict()
+        self._rules = defaultdict(list)
+        self._principal = dict()
+        self._result = dict()
+
+    def preload(self, resources):
+        """Load ancestors, ACL rules and requirement resources in bulk"""
+
+        if self.user.superuser:
+            return
+
+        resources = [r for r in resources if r.id is not None and r.id not in self._parent]
+        while len(resources) > 0:
+            ids = {r.id for r in resources}
+
+            base = sa.select(Resource.id, Resource.parent_id).where(Resource.id.in_(ids))
+            lineage = base.cte("lineage", recursive=True)
+            lineage = lineage.union(
+                sa.select(Resource.id, Resource.parent_id).join(
+                    lineage, Resource.id == lineage.c.parent_id
+                )
+            )
+
+            # Parent relationships of loaded resources are resolved by the
+            # identity map without additional queries.
+            loaded = DBSession.scalars(
+                sa.select(Resource).where(
+                    Resource.id.in_(sa.select(lineage.c.id)),
+                    Resource.id.not_in(list(self._parent)),
+                )
+            ).all()
+
+            for res in loaded:
+                self._parent[res.id] = res.parent_id
+
+            rules = DBSession.scalars(
+                sa.select(ResourceACLRule)
+                .where(ResourceACLRule.resource_id.in_([r.id for r in loaded]))
+                .options(orm.joinedload(ResourceACLRule.principal))
+            ).all()
+
+            for rule in rules:
+                self._rules[rule.resource_id].append(rule)
+
+            resources = [
+                r
+                for r in _requirement_resources(loaded)
+                if r.id is not None and r.id not in self._parent
+            ]
+
+    def permissions(self, resource):
+        """Set of permissions allowed for the resource"""
+
+        if self.user.superuser:
+            return resource.class_permissions()
+
+        if resource.id is None:
+            return frozenset(resource.permissions(self.user))
+
+        if (result := self._result.get(resource.id)) is None:
+            if resource.id not in self._parent:
+                self.preload((resource,))
+            result = self._result[resource.id] = self._solve(resource)
+
+        return result
+
+    def has_permission(self, resource, permission):
+        return permission in self.permissions(resource)
+
+    def _solve(self, resource):
+        class_permissions = resource.class_permissions()
+
+        allow = set()
+        deny = set()
+        mask = set()
+
+        res_id = resource.id
+        while res_id is not None:
+            for rule in self._rules[res_id]:
+                if (
+                    (rule.propagate or res_id == resource.id)
+                    and rule.cmp_identity(resource.identity)
+                    and self._cmp_user(rule)
+                ):
+                    for perm in class_permissions:
+                        if rule.cmp_permission(perm):
+                            if rule.action == "allow":
+                                allow.add(perm)
+                            elif rule.action == "deny":
+                                deny.add(perm)
+            res_id = self._parent[res_id]
+
+        for req in resource.class_requirements():
+            if req.attr is None:
+                has_req = req.src in allow and req.src not in deny and req.src not in mask
+            else:
+                attrval = getattr(resource, req.attr)
+
+                if attrval is None:
+                    has_req = req.attr_empty is True
+                else:
+                    has_req = self.has_permission(attrval, req.src)
+
+            if not has_req:
+                mask.add(req.dst)
+
+        return frozenset(allow - mask - deny)
+
+    def _cmp_user(self, rule):
+        if (result := self._principal.get(rule.principal_id)) is None:
+            result = self._principal[rule.principal_id] = rule.cmp_user(self.user)
+        return result
+
+
+def _requirement_resources(resources):
+    # Relationships of requirements are loaded by classes with selectinload,
+    # which also loads columns of resource subclasses.
+    by_cls = defaultdict(list)
+    for res in resources:
+        by_cls[type(res)].append(res)
+
+    result = []
+    for cls, items in by_cls.items():
+        mapper = sa.inspect(cls)
+        attrs = {
+            req.attr
+            for req in cls.class_requirements()
+            if req.attr is not None and req.attr != "parent"
+        }
+
+        relationships = [a for a in attrs if a in mapper.relationships]
+        if len(relationships) > 0:
+            DBSession.scalars(
+                sa.select(cls)
+                .where(cls.id.in_([r.id for r in items]))
+                .options(*(orm.selectinload(getattr(cls, a)) for a in relationships))
+            ).all()
+
+        for res in items:
+            for attr in attrs:
+                if (attrval := getattr(res, attr)) is not None:
+                    result.append(attrval)
+
+    return result
+
+
+def read_filter(user):
+    """SQL expression filtering resources readable by the user
+
+    It's equivalent to ResourceScope.read evaluation with PermissionResolver.
+    As resource read permission requires parent read permission, the resource
+    tree is walked from the root down to readable resources only, carrying
+    propagated ACL rules as arrays of "action:identity" strings."""
+
+    if user.superuser:
+        return sa.true()
+
+    # Matching users against principals involves special users and groups,
+    # so it's done in Python once per principal.
+    principal_ids = [
+        rule.principal_id
+        for rule in DBSession.scalars(
+            sa.select(ResourceACLRule)
+            .distinct(ResourceACLRule.principal_id)
+            .options(orm.joinedload(ResourceACLRule.principal))
+        )
+        if rule.cmp_user(user)
+    ]
+
+    permission = ResourceScope.read
+    rule_key = ResourceACLRule.action + ":" + ResourceACLRule.identity
+    acl = (
+        sa.select(
+            ResourceACLRule.resource_id,
+            sa.func.array_agg(rule_key).label("own"),
+            sa.func.array_agg(rule_key).filter(ResourceACLRule.propagate).label("propagated"),
+        )
+        .where(
+            ResourceACLRule.principal_id.in_(principal_ids),
+            sa.or_(
+                sa.and_(ResourceACLRule.scope == "", ResourceACLRule.permission == ""),
+                sa.and_(
+                    ResourceACLRule.scope == permission.scope.identity,
+                    ResourceACLRule.permission.in_(("", permission.name)),
+                ),
+            ),
+        )
+        .group_by(ResourceACLRule.resource_id)
+        .cte("acl")
+    )
+
+    def _cat(a, b):
+        if a is None:
+            return sa.type_coerce(b, sa_pg.ARRAY(sa.Unicode))
+        return sa.func.array_cat(a, b, type_=sa_pg.ARRAY(sa.Unicode))
+
+    def _readable(rules):
+        def _match(action):
+            keys = sa_pg.array((sa.literal(action + ":"), sa.literal(action + ":") + Resource.cls))
+            return sa.func.coalesce(rules.overlap(keys), False)
+
+        return sa.and_(_match("allow"), sa.not_(_match("deny")))
+
+    walk = (
+        sa.select(
+            Resource.id,
+            _readable(_cat(None, acl.c.own)).label("readable"),
+            _cat(None, acl.c.propagated).label("inherited"),
+        )
+        .outerjoin(acl, acl.c.resource_id == Resource.id)
+        .where(Resource.parent_id.is_(None))
+        .cte("walk", recursive=True)
+    )
+
+    walk = walk.union_all(
+        sa.select(
+            Resource.id,
+            _readable(_cat(walk.c.inherited, acl.c.own)),
+            _cat(walk.c.inherited, acl.c.propagated),
+        )
+        .join(walk, Resource.parent_id == walk.c.id)
+        .outerjoin(acl, acl.c.resource_id == Resource.id)
+        .where(walk.c.readable)
+    )
+
+    return Resource.id.in_(sa.select(walk.c.id).where(walk.c.readable))
@@ -1,7 +1,7 @@
 from __future__ import annotations
 
 import re
-from typing import Any, ClassVar, Literal, cast, get_type_hints
+from typing import TYPE_CHECKING, Any, ClassVar, Literal, cast, get_type_hints
 from warnings import warn
 
 from msgspec import UNSET, Struct, UnsetType, defstruct
@@ -17,6 +17,9 @@ from .exception import AttributeUpdateForbidden
 from .permission import Permission
 from .scope import ResourceScope
 
+if TYPE_CHECKING:
+    from .presolver import PermissionCache
+
 
 class CRUTypes(Struct, frozen=True):
     create: Any
@@ -64,10 +67,18 @@ class Serializer[R: model.Resource]:
         cls.proptab = tuple(proptab)
         cls.create = create
 
-    def __init__(self, obj: R, user: User, data: Any = None) -> None:
+    def __init__(
+        self,
+        obj: R,
+        user: User,
+        data: Any = None,
+        *,
+        pcache: PermissionCache | None = None,
+    ) -> None:
         self.obj = obj
         self.user = user
         self.data = dict() if data is None else data
+        self.pcache = pcache
 
     @classmethod
     def is_applicable(cls, obj: model.Resource) -> bool:
@@ -89,6 +100,8 @@ class Serializer[R: model.Resource]:
 
     def has_permission(self, perm: Permission) -> bool:
         """Test for permission on attached resource"""
+        if self.pcache is not None:
+            return self.pcache.has_permission(self.obj, perm)
         return self.obj.has_permission(perm, self.user)
 
     @classmethod
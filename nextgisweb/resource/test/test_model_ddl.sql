@@ -36,6 +36,30 @@ CREATE TABLE resource_acl_rule (
 
 COMMENT ON TABLE resource_acl_rule IS 'resource';
 
+/*** Table: resource_effective_permission ***/
+
+CREATE TABLE resource_effective_permission (
+    resource_id integer NOT NULL,
+    principal_id integer NOT NULL,
+    permission character varying NOT NULL,
+    allowed boolean NOT NULL,
+    PRIMARY KEY (resource_id, principal_id, permission),
+    FOREIGN KEY (resource_id) REFERENCES resource (id) ON DELETE CASCADE,
+    FOREIGN KEY (principal_id) REFERENCES auth_principal (id) ON DELETE CASCADE
+);
+
+COMMENT ON TABLE resource_effective_permission IS 'resource';
+
+/*** Table: resource_effective_permission_serial ***/
+
+CREATE TABLE resource_effective_permission_serial (
+    id integer NOT NULL,
+    value bigint NOT NULL,
+    PRIMARY KEY (id)
+);
+
+COMMENT ON TABLE resource_effective_permission_serial IS 'resource';
+
 /*** Table: resource_favorite ***/
 
 CREATE TABLE resource_favorite (
@@ -8,8 +8,9 @@ from nextgisweb.env import DBSession
 from nextgisweb.auth import Group, User
 from nextgisweb.pyramid.test import WebTestApp
 
+from ..effective import ResourceEffectivePermission, effective_permissions
 from ..model import Resource, ResourceACLRule, ResourceGroup
-from ..presolver import PermissionResolver
+from ..presolver import PermissionCache, PermissionResolver, read_filter
 from ..scope import ResourceScope
 from . import ResourceAPI
 
@@ -58,6 +59,10 @@ def test_change_owner(ngw_resource_group_sub, user_id):
             lambda r, u: {p for p, v in PermissionResolver(r, u)._result.items() if v is True},
             id="presolver",
         ),
+        pytest.param(
+            lambda r, u: DBSession.flush() or set(PermissionCache(u).permissions(r)),
+            id="pcache",
+        ),
     ),
 )
 @pytest.mark.usefixtures("ngw_txn")
@@ -144,6 +149,35 @@ def test_permission_requirement(resolve):
     assert resolve(sg, guest) == set()
 
 
+def test_effective_permissions(ngw_resource_group_sub, user_id):
+    EP = ResourceEffectivePermission
+
+    def stored(resource, user):
+        return EP.filter_by(resource_id=resource.id, principal_id=user.id).count()
+
+    with transaction.manager:
+        res = Resource.filter_by(id=ngw_resource_group_sub).one()
+        user = User.filter_by(id=user_id).one()
+        assert ResourceScope.read not in effective_permissions(res, user)
+        assert stored(res, user) == len(res.class_permissions())
+
+    with transaction.manager:
+        ResourceACLRule(
+            resource_id=ngw_resource_group_sub,
+            principal_id=user_id,
+            identity="",
+            scope=ResourceScope.identity,
+            permission="read",
+            action="allow",
+        ).persist()
+
+    with transaction.manager:
+        res = Resource.filter_by(id=ngw_resource_group_sub).one()
+        user = User.filter_by(id=user_id).one()
+        assert stored(res, user) == 0
+        assert ResourceScope.read in effective_permissions(res, user)
+
+
 @pytest.fixture
 def admin():
     with transaction.manager:
@@ -225,3 +259,52 @@ def test_create(
         {"resource": {"parent": {"id": ngw_resource_group_sub}}},
         status=403,
     )
+
+
+@pytest.mark.usefixtures("ngw_txn")
+def test_read_filter(ngw_resource_group):
+    administrator = User.filter_by(keyname="administrator").one()
+    everyone = User.filter_by(keyname="everyone").one()
+    guest = User.filter_by(keyname="guest").one()
+    user = User.test_instance().persist()
+
+    def allow_read(res, principal, **kwargs):
+        res.acl.append(
+            ResourceACLRule(
+                action=kwargs.pop("action", "allow"),
+                principal=principal,
+                scope="resource",
+                permission="read",
+                **kwargs,
+            )
+        )
+
+    for res_id in (0, ngw_resource_group):
+        allow_read(Resource.filter_by(id=res_id).one(), everyone, propagate=False)
+
+    def group(parent, display_name):
+        return ResourceGroup(
+            parent=parent,
+            display_name=display_name,
+            owner_user=administrator,
+        ).persist()
+
+    rg = group(Resource.filter_by(id=ngw_resource_group).one(), "Test read filter")
+    allow_read(rg, everyone)
+
+    denied = group(rg, "Denied")
+    allow_read(denied, guest, action="deny", propagate=False)
+    group(denied, "Child of denied")
+
+    other = group(rg, "Other identity")
+    allow_read(other, guest, action="deny", identity="webmap")
+    allow_read(group(other, "Private"), user, action="deny", identity="resource_group")
+
+    DBSession.flush()
+
+    for u in (administrator, guest, user):
+        pcache = PermissionCache(u)
+        expected = {r.id for r in Resource.query() if pcache.has_permission(r, ResourceScope.read)}
+        assert rg.id in expected
+        query = sql.select(Resource.id).where(read_filter(u))
+        assert set(DBSession.scalars(query)) == expected
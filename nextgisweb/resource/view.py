@@ -19,11 +19,13 @@ from nextgisweb.pyramid.breadcrumb import Breadcrumb
 from nextgisweb.pyramid.tomb import Request
 from nextgisweb.resource.component import ResourceComponent
 
+from .effective import effective_permissions
 from .exception import ResourceNotFound
 from .extaccess import ExternalAccessLink
 from .interface import IResourceBase
 from .model import Resource, ResourceID, resource_registry
 from .permission import Scope
+from .presolver import PermissionCache
 from .psection import PageSections
 from .scope import ResourceScope
 
@@ -280,7 +282,7 @@ def setup_pyramid(comp: ResourceComponent, config):
         if resource is None:
             resource = request.context
 
-        if not resource.has_permission(permission, request.user):
+        if permission not in effective_permissions(resource, request.user):
             raise InsufficientPermissions(
                 message=gettext("Insufficient '%s' permission in scope '%s' on resource id = %d.")
                 % (permission.name, permission.scope.identity, resource.id),
@@ -293,6 +295,12 @@ def setup_pyramid(comp: ResourceComponent, config):
 
     config.add_request_method(resource_permission, "resource_permission")
 
+    config.add_request_method(
+        lambda req: PermissionCache(req.user),
+        "permission_cache",
+        reify=True,
+    )
+
     def _route(route_name, route_path, **kwargs):
         return config.add_route(
             "resource." + route_name,
@@ -1,7 +1,11 @@
+import os.path
 from datetime import timedelta
 
 from nextgisweb.env import Component, require
-from nextgisweb.lib.config import Option
+from nextgisweb.lib.config import Option, SizeInBytes
+from nextgisweb.lib.httpcache import HTTPCache
+
+from nextgisweb.core import CoreComponent
 
 
 class TMSClientComponent(Component):
@@ -10,6 +14,16 @@ class TMSClientComponent(Component):
 
         self.headers = {"User-Agent": self.options["user_agent"]}
 
+        core = self.env.component(CoreComponent)
+        self.http_cache = (
+            HTTPCache(
+                os.path.join(core.gtsdir(self), "http_cache.sqlite"),
+                self.options["http_cache.max_size"],
+            )
+            if self.options["http_cache.enabled"]
+            else None
+        )
+
     @require("resource")
     def setup_pyramid(self, config):
         from . import api, view
@@ -17,11 +31,18 @@ class TMSClientComponent(Component):
         api.setup_pyramid(self, config)
         view.setup_pyramid(self, config)
 
+    def maintenance(self):
+        if self.http_cache is not None:
+            self.http_cache.evict()
+
     # fmt: off
     option_annotations = (
         Option("nextgis_geoservices.layers", default="https://geoservices.nextgis.com/config/maps"),
         Option("nextgis_geoservices.url_template", default="https://geoservices.nextgis.com/raster/{layer}/{z}/{x}/{y}.png"),
         Option("user_agent", default="NextGIS Web"),
         Option("timeout", timedelta, default=timedelta(seconds=15)),
+        Option("http_cache.enabled", bool, default=True, doc="Cache tiles according to HTTP caching headers."),
+        Option("http_cache.max_size", SizeInBytes, default=2**30, doc="Tile cache size limit."),
+        Option("host_concurrency", int, default=8, doc="Maximum number of concurrent requests to a single host."),
     )
     # fmt: on
@@ -16,7 +16,7 @@ from nextgisweb.lib.osrhelper import sr_from_epsg
 
 from nextgisweb.core.exception import ExternalServiceError, ValidationError
 from nextgisweb.layer import IBboxLayer, SpatialLayerMixin
-from nextgisweb.render import IExtentRenderRequest, IRenderableStyle, ITileRenderRequest
+from nextgisweb.render import IExtentRenderRequest, IMetatileRenderRequest, IRenderableStyle
 from nextgisweb.resource import (
     ConnectionScope,
     CRUTypes,
@@ -138,7 +138,7 @@ class TMSConnectionSerializer(Serializer, resource=TMSConnection):
     capmode = CapmodeAttr(read=ConnectionScope.read, write=ConnectionScope.write)
 
 
-@implementer(IExtentRenderRequest, ITileRenderRequest)
+@implementer(IExtentRenderRequest, IMetatileRenderRequest)
 class RenderRequest:
     def __init__(self, style, srs, cond):
         self.style = style
@@ -157,6 +157,17 @@ class RenderRequest:
         extent = self.srs.tile_extent(tile)
         return self.style.render_image(extent, (size, size), self.srs, zoom)
 
+    def render_metatile(self, mrange, size):
+        zoom, xmin, ymin, xmax, ymax = mrange
+        if zoom < self.style.minzoom or zoom > self.style.maxzoom:
+            raise ValidationError(message=gettext("Zoom is out of range."))
+        extent = (
+            self.srs.tile_extent((zoom, xmin, ymax))[0:2]
+            + self.srs.tile_extent((zoom, xmax, ymin))[2:4]
+        )
+        msize = ((xmax - xmin + 1) * size, (ymax - ymin + 1) * size)
+        return self.style.render_image(extent, msize, self.srs, zoom)
+
 
 @implementer(IRenderableStyle, IBboxLayer)
 class TMSLayer(Resource, SpatialLayerMixin):
@@ -90,12 +90,12 @@ def test_connection_referer(referer, ngw_resource_defaults):
 
     captured = {}
 
-    def fake_put(data):
+    def fake_submit(data):
         captured.update(data.get("req_kw", {}))
         data["answer"].put_nowait(FetchResult(FetchStatus.DONE))
 
     fetcher = TileFetcher.instance()
-    with patch.object(fetcher._queue, "put_nowait", side_effect=fake_put):
+    with patch.object(fetcher, "_submit", side_effect=fake_submit):
         list(conn.get_tiles(None, 0, 0, 0, 0, 0))
 
     actual = captured.get("headers", {}).get("Referer")
@@ -1,3 +1,6 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from secrets import token_hex
 from unittest.mock import patch
 
 import httpx2
@@ -6,7 +9,9 @@ import transaction
 
 from nextgisweb.core.exception import ExternalServiceError
 
+from ..component import TMSClientComponent
 from ..model import TMSConnection
+from ..tile_fetcher import TileFetcher
 from ..tile_fetcher import TimeoutError as FetcherTimeoutError
 
 pytestmark = pytest.mark.usefixtures("ngw_resource_defaults", "ngw_auth_administrator")
@@ -34,3 +39,63 @@ def test_httpx_exception_mapped(exc_class, mapped_to):
     with patch.object(httpx2.AsyncClient, "get", fail):
         with pytest.raises(mapped_to):
             list(conn.get_tiles("ngw", 0, 0, 0, 0, 0))
+
+
+def test_concurrent_jobs():
+    with transaction.manager:
+        conn = TMSConnection(
+            url_template="http://concurrent.test/{z}/{x}/{y}",
+        ).persist()
+
+    urls, active = [], [0, 0]
+
+    async def fake_get(self, url, **kwargs):
+        urls.append(url)
+        active[0] += 1
+        active[1] = max(active[1], active[0])
+        await asyncio.sleep(0.5)
+        active[0] -= 1
+        return httpx2.Response(200, content=url.encode("utf-8"))
+
+    fetcher = TileFetcher.instance()
+    deduplicated = fetcher.stats().deduplicated
+
+    def get_tiles(_):
+        return dict(conn.get_tiles("ngw", 4, 0, 3, 0, 3))
+
+    with patch.object(httpx2.AsyncClient, "get", fake_get):
+        with ThreadPoolExecutor(4) as executor:
+            results = list(executor.map(get_tiles, range(4)))
+
+    assert all(r == results[0] for r in results)
+    assert len(results[0]) == 16
+
+    # Each tile is requested once as requests are shared between jobs
+    assert len(urls) == len(set(urls)) == 16
+    assert fetcher.stats().deduplicated - deduplicated == 16 * 3
+    assert active[1] <= TMSClientComponent.current().options["host_concurrency"]
+
+
+def test_http_cache():
+    with transaction.manager:
+        conn = TMSConnection(
+            url_template=f"http://{token_hex(4)}.test/{{z}}/{{x}}/{{y}}",
+        ).persist()
+
+    requests = []
+
+    async def fake_get(self, url, **kwargs):
+        requests.append(kwargs["headers"])
+        if kwargs["headers"].get("If-None-Match") == '"v1"':
+            return httpx2.Response(304, headers={"Cache-Control": "max-age=60"})
+        return httpx2.Response(200, headers={"ETag": '"v1"'}, content=b"tile")
+
+    with patch.object(httpx2.AsyncClient, "get", fake_get):
+        # Stored with the validator and revalidated
+        assert dict(conn.get_tiles("ngw", 0, 0, 0, 0, 0)) == {(0, 0): b"tile"}
+        assert dict(conn.get_tiles("ngw", 0, 0, 0, 0, 0)) == {(0, 0): b"tile"}
+        assert requests[1]["If-None-Match"] == '"v1"'
+
+        # Fresh after revalidation
+        assert dict(conn.get_tiles("ngw", 0, 0, 0, 0, 0)) == {(0, 0): b"tile"}
+        assert len(requests) == 2
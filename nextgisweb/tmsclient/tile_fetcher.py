@@ -3,11 +3,14 @@ import atexit
 from dataclasses import dataclass
 from queue import Empty, Queue
 from ssl import SSLCertVerificationError
-from threading import Thread
+from threading import Lock, Thread
+from time import monotonic
+from urllib.parse import urlsplit
 
 from httpx2 import AsyncClient, Limits, Timeout, TimeoutException, TransportError
 
 from nextgisweb.env import gettext
+from nextgisweb.lib.httpcache import cache_key
 from nextgisweb.lib.logging import logger
 
 from nextgisweb.core.exception import ExternalServiceError
@@ -33,22 +36,52 @@ class FetchResult:
     exception: Exception | None = None
 
 
+@dataclass
+class FetchStats:
+    requests: int = 0
+    deduplicated: int = 0
+    cached: int = 0
+    errors: int = 0
+    latency_total: float = 0
+    latency_max: float = 0
+
+
 class TimeoutError(ExternalServiceError):
     message = gettext("The remote server did not respond in time.")
 
 
 class TileFetcher:
+    """Fetcher of tiles from remote servers
+
+    Requests are made from a single asyncio loop running in a separate thread,
+    which processes jobs from any number of threads concurrently. Requests
+    to the same host are limited in number, and in-flight requests for the
+    same URL are shared between jobs. Responses are stored in the HTTP cache
+    if it's enabled."""
+
     __instance = None
 
     def __init__(self):
         from .component import TMSClientComponent
 
         if TileFetcher.__instance is None:
-            self._request_timeout = TMSClientComponent.current().options["timeout"].total_seconds()
+            comp = TMSClientComponent.current()
+            self._request_timeout = comp.options["timeout"].total_seconds()
             self._session_timeout = self._request_timeout * 2
+            self._host_concurrency = comp.options["host_concurrency"]
+            self._http_cache = comp.http_cache
 
-            self._queue = Queue(maxsize=1)
             self._loop = asyncio.new_event_loop()
+            self._ready = asyncio.Event()
+            self._shutdown = asyncio.Event()
+
+            # Accessed from the loop thread only
+            self._clients = dict()
+            self._host_semaphores = dict()
+            self._inflight = dict()
+
+            self._stats = FetchStats()
+            self._stats_lock = Lock()
 
             self._worker = Thread(target=self._job, daemon=True)
             self._worker.start()
@@ -59,11 +92,112 @@ class TileFetcher:
             cls.__instance = TileFetcher()
         return cls.__instance
 
+    def stats(self) -> FetchStats:
+        """Counters of upstream requests made since the process start"""
+        with self._stats_lock:
+            return FetchStats(**self._stats.__dict__)
+
+    def _account(self, *, latency=None, deduplicated=False, cached=False, error=False):
+        with self._stats_lock:
+            stats = self._stats
+            if deduplicated:
+                stats.deduplicated += 1
+            if cached:
+                stats.cached += 1
+            if latency is not None:
+                stats.requests += 1
+                stats.latency_total += latency
+                stats.latency_max = max(stats.latency_max, latency)
+            if error:
+                stats.errors += 1
+
+    async def _request(self, client, url, params, req_kw):
+        # SQLite operations are blocking, so they are run in separate threads
+        http_cache = self._http_cache
+        if http_cache is not None:
+            key = cache_key(url, params, identity=(req_kw["auth"], req_kw["headers"]))
+            if (entry := await asyncio.to_thread(http_cache.get, key)) is not None:
+                if entry.fresh:
+                    self._account(cached=True)
+                    return self._response_data(entry.status, entry.content)
+                req_kw = dict(req_kw, headers={**req_kw["headers"], **entry.validators()})
+
+        host = urlsplit(url).netloc
+        if (semaphore := self._host_semaphores.get(host)) is None:
+            semaphore = self._host_semaphores[host] = asyncio.Semaphore(self._host_concurrency)
+
+        async with semaphore:
+            started = monotonic()
+            try:
+                response = await client.get(url, params=params, **req_kw)
+            except TimeoutException as exc:
+                self._account(latency=monotonic() - started, error=True)
+                raise TimeoutError from exc
+            except (TransportError, SSLCertVerificationError) as exc:
+                self._account(latency=monotonic() - started, error=True)
+                logger.error("TMS service error: %s: %s", type(exc).__name__, exc)
+                raise ExternalServiceError(
+                    gettext("Unable to get a response from the remote server."),
+                ) from exc
+
+        status = response.status_code
+        self._account(latency=monotonic() - started, error=status not in (200, 204, 304, 404))
+
+        if http_cache is not None:
+            if status == 304 and entry is not None:
+                await asyncio.to_thread(http_cache.refresh, key, response.headers)
+                self._account(cached=True)
+                return self._response_data(entry.status, entry.content)
+            await asyncio.to_thread(
+                http_cache.put, key, status, response.headers, response.content
+            )
+
+        return self._response_data(status, response.content)
+
+    def _response_data(self, status, content):
+        if status == 200:
+            return content
+        elif status in (204, 404):
+            return None
+        else:
+            raise ExternalServiceError(
+                gettext("An unexpected HTTP status code was received from the remote server."),
+                data=dict(status_code=status),
+            )
+
+    async def _fetch(self, insecure, url, params, req_kw):
+        auth, headers = req_kw["auth"], req_kw["headers"]
+        key = (
+            insecure,
+            url,
+            tuple(sorted(params.items())),
+            auth,
+            tuple(sorted(headers.items())),
+        )
+
+        if (task := self._inflight.get(key)) is not None:
+            self._account(deduplicated=True)
+        else:
+            client = self._clients[insecure]
+            task = asyncio.create_task(self._request(client, url, params, req_kw))
+            self._inflight[key] = task
+
+            def _done(task):
+                del self._inflight[key]
+                if not task.cancelled():
+                    # Mark the exception as retrieved if no one awaits it
+                    task.exception()
+
+            task.add_done_callback(_done)
+
+        # Cancellation of one job doesn't affect others sharing the request
+        return await asyncio.shield(task)
+
     async def _get_tiles(
         self,
-        tasks,
-        client,
+        answer,
         *,
+        insecure,
         req_kw,
         scheme,
         url_template,
@@ -74,47 +208,39 @@ class TileFetcher:
         ymin,
         ymax,
     ):
+        await self._ready.wait()
+
         async def _get_tile(position, xtile, ytile):
             if scheme == SCHEME.TMS:
                 ytile = toggle_tms_xyz_y(zoom, ytile)
 
             url = url_template.format(x=xtile, y=ytile, z=zoom, q=quad_key(xtile, ytile, zoom))
             url, add_query = split_url_query(url)
-            query.update(add_query)
+            params = dict(query, **add_query)
 
-            try:
-                response = await client.get(url, params=query, **req_kw)
-            except TimeoutException as exc:
-                raise TimeoutError from exc
-            except (TransportError, SSLCertVerificationError) as exc:
-                logger.error("TMS service error: %s: %s", type(exc).__name__, exc)
-                raise ExternalServiceError(
-                    gettext("Unable to get a response from the remote server."),
-                ) from exc
-            if response.status_code == 200:
-                data = response.content
-            elif response.status_code in (204, 404):
-                data = None
-            else:
-                raise ExternalServiceError(
-                    gettext("An unexpected HTTP status code was received from the remote server."),
-                    data=dict(status_code=response.status_code),
-                )
-
-            return position, data
+            return position, await self._fetch(insecure, url, params, req_kw)
 
+        tasks = []
         for x, xtile in enumerate(range(xmin, xmax + 1)):
             for y, ytile in enumerate(range(ymin, ymax + 1)):
                 coro = _get_tile((x, y), xtile, ytile)
                 tasks.append(asyncio.create_task(coro))
 
-        for coro in asyncio.as_completed(tasks):
-            yield await coro
+        try:
+            for coro in asyncio.as_completed(tasks):
+                pos, data = await coro
+                answer.put_nowait(FetchResult(FetchStatus.DATA, position=pos, data=data))
+        except Exception as exc:
+            answer.put_nowait(FetchResult(FetchStatus.ERROR, exception=exc))
+        else:
+            answer.put_nowait(FetchResult(FetchStatus.DONE))
+        finally:
+            for task in tasks:
+                task.cancel()
 
     async def _ajob(self):
         from .component import TMSClientComponent
 
-        self._shutdown = False
         atexit.register(self._wait_for_shutdown)
 
         def _client_factory(*, verify: bool) -> AsyncClient:
@@ -129,32 +255,18 @@ class TileFetcher:
             _client_factory(verify=True) as client,
             _client_factory(verify=False) as client_insecure,
         ):
-            while True:
-                if self._shutdown:
-                    break
-
-                try:
-                    get_timeout = SHUTDOWN_TIMEOUT / 5
-                    data = self._queue.get(True, get_timeout)
-                except Empty:
-                    continue
-
-                answer = data.pop("answer")
-                _client = client_insecure if data.pop("insecure") else client
-                tasks = []
-                try:
-                    async for pos, data in self._get_tiles(tasks, _client, **data):
-                        answer.put_nowait(FetchResult(FetchStatus.DATA, position=pos, data=data))
-                except Exception as exc:
-                    answer.put_nowait(FetchResult(FetchStatus.ERROR, exception=exc))
-                    for task in tasks:
-                        task.cancel()
-                else:
-                    answer.put_nowait(FetchResult(FetchStatus.DONE))
+            self._clients[False] = client
+            self._clients[True] = client_insecure
+            self._ready.set()
+            await self._shutdown.wait()
 
     def _job(self):
         self._loop.run_until_complete(self._ajob())
 
+    def _submit(self, data):
+        answer = data.pop("answer")
+        return asyncio.run_coroutine_threadsafe(self._get_tiles(answer, **data), self._loop)
+
     def get_tiles(self, connection, layer_name, zoom, xmin, xmax, ymin, ymax):
         url_template = connection.url_template
         if r"{layer}" in url_template:
@@ -177,23 +289,26 @@ class TileFetcher:
         )
         answer = data["answer"] = Queue()
 
-        self._queue.put_nowait(data)
+        future = self._submit(data)
+        try:
+            while True:
+                try:
+                    result = answer.get(True, self._session_timeout)
+                except Empty:
+                    raise TimeoutError
 
-        while True:
-            try:
-                result = answer.get(True, self._session_timeout)
-            except Empty:
-                with self._queue.mutex:
-                    self._queue.queue.clear()
-                raise TimeoutError
-
-            if result.status == FetchStatus.DONE:
-                break
-            if result.status == FetchStatus.ERROR:
-                raise result.exception
-            yield result.position, result.data
+                if result.status == FetchStatus.DONE:
+                    break
+                if result.status == FetchStatus.ERROR:
+                    raise result.exception
+                yield result.position, result.data
+        finally:
+            # Stop fetching remaining tiles on errors or if the consumer
+            # doesn't need them anymore
+            if future is not None:
+                future.cancel()
 
     def _wait_for_shutdown(self):
-        self._shutdown = True
+        self._loop.call_soon_threadsafe(self._shutdown.set)
         self._worker.join(SHUTDOWN_TIMEOUT)
         self._loop.close()
@@ -12,19 +12,26 @@ from nextgisweb.lib.geometry import Geometry
 from nextgisweb.feature_layer import (
     GEOM_TYPE,
     Feature,
+    FeatureLayerComponent,
+    FeatureQueryGMLMixin,
     FeatureQueryIntersectsMixin,
+    FeatureQuerySeekMixin,
     FeatureSet,
     IAggregatableFeatureQuery,
     IFeatureQuery,
     IFeatureQueryClipByBox,
     IFeatureQueryFilter,
     IFeatureQueryFilterBy,
+    IFeatureQueryGML,
     IFeatureQueryIlike,
     IFeatureQueryIntersects,
     IFeatureQueryLike,
+    IFeatureQueryMVT,
     IFeatureQueryOrderBy,
+    IFeatureQuerySeek,
     IFeatureQuerySimplify,
 )
+from nextgisweb.feature_layer.mvt import mvt_query
 from nextgisweb.spatial_ref_sys import SRS
 
 from . import aggregation
@@ -38,11 +45,14 @@ from . import aggregation
     IFeatureQueryIlike,
     IFeatureQueryIntersects,
     IFeatureQueryOrderBy,
+    IFeatureQuerySeek,
     IFeatureQueryClipByBox,
     IFeatureQuerySimplify,
+    IFeatureQueryMVT,
+    IFeatureQueryGML,
     IAggregatableFeatureQuery,
 )
-class FeatureQueryBase(FeatureQueryIntersectsMixin):
+class FeatureQueryBase(FeatureQueryIntersectsMixin, FeatureQuerySeekMixin, FeatureQueryGMLMixin):
     def __init__(self):
         super().__init__()
 
@@ -235,6 +245,31 @@ class FeatureQueryBase(FeatureQueryIntersectsMixin):
 
         return vls, table, columns_mapping, where
 
+    def mvt(self, bounds, *, name, extent, buffer, simplify=None):
+        vls, table, columns_mapping, where = self.build_query_context()
+
+        fields = [
+            (fld.keyname, table.fields[fld.keyname], fld.datatype)
+            for fld in self.layer.fields
+            if self._fields is None or fld.keyname in self._fields
+        ]
+
+        query = mvt_query(
+            table.columns.fid,
+            table.columns.geom,
+            self.layer.srs_id,
+            fields,
+            where,
+            bounds=bounds,
+            name=name,
+            extent=extent,
+            buffer=buffer,
+            simplify=simplify,
+        )
+
+        data = DBSession.scalar(query)
+        return bytes(data) if data else b""
+
     def __call__(self):
         vls, table, columns_mapping, where = self.build_query_context()
 
@@ -277,16 +312,20 @@ class FeatureQueryBase(FeatureQueryIntersectsMixin):
                 )
 
             if self._geom:
-                geomexpr = (
-                    func.st_asbinary(geomexpr, "NDR")
-                    if self._geom_format == "WKB"
-                    else func.st_astext(geomexpr)
-                )
+                if self._gml is not None:
+                    geomexpr = self.gml_expr(geomexpr, idcol)
+                elif self._geom_format == "WKB":
+                    geomexpr = func.st_asbinary(geomexpr, "NDR")
+                else:
+                    geomexpr = func.st_astext(geomexpr)
                 columns.append(geomexpr.label("geom"))
 
+        # Ordering fields are always selected to get a seek key from features
+        order_fields = [fld_k for _, fld_k in self._order_by or ()]
+
         selected_fields = []
         for idx, (fld_k, fld_c) in enumerate(fields.items(), start=1):
-            if self._fields is None or fld_k in self._fields:
+            if self._fields is None or fld_k in self._fields or fld_k in order_fields:
                 label = f"fld_{idx}"
                 columns.append(fld_c.label(label))
                 selected_fields.append((fld_k, label))
@@ -297,6 +336,11 @@ class FeatureQueryBase(FeatureQueryIntersectsMixin):
                 order_by.append(getattr(fields[fld_k], order)())
         order_by.append(idcol.asc())
 
+        seek_where = []
+        if self._seek is not None:
+            keys = [(fields[fld_k], order) for order, fld_k in self._order_by or ()]
+            seek_where.append(self.seek_clause(keys + [(idcol, "asc")]))
+
         qbase = select(idcol)
         if (vid_col := table.c.get("vid")) is not None:
             qbase = qbase.add_columns(vid_col)
@@ -315,22 +359,26 @@ class FeatureQueryBase(FeatureQueryIntersectsMixin):
             columns_mapping = columns_mapping_ref
 
             _geom = self._geom and has_geom
-            _geom_format = self._geom_format
+            _geom_format = "GML" if self._gml is not None else self._geom_format
             _box = self._box and has_geom
             _limit = self._limit
             _offset = self._offset
 
             def __iter__(self):
-                query = qbase.where(*where).order_by(*order_by)
+                query = qbase.where(*where, *seek_where).order_by(*order_by)
                 query = query.limit(self._limit).offset(self._offset)
 
-                result = DBSession.execute(query)
+                comp = FeatureLayerComponent.current()
+                options = comp.query_execution_options(self._limit)
+                result = DBSession.execute(query, execution_options=options)
                 for row in result.mappings():
                     fdict = {keyname: row[label] for keyname, label in selected_fields}
 
                     if self._geom:
                         if (geom_data := row.geom) is None:
                             geom = None
+                        elif self._geom_format == "GML":
+                            geom = geom_data
                         elif self._geom_format == "WKB":
                             # TODO: bytes(...) can be removed after psycopg3 upgrade
                             geom = Geometry.from_wkb(bytes(geom_data), validate=False)
@@ -30,6 +30,8 @@ from nextgisweb.feature_layer import (
     IGeometryEditableFeatureLayer,
     IWritableFeatureLayer,
     LayerField,
+    mvt_cache_invalidate,
+    mvt_cache_invalidate_all,
 )
 from nextgisweb.feature_layer.exception import FeatureNotFound, RestoreNotDeleted
 from nextgisweb.feature_layer.versioning import (
@@ -371,6 +373,7 @@ class VectorLayer(Resource, FeatureLayerMixin, FVersioningMixin):
 
     # IWritableFeatureLayer
 
+    @mvt_cache_invalidate
     @vlschema_autoflush
     @fversioning_guard
     def feature_create(self, feature, with_fid=False):
@@ -402,6 +405,7 @@ class VectorLayer(Resource, FeatureLayerMixin, FVersioningMixin):
         mark_changed(session)
         return fid
 
+    @mvt_cache_invalidate
     @vlschema_autoflush
     @fversioning_guard
     def feature_put(self, feature):
@@ -436,6 +440,7 @@ class VectorLayer(Resource, FeatureLayerMixin, FVersioningMixin):
 
         return False
 
+    @mvt_cache_invalidate
     @vlschema_autoflush
     @fversioning_guard
     def feature_delete(self, feature_id):
@@ -455,6 +460,7 @@ class VectorLayer(Resource, FeatureLayerMixin, FVersioningMixin):
             raise FeatureNotFound(self.id, feature_id)
         mark_changed(session)
 
+    @mvt_cache_invalidate
     @vlschema_autoflush
     @fversioning_guard
     def feature_restore(self, feature):
@@ -488,6 +494,7 @@ class VectorLayer(Resource, FeatureLayerMixin, FVersioningMixin):
         else:
             raise RestoreNotDeleted(self.id, feature.id)
 
+    @mvt_cache_invalidate
     @vlschema_autoflush
     @fversioning_guard
     def feature_delete_all(self):
@@ -670,6 +677,7 @@ class VectorLayer(Resource, FeatureLayerMixin, FVersioningMixin):
     # Internals
 
     def _vlschema_wipe(self):
+        mvt_cache_invalidate_all(self)
         self.fields[:] = []
         self.tbl_uuid = uuid_hex()
 
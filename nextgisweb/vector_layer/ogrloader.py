@@ -22,6 +22,7 @@ from nextgisweb.feature_layer import (
     GEOM_TYPE_OGR_2_GEOM_TYPE,
 )
 from nextgisweb.feature_layer.util import unique_name
+from nextgisweb.job import job_progress
 from nextgisweb.spatial_ref_sys import SRS
 
 from .util import FIELD_TYPE_2_ENUM, FIELD_TYPE_SIZE, fix_encoding, utf8len
@@ -494,6 +495,9 @@ class OGRLoader:
         feature_count = 0
         chunk = []
 
+        # Counting may require reading the whole source, so it's skipped
+        total_count = ogrlayer.GetFeatureCount(0)
+
         def insert_feature(data=None, *, flush=False):
             nonlocal feature_count
             if data is not None:
@@ -502,6 +506,7 @@ class OGRLoader:
                 connection.execute(query_insert, chunk)
                 feature_count += len(chunk)
                 chunk.clear()
+                job_progress(feature_count / total_count if total_count > 0 else None)
 
         errors = []
         for ogr_fid, feature in enumerate(ogrlayer, start=1):
@@ -23,7 +23,7 @@ from nextgisweb.pyramid.tomb import Request
 from nextgisweb.render import IRenderableScaleRange
 from nextgisweb.render.legend import ILegendSymbols
 from nextgisweb.render.util import scale_range_intersection
-from nextgisweb.resource import DataScope, ResourceFactory, ResourceRef, ResourceScope
+from nextgisweb.resource import DataScope, Resource, ResourceFactory, ResourceRef, ResourceScope
 
 from .adapter import ImageAdapter, WebMapAdapter
 from .component import WebMapComponent
@@ -560,6 +560,18 @@ def _extent_wsen_from_attrs(obj, prefix) -> ExtentWSEN | None:
     return ExtentWSEN(*parts) if None not in parts else None
 
 
+def _item_styles(item):
+    def _walk(item):
+        if item.item_type == "layer":
+            yield item.layer_style_id
+        else:
+            for child in item.children:
+                yield from _walk(child)
+
+    style_ids = set(_walk(item))
+    return Resource.filter(Resource.id.in_(style_ids)).all() if style_ids else []
+
+
 def display_config(obj, request: Request) -> DisplayConfig:
     """Generate webmap display widget configuration
 
@@ -609,7 +621,7 @@ def display_config(obj, request: Request) -> DisplayConfig:
         if item.item_type == "layer":
             style = item.style
 
-            if not style.has_permission(DataScope.read, request.user):
+            if not pcache.has_permission(style, DataScope.read):
                 # Skip webmap item if there are no necessary permissions, so it
                 # won't be shown in the tree.
                 return None
@@ -700,6 +712,10 @@ def display_config(obj, request: Request) -> DisplayConfig:
 
         return data
 
+    # Resolve permissions of all webmap styles at once
+    pcache = request.permission_cache
+    pcache.preload(_item_styles(obj.root_item))
+
     initial_extent = _extent_wsen_from_attrs(obj, prefix="extent_")
     if initial_extent is None:
         initial_extent = ExtentWSEN(-180, -90, 180, 90)
@@ -1,6 +1,7 @@
 from pyramid.response import Response
 
 from nextgisweb.core.exception import InsufficientPermissions
+from nextgisweb.feature_layer.api import stream_response
 from nextgisweb.pyramid.tomb import Request
 from nextgisweb.resource import ResourceFactory, ServiceScope
 
@@ -32,7 +33,13 @@ def wfs(resource, request: Request):
         request,
         force_schema_validation=fsv,
     ).response()
-    return Response(xml, content_type="text/xml", charset="utf-8")
+    if isinstance(xml, str):
+        return Response(xml, content_type="text/xml", charset="utf-8")
+
+    return stream_response(
+        (chunk.encode("utf-8") for chunk in xml),
+        content_type="text/xml; charset=utf-8",
+    )
 
 
 def error_renderer(request: Request, err_info, exc, exc_info, debug=True):
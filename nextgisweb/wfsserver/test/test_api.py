@@ -61,3 +61,32 @@ def test_api(vector_layer_id, ngw_webtest_app: WebTestApp):
     )
 
     ET.fromstring(resp.text.encode("utf-8"))
+
+    for version, member in (
+        ("1.0.0", "{http://www.opengis.net/gml}featureMember"),
+        ("2.0.2", "{http://www.opengis.net/wfs/2.0}member"),
+    ):
+        resp = ngw_webtest_app.get(
+            rapi.item_url(res_id, "wfs"),
+            query=dict(service="wfs", request="GetFeature", version=version, typenames="points"),
+            status=200,
+        )
+        root = ET.fromstring(resp.body)
+        assert len(root.findall(member)) == 2
+
+    resp = ngw_webtest_app.get(
+        rapi.item_url(res_id, "wfs"),
+        query=dict(
+            service="wfs",
+            request="GetFeature",
+            version="2.0.2",
+            typenames="points",
+            count=1,
+            startindex=1,
+        ),
+        status=200,
+    )
+    root = ET.fromstring(resp.body)
+    assert root.get("numberMatched") == "unknown"
+    assert root.get("numberReturned") == "1"
+    assert len(root.findall("{http://www.opengis.net/wfs/2.0}member")) == 1
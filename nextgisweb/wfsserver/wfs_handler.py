@@ -3,7 +3,9 @@ from contextlib import ExitStack
 from datetime import date, datetime, time
 from os import path
 from tempfile import NamedTemporaryFile
+from xml.sax.saxutils import escape, quoteattr
 
+import shapely
 from lxml import etree, html
 from lxml.builder import ElementMaker
 from msgspec import UNSET, UnsetType
@@ -29,10 +31,11 @@ from nextgisweb.feature_layer import (
     GEOM_TYPE,
     Feature,
     IFeatureLayer,
+    IFeatureQueryGML,
 )
 from nextgisweb.layer import IBboxLayer
 from nextgisweb.pyramid.tomb import Request
-from nextgisweb.resource import DataScope
+from nextgisweb.resource import DataScope, Resource
 from nextgisweb.spatial_ref_sys import SRS
 
 from .model import Layer
@@ -40,6 +43,9 @@ from .util import validate_tag
 
 wfsfld_pattern = re.compile(r"^wfsfld_(\d+)$")
 
+# Control characters which aren't allowed in XML 1.0 documents
+xml_invalid_pattern = re.compile(r"[\x00-\x08\x0b\x0c\x0e-\x1f]")
+
 FIELD_TYPE_2_WFS = {
     FIELD_TYPE.INTEGER: FIELD_TYPE_WFS["XSD_INTEGER"],
     FIELD_TYPE.BIGINT: FIELD_TYPE_WFS["XSD_LONG"],
@@ -61,6 +67,9 @@ VERSION_SUPPORTED = (v100, v110, v200, v202)
 
 VERSION_DEFAULT = v202
 
+# Approximate size of GetFeature response chunks in characters
+STREAM_CHUNK_SIZE = 64 * 1024
+
 XSD_DIR = path.join(path.dirname(path.abspath(__file__)), "test/xsd/")
 
 _nsmap = dict(
@@ -224,6 +233,26 @@ def geom_from_gml(el):
     return geom
 
 
+def extent_bounds(extent, srs):
+    """Convert an extent in EPSG:4326 to bounds in the given SRS
+
+    The extent boundary is densified before transformation, so the bounds
+    contain transformed geometries in most projections."""
+
+    if extent is None or None in extent.values():
+        return None
+
+    bounds = (extent["minLon"], extent["minLat"], extent["maxLon"], extent["maxLat"])
+    if srs.id == 4326:
+        return bounds
+
+    ring = box(*bounds).exterior
+    if (size := max(bounds[2] - bounds[0], bounds[3] - bounds[1])) > 0:
+        ring = shapely.segmentize(ring, size / 16)
+    points = Geometry.from_shape(shapely.MultiPoint(shapely.get_coordinates(ring)), srid=4326)
+    return transform(points, srs).bounds
+
+
 def transform(geom, srs_to):
     try:
         srs_from = SRS.filter_by(id=geom.srid).one()
@@ -333,7 +362,13 @@ class WFSHandler:
         else:
             raise ValidationError("Unsupported request: '%s'." % self.p_request)
 
-        xml = etree.tostring(root, encoding="unicode")
+        if etree.iselement(root):
+            xml = etree.tostring(root, encoding="unicode")
+        elif self.p_validate_schema:
+            xml = "".join(root)
+        else:
+            # GetFeature results are streamed
+            return root
 
         if self.p_validate_schema:
             if self.p_request in (GET_CAPABILITIES, TRANSACTION):
@@ -965,8 +1000,7 @@ class WFSHandler:
             },
         )
 
-        query = feature_layer.feature_query()
-
+        box_geom = None
         if self.p_bbox is not None:
             bbox_param = self.p_bbox.split(",")
             box_coords = map(float, bbox_param[:4])
@@ -988,7 +1022,6 @@ class WFSHandler:
                     box_geom = box_geom.flip_coordinates()
             except GeometryNotValid:
                 raise ValidationError("Paremeter BBOX geometry is not valid.")
-            query.intersects(box_geom)
 
         __filters = []
         if __query is not None:
@@ -996,123 +1029,171 @@ class WFSHandler:
         if self.p_filter is not None:
             __filters.append(etree.fromstring(self.p_filter))
 
+        filter_result = None
         if len(__filters) == 1:
-            result = self._parse_filter(__filters[0], layer)
-            if len(result["fids"]) > 0:
-                query.filter(("id", "in", ",".join(str(fid) for fid in result["fids"])))
-            if result["intersects"] is not None:
-                if self.p_bbox is not None:
-                    raise ValidationError("Parameters conflict: BBOX, Intersects")
-                query.intersects(result["intersects"])
-            if len(result["filter"]) > 0:
-                query.filter(*result["filter"])
+            filter_result = self._parse_filter(__filters[0], layer)
+            if filter_result["intersects"] is not None and self.p_bbox is not None:
+                raise ValidationError("Parameters conflict: BBOX, Intersects")
         elif len(__filters) > 1:
             raise ValidationError("Multiple filters not supported.")
 
         if self.p_propertyname is not None:
             self.p_propertyname = [ns_trim(v) for v in self.p_propertyname.split(",")]
-            query.fields(*self.p_propertyname)
         elif __query is not None:
             __propertynames = find_tags(__query, "PropertyName")
             if len(__propertynames) > 0:
                 self.p_propertyname = [ns_trim(el.text) for el in __propertynames]
-                query.fields(*self.p_propertyname)
 
         limit = int(self.p_count) if self.p_count is not None else layer.maxfeatures
-        if limit is not None:
-            offset = 0 if self.p_startindex is None else int(self.p_startindex)
-            query.limit(limit, offset)
+        offset = 0 if self.p_startindex is None else int(self.p_startindex)
+
+        def feature_query(feature_layer):
+            query = feature_layer.feature_query()
+            if box_geom is not None:
+                query.intersects(box_geom)
+            if filter_result is not None:
+                if len(filter_result["fids"]) > 0:
+                    query.filter(("id", "in", ",".join(str(fid) for fid in filter_result["fids"])))
+                if filter_result["intersects"] is not None:
+                    query.intersects(filter_result["intersects"])
+                if len(filter_result["filter"]) > 0:
+                    query.filter(*filter_result["filter"])
+            if self.p_propertyname is not None:
+                query.fields(*self.p_propertyname)
+            if limit is not None:
+                query.limit(limit, offset)
+            return query
+
+        def set_count(count):
+            if self.p_version == v110:
+                root.set("numberOfFeatures", str(count))
+            elif self.p_version >= v200:
+                # https://mapserver.org/development/rfc/ms-rfc-105.html#getfeature-operation
+                root.set("numberMatched", str(count) if limit is None else "unknown")
+                root.set("numberReturned", "0" if self.p_resulttype == "hits" else str(count))
+
+            if self.p_version >= v110:
+                root.set("timeStamp", utcnow_naive().strftime("%Y-%m-%dT%H:%M:%S.%f"))
 
         if self.p_resulttype == "hits":
-            count = query().total_count
+            set_count(feature_query(feature_layer)().total_count)
+            return root
+
+        with_geom = self.p_propertyname is None or geom_column in self.p_propertyname
+
+        if self.p_srsname is not None:
+            try:
+                # Ignore axis_xy, return X/Y always
+                srs_id, axis_xy = parse_srs(self.p_srsname)
+            except SRSParseError as e:
+                raise ValidationError(str(e))
+
+            srs_out = (
+                feature_layer.srs
+                if srs_id == feature_layer.srs_id
+                else SRS.filter_by(id=srs_id).one()
+            )
         else:
-            count = 0
+            srs_out = feature_layer.srs
 
-            if self.p_propertyname is None or geom_column in self.p_propertyname:
-                query.geom()
+        # Data sources encode GML with srsName in the short form, so it's only
+        # used when the form is the same as for GDAL.
+        gml_srs = srs_out.auth_name == "EPSG" and srs_out.auth_srid == srs_out.id
 
-            if self.p_srsname is not None:
-                try:
-                    # Ignore axis_xy, return X/Y always
-                    srs_id, axis_xy = parse_srs(self.p_srsname)
-                except SRSParseError as e:
-                    raise ValidationError(str(e))
+        fields = [(fld.keyname, self._field_key_encode(fld)) for fld in feature_layer.fields]
+        feature_layer_id, srs_out_id = feature_layer.id, srs_out.id
+        keyname = layer.keyname
 
-                srs_out = (
-                    feature_layer.srs
-                    if srs_id == feature_layer.srs_id
-                    else SRS.filter_by(id=srs_id).one()
-                )
+        id_attr = "gml:id" if self.p_version >= v110 else "fid"
+        member_tag = "wfs:member" if self.p_version >= v200 else "gml:featureMember"
+        nil_attr = ' xsi:nil="true"'
+
+        def encode_member(feature, osr_out):
+            feature_id = fid_encode(feature.id, keyname)
+            parts = [f"<{member_tag}><{keyname} {id_attr}={quoteattr(feature_id)}>"]
+
+            if (geom := feature.geom) is UNSET:
+                pass
+            elif geom is None:
+                parts.append(f"<geom{nil_attr}/>")
             else:
-                srs_out = feature_layer.srs
-            query.srs(srs_out)
+                if not isinstance(geom, str):
+                    geom = geom.ogr
+                    geom.AssignSpatialReference(osr_out)
+                    geom = geom.ExportToGML(
+                        [
+                            "FORMAT=%s" % self.gml_format,
+                            "SRSNAME_FORMAT=SHORT",
+                            "GMLID=geom-%s" % feature_id,
+                        ]
+                    )
+                parts.append(f"<geom>{geom}</geom>")
 
+            for fld_keyname, tag in fields:
+                if fld_keyname not in feature.fields:
+                    continue
+                value = feature.fields[fld_keyname]
+                if value is None:
+                    parts.append(f"<{tag}{nil_attr}/>")
+                    continue
+                if isinstance(value, datetime):
+                    value = value.isoformat()
+                elif isinstance(value, bool):
+                    value = "true" if value else "false"
+                elif isinstance(value, (dict, list)):
+                    value = dumps(value)
+                elif not isinstance(value, str):
+                    value = str(value)
+                value = escape(xml_invalid_pattern.sub("", value))
+                parts.append(f"<{tag}>{value}</{tag}>")
+
+            parts.append(f"</{keyname}></{member_tag}>")
+            return "".join(parts)
+
+        # Validate query parameters before the response is started
+        feature_query(feature_layer)
+
+        def collection():
+            feature_layer = Resource.filter_by(id=feature_layer_id).one()
+            srs_out = SRS.filter_by(id=srs_out_id).one()
             osr_out = srs_out.to_osr()
 
+            query = feature_query(feature_layer)
+            query.srs(srs_out)
+            if with_geom:
+                query.geom()
+                if gml_srs and IFeatureQueryGML.providedBy(query):
+                    query.gml(
+                        3 if self.gml_format == "GML32" else 2,
+                        id_prefix=f"geom-{keyname}.",
+                    )
+
+            features = query()
+
+            # Counting or getting the extent of all matching features requires
+            # reading them all, so it's avoided if the limit is set. Returned
+            # features are counted by IDs, and boundedBy is unknown as it goes
+            # before members.
+            if self.p_version >= v110:
+                if limit is None:
+                    count = features.total_count
+                else:
+                    count_query = feature_query(feature_layer)
+                    count_query.fields()
+                    count = sum(1 for _ in count_query())
+                set_count(count)
+
+            extent = None
+            if with_geom and limit is None:
+                extent = getattr(features, "extent", None)
+            bounds = extent_bounds(extent, srs_out)
+
             __boundedBy = El(
                 "boundedBy",
                 parent=root,
                 namespace=wfs["ns"] if self.p_version >= v200 else gml["ns"],
             )
-            minX = maxX = minY = maxY = None
-            gml_parser = etree.XMLParser(huge_tree=True)
-
-            for feature in query():
-                feature_id = fid_encode(feature.id, layer.keyname)
-                __member = (
-                    El("member", parent=root, namespace=wfs["ns"])
-                    if self.p_version >= v200
-                    else El("featureMember", parent=root, namespace=gml["ns"])
-                )
-                id_attr = ns_attr("gml", "id", self.p_version) if self.p_version >= v110 else "fid"
-                __feature = El(layer.keyname, {id_attr: feature_id}, parent=__member)
-
-                if (geom := feature.geom) is not UNSET:
-                    __geom = El("geom", parent=__feature)
-                    if geom is not None:
-                        geom = feature.geom.ogr
-                        geom.AssignSpatialReference(osr_out)
-
-                        _minX, _maxX, _minY, _maxY = geom.GetEnvelope()
-                        minX = _minX if minX is None else min(minX, _minX)
-                        minY = _minY if minY is None else min(minY, _minY)
-                        maxX = _maxX if maxX is None else max(maxX, _maxX)
-                        maxY = _maxY if maxY is None else max(maxY, _maxY)
-
-                        geom_gml = geom.ExportToGML(
-                            [
-                                "FORMAT=%s" % self.gml_format,
-                                "NAMESPACE_DECL=YES",
-                                "SRSNAME_FORMAT=SHORT",
-                                "GMLID=geom-%s" % feature_id,
-                            ]
-                        )
-                        __gml = etree.fromstring(geom_gml, parser=gml_parser)
-                        __geom.append(__gml)
-                    else:
-                        __geom.set(ns_attr("xsi", "nil", self.p_version), "true")
-
-                for field in feature_layer.fields:
-                    if field.keyname not in feature.fields:
-                        continue
-                    __field = El(self._field_key_encode(field), parent=__feature)
-                    value = feature.fields[field.keyname]
-                    if value is not None:
-                        if isinstance(value, datetime):
-                            value = value.isoformat()
-                        elif isinstance(value, bool):
-                            value = "true" if value else "false"
-                        elif isinstance(value, (dict, list)):
-                            value = dumps(value)
-                        elif not isinstance(value, str):
-                            value = str(value)
-                        __field.text = value
-                    else:
-                        __field.set(ns_attr("xsi", "nil", self.p_version), "true")
-
-                count += 1
-
-            if None in (minX, minY, maxX, maxY):
+            if bounds is None:
                 El(
                     "Null" if self.gml_format == "GML32" else "null",
                     parent=__boundedBy,
@@ -1120,6 +1201,7 @@ class WFSHandler:
                     text="unknown",
                 )
             elif self.p_version >= v110:
+                minX, minY, maxX, maxY = bounds
                 _envelope = El(
                     "Envelope",
                     dict(srsName=srs_short_format(srs_out.id)),
@@ -1149,20 +1231,25 @@ class WFSHandler:
                     "coordinates",
                     parent=_box,
                     namespace=gml["ns"],
-                    text="%f %f %f %f" % (minX, minY, maxX, maxY),
+                    text="%f %f %f %f" % bounds,
                 )
 
-        if self.p_version == v110:
-            root.set("numberOfFeatures", str(count))
-        elif self.p_version >= v200:
-            # https://mapserver.org/development/rfc/ms-rfc-105.html#getfeature-operation
-            root.set("numberMatched", str(count) if limit is None else "unknown")
-            root.set("numberReturned", "0" if self.p_resulttype == "hits" else str(count))
+            head, _, tail = etree.tostring(root, encoding="unicode").rpartition("</")
+            yield head
 
-        if self.p_version >= v110:
-            root.set("timeStamp", utcnow_naive().strftime("%Y-%m-%dT%H:%M:%S.%f"))
+            buf, size = [], 0
+            for feature in features:
+                member = encode_member(feature, osr_out)
+                buf.append(member)
+                size += len(member)
+                if size >= STREAM_CHUNK_SIZE:
+                    yield "".join(buf)
+                    buf, size = [], 0
 
-        return root
+            buf.append("</" + tail)
+            yield "".join(buf)
+
+        return collection()
 
     def _transaction(self):
         _ns_wfs = nsmap("wfs", self.p_version)["ns"]
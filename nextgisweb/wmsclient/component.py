@@ -1,7 +1,11 @@
+import os.path
 from datetime import timedelta
 
 from nextgisweb.env import Component
-from nextgisweb.lib.config import Option
+from nextgisweb.lib.config import Option, SizeInBytes
+from nextgisweb.lib.httpcache import HTTPCache
+
+from nextgisweb.core import CoreComponent
 
 
 class WMSClientComponent(Component):
@@ -10,14 +14,30 @@ class WMSClientComponent(Component):
 
         self.headers = {"User-Agent": self.options["user_agent"]}
 
+        core = self.env.component(CoreComponent)
+        self.http_cache = (
+            HTTPCache(
+                os.path.join(core.gtsdir(self), "http_cache.sqlite"),
+                self.options["http_cache.max_size"],
+            )
+            if self.options["http_cache.enabled"]
+            else None
+        )
+
     def setup_pyramid(self, config):
         from . import view
 
         view.setup_pyramid(self, config)
 
+    def maintenance(self):
+        if self.http_cache is not None:
+            self.http_cache.evict()
+
     # fmt: off
     option_annotations = (
         Option("user_agent", default="NextGIS Web"),
         Option("timeout", timedelta, default=timedelta(seconds=15), doc="WMS request timeout."),
+        Option("http_cache.enabled", bool, default=True, doc="Cache GetMap responses according to HTTP caching headers."),
+        Option("http_cache.max_size", SizeInBytes, default=2**30, doc="GetMap response cache size limit."),
     )
     # fmt: on
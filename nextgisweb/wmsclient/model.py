@@ -1,6 +1,7 @@
 import re
 from datetime import datetime
 from io import BytesIO
+from threading import Lock
 from typing import Annotated, Literal
 from urllib.parse import parse_qsl, quote, urlencode, urlparse, urlunparse
 
@@ -19,6 +20,7 @@ from zope.interface import implementer
 from nextgisweb.env import Base, gettext
 from nextgisweb.lib import saext
 from nextgisweb.lib.datetime import utcnow_naive
+from nextgisweb.lib.httpcache import CacheEntry, cache_key
 from nextgisweb.lib.logging import logger
 from nextgisweb.lib.pilhelper import reproject_render
 
@@ -78,6 +80,26 @@ url_pattern = re.compile(
 
 _capcache_cache: LRUCache = LRUCache(maxsize=64)
 
+# Pooled sessions by connection ID, so connections to remote servers are reused
+_sessions: LRUCache = LRUCache(maxsize=64)
+_sessions_lock = Lock()
+
+
+def _session(connection_id) -> requests.Session:
+    with _sessions_lock:
+        if (session := _sessions.get(connection_id)) is None:
+            session = _sessions[connection_id] = requests.Session()
+        return session
+
+
+def _cached_response(entry: CacheEntry) -> requests.Response:
+    response = requests.Response()
+    response.status_code = entry.status
+    response._content = entry.content
+    if entry.content_type is not None:
+        response.headers["Content-Type"] = entry.content_type
+    return response
+
 
 class WMSConnection(Resource):
     identity = "wmsclient_connection"
@@ -107,9 +129,15 @@ class WMSConnection(Resource):
             and self.capcache_tstamp is not None
         )
 
-    def request_wms(self, request: str, query=None):
+    def request_wms(self, request: str, query=None, *, cache=False):
+        """Make a request to the WMS server
+
+        :param cache: Use the HTTP cache for the request if it's enabled"""
+
         from .component import WMSClientComponent
 
+        comp = WMSClientComponent.current()
+
         capcache = self.capcache_dict
         url = (capcache.get("urls", {}).get(request) if capcache else None) or self.url
         up = urlparse(url, allow_fragments=False)
@@ -131,21 +159,37 @@ class WMSConnection(Resource):
         else:
             auth = None
 
-        headers = {**WMSClientComponent.current().headers}
+        headers = {**comp.headers}
         if self.referer:
             headers["Referer"] = self.referer
 
+        http_cache = comp.http_cache if cache else None
+        if http_cache is not None:
+            key = cache_key(url, identity=(auth, headers))
+            if (entry := http_cache.get(key)) is not None:
+                if entry.fresh:
+                    return _cached_response(entry)
+                headers.update(entry.validators())
+
         try:
-            return requests.get(
+            response = _session(self.id).get(
                 url,
                 auth=auth,
                 headers=headers,
-                timeout=WMSClientComponent.current().options["timeout"].total_seconds(),
+                timeout=comp.options["timeout"].total_seconds(),
                 verify=not self.insecure,
             )
         except RequestException:
             raise ExternalServiceError
 
+        if http_cache is not None:
+            if response.status_code == 304 and entry is not None:
+                http_cache.refresh(key, response.headers)
+                return _cached_response(entry)
+            http_cache.put(key, response.status_code, response.headers, response.content)
+
+        return response
+
     def capcache_query(self):
         self.capcache_tstamp = utcnow_naive()
 
@@ -318,7 +362,7 @@ class WMSLayer(Resource, SpatialLayerMixin):
 
         srs_param = "crs" if self.connection.version == "1.3.0" else "srs"
         query[srs_param] = "EPSG:%d" % self.remote_srs.id
-        response = self.connection.request_wms("GetMap", query)
+        response = self.connection.request_wms("GetMap", query, cache=True)
 
         if response.status_code == 200:
             data = BytesIO(response.content)
@@ -15,7 +15,7 @@ def test_request_wms_verify(insecure, ngw_resource_defaults):
             insecure=insecure,
         ).persist()
 
-    with patch("nextgisweb.wmsclient.model.requests.get") as mock_get:
+    with patch("nextgisweb.wmsclient.model.requests.Session.get") as mock_get:
         mock_get.return_value = MagicMock(status_code=200)
         conn.request_wms("GetCapabilities")
 
@@ -32,7 +32,7 @@ def test_request_wms_referer(referer, ngw_resource_defaults):
             referer=referer,
         ).persist()
 
-    with patch("nextgisweb.wmsclient.model.requests.get") as mock_get:
+    with patch("nextgisweb.wmsclient.model.requests.Session.get") as mock_get:
         mock_get.return_value = MagicMock(status_code=200)
         conn.request_wms("GetCapabilities")
 